@@ -1,163 +1,215 @@
+import atexit
 import time
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 
-# Lazy imports for heavy/optional external clients
-try:
-    import requests
-except Exception:
-    requests = None
-
-try:
-    import ccxt
-except Exception:
-    ccxt = None
-
-try:
-    import tweepy
-except Exception:
-    tweepy = None
-
-try:
-    import praw
-except Exception:
-    praw = None
+# requests, ccxt, tweepy and praw are imported inside the functions that use
+# them so that `import api` stays fast for smoke tests and the dashboard
 from datetime import datetime
 
+from utils import exchange_session, trade_journal, tracing
+
 logger = logging.getLogger()
 
-# Create an exchange instance (will use env vars if provided)
-exchange = ccxt.binance({
-    'apiKey': os.getenv('BINANCE_API_KEY'),
-    'secret': os.getenv('BINANCE_SECRET'),
-    'enableRateLimit': True
-})
+DEFAULT_MIN_ORDER_SIZE = 0.0001
 
-def fetch_with_retry(func, max_retries=5, initial_delay=1):
-    for i in range(max_retries):
-        try:
-            return func()
-        except ccxt.BaseError as e:
-            if "rate limit" in str(e).lower() or e.code == 429:
-                delay = initial_delay * (2 ** i)
-                logger.warning(f"⚠️ Osiągnięto limit API - czekam {delay} sekund")
-                time.sleep(delay)
-            else:
-                raise
-    raise Exception("Przekroczono maksymalną liczbę prób")
-
-def fetch_news():
+def get_min_order_size(symbol='BTC/USDT'):
+    try:
+        market = exchange_session.get_exchange().market(symbol)
+        min_amount = market.get('limits', {}).get('amount', {}).get('min')
+        return float(min_amount) if min_amount else DEFAULT_MIN_ORDER_SIZE
+    except Exception as e:
+        logger.warning(f"⚠️ Brak danych rynku {symbol}, używam domyślnego minimum: {e}")
+        return DEFAULT_MIN_ORDER_SIZE
+
+HTTP_TIMEOUT = 10
+SENTIMENT_SOURCE_TIMEOUT = 5.0
+
+_http_session = None
+_twitter_client = None
+_reddit_client = None
+_sentiment_executor = None
+_sentiment_inflight = {}
+_clients_lock = threading.Lock()
+
+def _get_http_session():
+    global _http_session
+    with _clients_lock:
+        if _http_session is None:
+            import requests
+            _http_session = requests.Session()
+        return _http_session
+
+def _get_twitter_client():
+    global _twitter_client
+    with _clients_lock:
+        if _twitter_client is None:
+            import tweepy
+            _twitter_client = tweepy.Client(bearer_token=os.getenv('TWITTER_BEARER_TOKEN'))
+        return _twitter_client
+
+def _get_reddit_client():
+    global _reddit_client
+    with _clients_lock:
+        if _reddit_client is None:
+            import praw
+            _reddit_client = praw.Reddit(
+                client_id=os.getenv('REDDIT_CLIENT_ID'),
+                client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
+                user_agent=os.getenv('REDDIT_USER_AGENT'),
+                timeout=HTTP_TIMEOUT
+            )
+        return _reddit_client
+
+@tracing.timed()
+def fetch_news(timeout=HTTP_TIMEOUT):
     if not os.getenv('NEWSAPI_KEY'):
         return []
     try:
         url = f"https://newsapi.org/v2/everything?q=bitcoin&apiKey={os.getenv('NEWSAPI_KEY')}"
-        response = requests.get(url)
+        response = _get_http_session().get(url, timeout=timeout)
         articles = response.json().get('articles', [])
-        return [article['title'] + ' ' + article['description'] for article in articles[:5]]
+        return [(article.get('title') or '') + ' ' + (article.get('description') or '') for article in articles[:5]]
     except Exception as e:
         logger.error(f"❌ NewsAPI error: {str(e)}")
         return []
 
+@tracing.timed()
 def fetch_tweets():
     if not os.getenv('TWITTER_BEARER_TOKEN'):
         return []
     try:
-        client = tweepy.Client(bearer_token=os.getenv('TWITTER_BEARER_TOKEN'))
-        tweets = client.search_recent_tweets(query="bitcoin", max_results=10, tweet_fields=['text'])
+        tweets = _get_twitter_client().search_recent_tweets(query="bitcoin", max_results=10, tweet_fields=['text'])
         return [tweet.text for tweet in tweets.data] if tweets.data else []
     except Exception as e:
         logger.error(f"❌ Twitter error: {str(e)}")
         return []
 
+@tracing.timed()
 def fetch_reddit_posts():
     if not all([os.getenv('REDDIT_CLIENT_ID'), os.getenv('REDDIT_CLIENT_SECRET'), os.getenv('REDDIT_USER_AGENT')]):
         return []
     try:
-        reddit = praw.Reddit(
-            client_id=os.getenv('REDDIT_CLIENT_ID'),
-            client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
-            user_agent=os.getenv('REDDIT_USER_AGENT')
-        )
-        subreddit = reddit.subreddit('bitcoin')
+        subreddit = _get_reddit_client().subreddit('bitcoin')
         posts = subreddit.search("bitcoin", limit=10)
         return [post.title + ' ' + post.selftext for post in posts]
     except Exception as e:
         logger.error(f"❌ Reddit error: {str(e)}")
         return []
 
+SENTIMENT_SOURCES = {
+    'news': fetch_news,
+    'twitter': fetch_tweets,
+    'reddit': fetch_reddit_posts,
+}
+
+@tracing.timed()
+def fetch_sentiment_texts(timeouts=None, default_timeout=SENTIMENT_SOURCE_TIMEOUT):
+    """Fetch all sentiment sources concurrently and return the texts that
+    arrived before each source's deadline.
+
+    A source that is still running from a previous call is not resubmitted,
+    so one hung API can never pile up worker threads or stall a decision.
+    """
+    global _sentiment_executor
+    timeouts = timeouts or {}
+    with _clients_lock:
+        if _sentiment_executor is None:
+            _sentiment_executor = ThreadPoolExecutor(
+                max_workers=len(SENTIMENT_SOURCES) * 2, thread_name_prefix='sentiment'
+            )
+    started = time.monotonic()
+    futures = {}
+    for name, fetch in SENTIMENT_SOURCES.items():
+        previous = _sentiment_inflight.get(name)
+        if previous is not None and not previous.done():
+            logger.warning(f"⚠️ Źródło {name} wciąż nie odpowiedziało - pomijam w tym cyklu")
+            continue
+        futures[name] = _sentiment_inflight[name] = _sentiment_executor.submit(fetch)
+
+    texts = []
+    for name, future in sorted(futures.items(), key=lambda item: timeouts.get(item[0], default_timeout)):
+        remaining = timeouts.get(name, default_timeout) - (time.monotonic() - started)
+        try:
+            texts.extend(future.result(timeout=max(0.0, remaining)))
+        except FuturesTimeout:
+            logger.warning(f"⚠️ Przekroczono czas oczekiwania na źródło {name}")
+        except Exception as e:
+            logger.error(f"❌ Błąd źródła {name}: {str(e)}")
+    return texts
+
+_alert_dispatcher = None
+
+def _get_alert_dispatcher():
+    global _alert_dispatcher
+    with _clients_lock:
+        if _alert_dispatcher is None:
+            from utils.alerts import AlertDispatcher, channels_from_env
+            _alert_dispatcher = AlertDispatcher(channels_from_env(), timeout=HTTP_TIMEOUT)
+            # deliver what is still queued (e.g. the halt alert) before exiting
+            atexit.register(_alert_dispatcher.stop)
+        return _alert_dispatcher
+
 def send_alert(message):
+    """Queue `message` for all configured channels; delivery, batching and
+    deduplication happen on background threads (see utils.alerts)."""
     try:
-        if os.getenv('SENDGRID_API_KEY') and os.getenv('ALERT_EMAIL'):
-            url = "https://api.sendgrid.com/v3/mail/send"
-            headers = {
-                "Authorization": f"Bearer {os.getenv('SENDGRID_API_KEY')}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "personalizations": [{
-                    "to": [{"email": os.getenv('ALERT_EMAIL')}]
-                }],
-                "from": {"email": "system@example.com"},
-                "subject": "ALERT: System Handlu Krypto",
-                "content": [{"type": "text/plain", "value": message}]
-            }
-            requests.post(url, headers=headers, json=payload)
-        
-        if os.getenv('SLACK_WEBHOOK_URL'):
-            payload = {
-                "text": f"🚨 *Crypto Trading Alert*\n```{message}```",
-                "mrkdwn": True
-            }
-            requests.post(os.getenv('SLACK_WEBHOOK_URL'), json=payload)
-            
-        if os.getenv('TELEGRAM_BOT_TOKEN') and os.getenv('TELEGRAM_CHAT_ID'):
-            url = f"https://api.telegram.org/bot{os.getenv('TELEGRAM_BOT_TOKEN')}/sendMessage"
-            payload = {
-                "chat_id": os.getenv('TELEGRAM_CHAT_ID'),
-                "text": f"🚨 *Crypto Trading Alert*\n```{message}```",
-                "parse_mode": "Markdown"
-            }
-            requests.post(url, json=payload)
-            
-        logger.info(f"🔔 Alert wysłany: {message}")
+        _get_alert_dispatcher().send(message)
     except Exception as e:
         logger.error(f"❌ Błąd wysyłania alertu: {str(e)}")
 
-def execute_trade(action, amount, trade_history, current_price):
+@tracing.timed()
+def execute_trade(action, amount, trade_history, current_price, symbol='BTC/USDT'):
     try:
+        exchange = exchange_session.get_exchange()
         if amount <= 0:
             logger.warning("❌ Nie wykonano transakcji - rozmiar 0")
             return False
             
-        min_size = get_min_order_size()
+        min_size = get_min_order_size(symbol)
         if amount < min_size:
             logger.warning(f"⚠️ Rozmiar {amount} mniejszy niż minimalny {min_size}")
             return False
             
+        base_currency, quote_currency = symbol.split('/')
         act = action.lower() if isinstance(action, str) else action
+        journal = trade_journal.get_journal()
         if act == 'buy':
-            order = exchange.create_market_buy_order('BTC/USDT', amount)
-            logger.info(f"✅ Kupiono {amount} BTC za {order['cost']} USDT")
-            trade_history.append({
+            order = exchange.create_market_buy_order(symbol, amount)
+            logger.info(f"✅ Kupiono {amount} {base_currency} za {order['cost']} {quote_currency}")
+            record = {
                 'action': 'buy',
                 'entry_price': current_price,
                 'amount': amount,
                 'cost': order['cost'],
+                'symbol': symbol,
                 'timestamp': datetime.now()
-            })
+            }
+            # the journal marks this record sold (with its profit) once the lot is closed
+            record['lot_id'] = journal.record_buy(
+                symbol, order.get('filled') or amount, current_price, order['cost'], order.get('id'), record=record
+            )
+            trade_history.append(record)
         elif act == 'sell':
-            order = exchange.create_market_sell_order('BTC/USDT', amount)
-            logger.info(f"✅ Sprzedano {amount} BTC za {order['cost']} USDT")
-            last_buy = next((t for t in trade_history if t['action'] == 'buy' and not t.get('sold', False)), None)
-            if last_buy:
-                profit = (order['cost'] - last_buy['cost'])
-                trade_history[-1]['sold'] = True
-                trade_history[-1]['profit'] = profit
+            order = exchange.create_market_sell_order(symbol, amount)
+            logger.info(f"✅ Sprzedano {amount} {base_currency} za {order['cost']} {quote_currency}")
+            profit = journal.record_sell(symbol, order.get('filled') or amount, current_price, order['cost'], order.get('id'))
+            logger.info(f"💵 Zrealizowany zysk {symbol}: {profit:.2f} {quote_currency}")
+            trade_history.append({
+                'action': 'sell',
+                'entry_price': current_price,
+                'amount': amount,
+                'cost': order['cost'],
+                'symbol': symbol,
+                'timestamp': datetime.now()
+            })
         else:
             logger.info("➡️ Trzymanie pozycji")
             return True
             
-        order_status = exchange.fetch_order(order['id'], 'BTC/USDT')
+        order_status = exchange.fetch_order(order['id'], symbol)
         if order_status['status'] != 'closed':
             logger.warning(f"⚠️ Zamówienie nie zostało zamknięte: {order_status['status']}")
             return False
@@ -168,9 +220,9 @@ def execute_trade(action, amount, trade_history, current_price):
         error_msg = str(e)
         if "insufficient" in error_msg.lower():
             logger.error(f"❌ Niewystarczające środki: {error_msg}")
-        elif "rate limit" in error_msg.lower():
+        elif exchange_session.is_rate_limited(e):
+            # the session already backed off and retried; no extra penalty here
             logger.error(f"❌ Osiągnięto limit API: {error_msg}")
-            time.sleep(60)
         else:
             logger.error(f"❌ Błąd transakcji: {error_msg}")
         return False
\ No newline at end of file
@@ -0,0 +1 @@
+"""Standalone benchmarks of the trading cycle (see run_benchmarks.py)."""
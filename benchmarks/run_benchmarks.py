@@ -0,0 +1,270 @@
+"""Benchmarks for the trading cycle hot paths.
+
+Runs against the in-process exchange simulator (utils.sim_exchange) fed
+with recorded candles (a CSV with timestamp,open,high,low,close,volume
+rows, or a seeded synthetic series) and writes one JSON document per run, so results of two commits can be
+compared directly:
+
+    python -m benchmarks.run_benchmarks --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<old>.json
+
+Every database, candle store and log file lives in a temporary directory;
+nothing under ../data or ../models is touched.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEADLINES = [
+    "Analysts say buy the dip as bitcoin holds support",
+    "Whales sell into the rally ahead of CPI data",
+    "ETF inflows hit a weekly record",
+    "Exchange outage triggers sell-off in altcoins",
+    "Miners keep accumulating, traders buy calls",
+    "Regulators delay decision on spot ETF",
+    "Funding rates turn negative as shorts pile in",
+    "Long-term holders refuse to sell at current prices",
+    "Stablecoin supply grows for a third month",
+    "Options market prices in a volatile week",
+]
+
+
+def synthetic_candles(n, seed=0, start=30000.0):
+    """Seeded hourly GBM candles used when no recording is given."""
+    rng = np.random.default_rng(seed)
+    close = start * np.exp(np.cumsum(rng.normal(0.0, 0.006, n)))
+    open_ = np.concatenate([[start], close[:-1]])
+    spread = np.abs(rng.normal(0.0, 0.003, n)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.gamma(2.0, 50.0, n)
+    ts = np.arange(n, dtype=np.int64) * 3600 * 1000
+    return [[int(t), float(o), float(h), float(l), float(c), float(v)]
+            for t, o, h, l, c, v in zip(ts, open_, high, low, close, volume)]
+
+
+def load_candles(path):
+    with open(path, newline='') as f:
+        rows = [r for r in csv.reader(f) if r and r[0][:1].isdigit()]
+    return [[int(float(r[0]))] + [float(x) for x in r[1:6]] for r in rows]
+
+
+def measure(fn, repeat, number=1, warmup=1):
+    """Per-call seconds of `repeat` timed batches of `number` calls."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    samples = np.asarray(samples)
+    return {
+        'repeat': repeat,
+        'number': number,
+        'mean_us': float(samples.mean() * 1e6),
+        'median_us': float(np.median(samples) * 1e6),
+        'min_us': float(samples.min() * 1e6),
+        'p95_us': float(np.percentile(samples, 95) * 1e6),
+        'ops_per_sec': float(1.0 / np.median(samples)) if np.median(samples) > 0 else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def prepare_environment(workdir):
+    # the stores read their locations from the environment at import time
+    os.environ['CANDLE_STORE_DIR'] = os.path.join(workdir, 'candles')
+    os.environ['TRADE_JOURNAL_PATH'] = os.path.join(workdir, 'trades.db')
+    os.environ['METRICS_DB_PATH'] = os.path.join(workdir, 'metrics.db')
+    os.environ['DASH_CACHE_PATH'] = os.path.join(workdir, 'dashboard_cache.db')
+    for name in ('SENDGRID_API_KEY', 'SLACK_WEBHOOK_URL', 'TELEGRAM_BOT_TOKEN', 'ELASTICSEARCH_URL'):
+        os.environ.pop(name, None)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def benchmark_config(workdir, symbol, timeframe):
+    with open(os.path.join(ROOT, 'config.json')) as f:
+        config = json.load(f)
+    config.update(
+        symbol=symbol, symbols=[symbol], timeframe=timeframe, market_data_mode='rest',
+        log_file=os.path.join(workdir, 'trading.log'), elasticsearch_url='',
+        drawdown_save_file=os.path.join(workdir, 'drawdown_state.json'),
+        feature_state_file=os.path.join(workdir, 'feature_state.json'),
+        correlation_file=os.path.join(workdir, 'correlation_matrix.json'),
+        regime_file=os.path.join(workdir, 'regime_state.json'),
+        trading_agent_path=os.path.join(workdir, 'trading_agent.zip'),
+        correlation_assets=[], tracing={'enabled': False},
+    )
+    return config
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    prepare_environment(workdir)
+    import api
+    import rading_ai
+    from utils import ai_models, data_processing, exchange_session, risk_management
+    from utils.features import FeaturePipeline
+    from utils.sim_exchange import SimExchange
+    from utils.structured_logging import setup_logging
+
+    config = benchmark_config(workdir, args.symbol, args.timeframe)
+    setup_logging(config['log_file'])
+    limit = config.get('data_points', 500)
+    cycles = max(5, args.repeat // 2)
+    # enough history that get_market_data stays on the incremental path, plus
+    # one unseen bar for every run_cycle (and its warmup) to close
+    bars = args.bars or limit + 100 + cycles + 1
+    candles = load_candles(args.candles) if args.candles else synthetic_candles(bars, args.seed)
+    if len(candles) <= limit:
+        print(f"⚠️ Tylko {len(candles)} świec przy data_points={limit} - "
+              "get_market_data będzie mierzyć uzupełnianie historii", file=sys.stderr)
+    sim = SimExchange({args.symbol: candles}, args.timeframe, latency=args.latency_ms / 1000.0,
+                      start=max(0, len(candles) - cycles - 2), seed=args.seed)
+    # without simulated latency a real rate budget would only measure the limiter
+    exchange_session.set_exchange(sim, exchange_session.RateLimiter(rate=1e9, burst=1e9))
+    rading_ai.config = config
+    ai_models.register_loader('exchange', exchange_session.get_exchange)
+    for name in ('trading_agent', 'risk_agent', 'monitoring_agent'):
+        ai_models.register_loader(name, lambda name=name: ai_models.DummyAgent(name))
+
+    results = {}
+
+    def bench(name, fn, repeat=None, number=1):
+        if args.only and name not in args.only:
+            return
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = measure(fn, repeat or args.repeat, number)
+        print(f"{name:<28} median {results[name]['median_us']:>12.1f} us  ({results[name]['ops_per_sec']:.1f}/s)",
+              file=sys.stderr)
+
+    # steady state: the store is synced and no new candle has closed
+    data_processing.get_market_data(args.symbol, args.timeframe, limit)
+    bench('get_market_data', lambda: data_processing.get_market_data(args.symbol, args.timeframe, limit))
+    bench('get_market_data_arrays',
+          lambda: data_processing.get_market_data(args.symbol, args.timeframe, limit, as_arrays=True))
+
+    bench('analyze_sentiment', lambda: ai_models.analyze_sentiment(HEADLINES), number=100)
+
+    window = data_processing.get_candle_store().tail(args.symbol, args.timeframe, limit)
+    pipeline = FeaturePipeline(args.timeframe, config.get('indicators'))
+    features = pipeline.update(window)
+    risk_params = risk_management.get_risk_parameters(config)
+    agent = ai_models.get_model('trading_agent')
+    bench('make_trading_decision',
+          lambda: ai_models.make_trading_decision([], window, 0.3, risk_params, agent, features), number=100)
+
+    sizing = dict(risk_params, equity=10000.0, atr_pct=features.get('atr_pct', float('nan')),
+                  available=10000.0, step=0.00001, min_amount=0.00001, min_cost=5.0)
+    price = float(window['close'][-1])
+    bench('calculate_position_size',
+          lambda: risk_management.calculate_position_size('BUY', price, [], sizing), number=100)
+
+    history = []
+    side = ['buy']
+
+    def alternate():
+        # alternate buys and sells so the simulated balance never runs out
+        api.execute_trade(side[0], 0.01, history, price, args.symbol)
+        side[0] = 'sell' if side[0] == 'buy' else 'buy'
+    bench('execute_trade', alternate, number=10)
+
+    state = rading_ai.TradingState(config)
+
+    def cycle():
+        # a new candle closes before every cycle, so each one syncs and decides
+        sim.advance()
+        rading_ai.run_cycle(state, None)
+    bench('run_cycle', cycle, repeat=cycles)
+
+    if not args.only or 'train_simple_agent' in args.only:
+        episodes, steps = 200, 50
+        save_path = os.path.join(workdir, 'trained_agent.zip')
+        stats = measure(lambda: ai_models.train_simple_agent(episodes, steps, save_path), max(3, args.repeat // 5))
+        stats['steps_per_sec'] = episodes * steps * 1e6 / stats['median_us']
+        results['train_simple_agent'] = stats
+        print(f"{'train_simple_agent':<28} {stats['steps_per_sec']:>12.0f} steps/s", file=sys.stderr)
+
+    return {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'candles': args.candles or f"synthetic:{bars}:{args.seed}",
+        'exchange_latency_ms': args.latency_ms,
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print median ratios against a baseline run; returns the regressions."""
+    regressions = []
+    for name, stats in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+        ratio = stats['median_us'] / old['median_us'] if old['median_us'] else float('inf')
+        flag = ''
+        if ratio > 1.0 + threshold:
+            flag = '  <-- wolniej'
+            regressions.append(name)
+        print(f"{name:<28} {old['median_us']:>12.1f} -> {stats['median_us']:>12.1f} us  x{ratio:.2f}{flag}",
+              file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarki ścieżek krytycznych cyklu handlowego")
+    parser.add_argument('--candles', help="CSV ze świecami (timestamp,open,high,low,close,volume)")
+    parser.add_argument('--bars', type=int, help="liczba świec syntetycznych bez --candles (domyślnie data_points + 100)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--symbol', default='BTC/USDT')
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="symulowane opóźnienie każdego wywołania giełdy")
+    parser.add_argument('--only', nargs='*', help="uruchom tylko wskazane benchmarki")
+    parser.add_argument('--output', help="plik JSON z wynikami (domyślnie stdout)")
+    parser.add_argument('--compare', help="poprzedni plik JSON do porównania")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="dopuszczalne spowolnienie mediany przy --compare (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"Regresje: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
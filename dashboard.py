@@ -1,16 +1,20 @@
 import dash
-from dash import dcc, html, callback, Output, Input
+from dash import dcc, html, dash_table, callback, Output, Input, State
 import dash_bootstrap_components as dbc
-import pandas as pd
 import sqlite3
-import plotly.express as px
 from datetime import datetime, timedelta
-import numpy as np
 import plotly.graph_objects as go
 from flask import Flask, request, session, redirect, url_for
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
 import os
 
+from utils.correlation import load_correlation
+from utils.figure_cache import cached
+from utils.forecast import ForecastEngine, model_inputs
+from utils.metrics_store import get_metrics_store
+from utils.regime import load_regimes
+from utils.trade_journal import get_journal
+
 server = Flask(__name__)
 app = dash.Dash(__name__, 
                 server=server,
@@ -364,5 +368,251 @@ app.layout = dbc.Container([
     )
 ], fluid=True)
 
+HOUR_MS = 3600 * 1000
+CHART_POINTS = 500
+PROGRESS_POINTS = 168
+CORRELATION_FILE = os.getenv('CORRELATION_FILE', 'correlation_matrix.json')
+REGIME_FILE = os.getenv('REGIME_FILE', 'regime_state.json')
+
+def metrics_version():
+    return get_metrics_store().version()
+
+def journal_version():
+    return get_journal().version()
+
+@cached('trade-table', version=journal_version)
+def trade_rows(action):
+    # newest first; the journal is the bot's SQLite file, read concurrently thanks to WAL
+    rows = get_journal().trades(action=None if action == 'all' else action, limit=500)
+    for row in rows:
+        row['timestamp'] = datetime.fromtimestamp(row['timestamp'] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+    return rows[::-1]
+
+@callback(
+    Output('trade-table', 'data'),
+    Input('interval-component', 'n_intervals'),
+    Input('trade-filter', 'value')
+)
+def update_trade_table(n_intervals, action):
+    return trade_rows(action)
+
+def _line_figure(x, y, name, yaxis_title, fill=None):
+    fig = go.Figure(go.Scatter(x=x, y=y, mode='lines', name=name, fill=fill))
+    fig.update_layout(template='plotly_dark', margin=dict(l=40, r=20, t=20, b=40), yaxis_title=yaxis_title)
+    return fig
+
+def _bucket_times(series):
+    return [datetime.fromtimestamp(b / 1000) for b in series['bucket']]
+
+def _drawdown_percent(series):
+    return [-d * 100 if d is not None else None for d in series['max_drawdown']]
+
+@cached('cards', version=metrics_version)
+def card_values():
+    latest = get_metrics_store().latest()
+    if latest is None:
+        return "$0.00", "0.00%", "$0.00", "-", "-", "-", "Current Risk: -"
+    fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+    risk = fmt(latest['risk_percent'], '.2f')
+    return (
+        f"${latest['equity']:,.2f}",
+        f"{latest['drawdown']:.2%}",
+        f"${latest['peak']:,.2f}",
+        f"{risk}%",
+        fmt(latest['sharpe'], '.2f'),
+        fmt(latest['profit_factor'], '.2f'),
+        f"Current Risk: {risk}%"
+    )
+
+@callback(
+    Output('current-value', 'children'),
+    Output('current-drawdown', 'children'),
+    Output('peak-value', 'children'),
+    Output('risk-percent', 'children'),
+    Output('sharpe-ratio', 'children'),
+    Output('profit-factor', 'children'),
+    Output('current-risk', 'children'),
+    Input('interval-component', 'n_intervals')
+)
+def update_cards(n_intervals):
+    return card_values()
+
+def _closed_hours(series):
+    # only closed hourly buckets are drawn, so points appended later never change
+    current = int(datetime.now().timestamp() * 1000) // HOUR_MS * HOUR_MS
+    keep = [i for i, b in enumerate(series['bucket']) if b < current]
+    return {k: [v[i] for i in keep] for k, v in series.items()}
+
+@cached('metric-charts', version=metrics_version)
+def metric_figures():
+    series = _closed_hours(get_metrics_store().series('1h', limit=CHART_POINTS + 1))
+    x = _bucket_times(series)
+    drawdown = _drawdown_percent(series)
+    figures = (
+        _line_figure(x, series['equity'], 'Equity', 'USDT'),
+        _line_figure(x, drawdown, 'Drawdown', '%', fill='tozeroy'),
+        _line_figure(x[-PROGRESS_POINTS:], drawdown[-PROGRESS_POINTS:], 'Drawdown', '%', fill='tozeroy'),
+        _line_figure(x, series['sharpe'], 'Sharpe', 'Sharpe ratio'),
+        _line_figure(x, series['volatility'], 'Volatility', 'hourly σ')
+    )
+    return figures, (series['bucket'][-1] if series['bucket'] else None)
+
+@cached('metric-points', version=metrics_version)
+def metric_points(since):
+    return _closed_hours(get_metrics_store().series('1h', since=since + HOUR_MS, limit=CHART_POINTS))
+
+@callback(
+    Output('portfolio-chart', 'figure'),
+    Output('drawdown-chart', 'figure'),
+    Output('drawdown-progress', 'figure'),
+    Output('sharpe-chart', 'figure'),
+    Output('volatility-chart', 'figure'),
+    Output('portfolio-chart', 'extendData'),
+    Output('drawdown-chart', 'extendData'),
+    Output('drawdown-progress', 'extendData'),
+    Output('sharpe-chart', 'extendData'),
+    Output('volatility-chart', 'extendData'),
+    Output('portfolio-data', 'data'),
+    Input('interval-component', 'n_intervals'),
+    State('portfolio-data', 'data')
+)
+def update_metric_charts(n_intervals, sent):
+    # the first tick of a page gets whole (cached) figures; later ticks only
+    # the hourly buckets closed since the last one this page received
+    if not sent or sent.get('last_bucket') is None:
+        figures, last_bucket = metric_figures()
+        return figures + (dash.no_update,) * 5 + ({'last_bucket': last_bucket},)
+    points = metric_points(sent['last_bucket'])
+    if not points['bucket']:
+        return (dash.no_update,) * 11
+    x = [_bucket_times(points)]
+    drawdown = [_drawdown_percent(points)]
+    extend = (
+        (dict(x=x, y=[points['equity']]), [0], CHART_POINTS),
+        (dict(x=x, y=drawdown), [0], CHART_POINTS),
+        (dict(x=x, y=drawdown), [0], PROGRESS_POINTS),
+        (dict(x=x, y=[points['sharpe']]), [0], CHART_POINTS),
+        (dict(x=x, y=[points['volatility']]), [0], CHART_POINTS),
+    )
+    return (dash.no_update,) * 5 + extend + ({'last_bucket': points['bucket'][-1]},)
+
+@cached('3d-portfolio', version=metrics_version)
+def portfolio_3d_figure(time_window, vol_threshold):
+    series = get_metrics_store().series('1h', limit=int(time_window) * 24)
+    x = _bucket_times(series)
+    # daily volatility, the unit of the threshold slider
+    vol = [v * 24 ** 0.5 if v is not None else None for v in series['volatility']]
+    colors = ['red' if v is not None and v > vol_threshold else 'green' for v in vol]
+    fig = go.Figure(go.Scatter3d(
+        x=x, y=vol, z=series['equity'], mode='lines+markers',
+        marker=dict(size=3, color=colors), line=dict(color='gray')
+    ))
+    fig.update_layout(template='plotly_dark', margin=dict(l=0, r=0, t=20, b=0),
+                      scene=dict(xaxis_title='Time', yaxis_title='Daily volatility', zaxis_title='Equity'))
+    return fig
+
+@callback(
+    Output('3d-portfolio-chart', 'figure'),
+    Input('interval-component', 'n_intervals'),
+    Input('time-window', 'value'),
+    Input('vol-threshold', 'value')
+)
+def update_3d_portfolio(n_intervals, time_window, vol_threshold):
+    return portfolio_3d_figure(time_window, vol_threshold)
+
+def correlation_version():
+    try:
+        return os.path.getmtime(CORRELATION_FILE)
+    except OSError:
+        return None
+
+@cached('correlation', version=correlation_version)
+def correlation_figure():
+    data = load_correlation(CORRELATION_FILE)
+    if not data:
+        return go.Figure(layout=dict(template='plotly_dark'))
+    fig = go.Figure(go.Heatmap(z=data['correlation'], x=data['assets'], y=data['assets'],
+                               zmin=-1, zmax=1, colorscale='RdBu'))
+    fig.update_layout(template='plotly_dark', margin=dict(l=60, r=20, t=20, b=40))
+    return fig
+
+@callback(
+    Output('correlation-chart', 'figure'),
+    Input('interval-component', 'n_intervals')
+)
+def update_correlation(n_intervals):
+    return correlation_figure()
+
+def regime_version():
+    try:
+        return os.path.getmtime(REGIME_FILE)
+    except OSError:
+        return None
+
+@cached('regime', version=regime_version)
+def regime_gauge():
+    regimes = load_regimes(REGIME_FILE) or {}
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=0,
+        title={'text': "Market Regime"},
+        gauge={
+            'axis': {'range': [0, 2]},
+            'steps': [
+                {'range': [0, 0.5], 'color': "red"},
+                {'range': [0.5, 1.5], 'color': "gray"},
+                {'range': [1.5, 2], 'color': "green"}
+            ],
+            'bar': {'color': "darkblue"},
+            'threshold': {'line': {'color': "red", 'width': 4}, 'thickness': 0.75, 'value': 1}
+        }
+    ))
+    if not regimes:
+        return fig, "Current Regime: -"
+    # the first symbol in the file is the bot's primary symbol
+    symbol, regime = next(iter(regimes.items()))
+    fig.update_traces(value=regime['regime'])
+    text = f"Current Regime: {regime['label']} ({symbol})"
+    if regime.get('is_anomaly'):
+        text += " - anomaly"
+    return fig, text
+
+@callback(
+    Output('market-regime-gauge', 'figure'),
+    Output('market-regime', 'children'),
+    Input('interval-component', 'n_intervals')
+)
+def update_regime(n_intervals):
+    return regime_gauge()
+
+forecast_engine = ForecastEngine()
+
+@cached('forecast', version=metrics_version)
+def forecast_figure(days, confidence):
+    store = get_metrics_store()
+    latest = store.latest()
+    fig = go.Figure(layout=dict(template='plotly_dark', margin=dict(l=40, r=20, t=20, b=40)))
+    if latest is None:
+        return fig
+    method, sample = model_inputs(store.series('1d', limit=365)['equity'], store.series('1h', limit=720)['equity'])
+    bands = forecast_engine.forecast(sample, latest['equity'], int(days), confidence,
+                                     version=metrics_version(), method=method)
+    x = [datetime.now() + timedelta(days=int(d)) for d in bands['days']]
+    fig.add_trace(go.Scatter(x=x, y=bands['upper'], mode='lines', line=dict(width=0), showlegend=False))
+    fig.add_trace(go.Scatter(x=x, y=bands['lower'], mode='lines', line=dict(width=0), fill='tonexty',
+                             name=f"{confidence}% interval"))
+    fig.add_trace(go.Scatter(x=x, y=bands['median'], mode='lines', name='Median'))
+    fig.update_layout(yaxis_title='USDT')
+    return fig
+
+@callback(
+    Output('forecast-chart', 'figure'),
+    Input('interval-component', 'n_intervals'),
+    Input('forecast-days', 'value'),
+    Input('confidence-level', 'value')
+)
+def update_forecast(n_intervals, days, confidence):
+    return forecast_figure(days, confidence)
+
 if __name__ == '__main__':
     app.run_server(debug=True, port=8050)
\ No newline at end of file
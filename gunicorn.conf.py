@@ -0,0 +1,19 @@
+# Gunicorn settings for the dashboard: gunicorn -c gunicorn.conf.py dashboard:server
+#
+# Workers share figures through the SQLite cache in utils/figure_cache.py
+# (DASH_CACHE_PATH), so adding workers does not multiply figure computation.
+import multiprocessing
+import os
+
+bind = os.getenv('DASH_BIND', '0.0.0.0:8050')
+workers = int(os.getenv('DASH_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('DASH_THREADS', 4))
+timeout = 30
+keepalive = 5
+# every worker opens its own SQLite connections after the fork
+preload_app = False
+# recycle workers now and then to bound memory growth
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = '-'
@@ -1,262 +1,421 @@
 import time
+_PROCESS_START = time.perf_counter()
+
+import argparse
+import importlib.util
 import json
 import logging
 import os
 from datetime import datetime, timedelta
 import sys
+import uuid
 
-# Lazy/optional imports for heavy libraries to speed startup and make smoke-tests resilient
-try:
-    import ccxt
-except Exception:
-    ccxt = None
+# Heavy libraries (torch, transformers, stable_baselines3, sklearn, ccxt...) are
+# imported lazily by the model loaders registered in register_models(), so
+# importing this module stays cheap and the first cycle only pays for what it uses.
+import api
+from utils import risk_management, data_processing, ai_models, exchange_session, tracing
+from utils.structured_logging import cycle_context, elapsed_ms, setup_logging as setup_json_logging
 
-try:
-    import pandas as pd
-except Exception:
-    pd = None
+CONFIG_PATH = 'config.json'
+config = None
+logger = logging.getLogger()
 
-try:
-    import numpy as np
-except Exception:
-    np = None
+def load_config(path=CONFIG_PATH):
+    with open(path) as f:
+        return json.load(f)
 
-try:
-    import ta
-except Exception:
-    ta = None
+def setup_logging(config):
+    # JSON lines through a queue: log calls in the trading loop never wait on
+    # disk or the network, and Logstash/Elasticsearch index them without grok
+    setup_json_logging(
+        config.get('log_file', 'app.log'),
+        level=logging.INFO,
+        elasticsearch_url=os.getenv('ELASTICSEARCH_URL') or config.get('elasticsearch_url'),
+        index=config.get('elasticsearch_index', 'crypto-logs')
+    )
 
-try:
-    import requests
-except Exception:
-    requests = None
+def _load_exchange():
+    if importlib.util.find_spec('ccxt') is None:
+        raise RuntimeError("ccxt not available; exchange functionality disabled")
+    session = exchange_session.get_exchange()
+    session.load_markets()
+    logger.info("✅ Połączono z Binance Testnet")
+    return session
 
-try:
-    import torch
-except Exception:
-    torch = None
+def _regime_path(symbol):
+    from utils.regime import regime_model_path
+    return regime_model_path(config.get('regime_model_path', '../models/regime_model.pkl'), symbol)
 
-try:
-    from transformers import AutoTokenizer, AutoModelForSequenceClassification
-    transformers_available = True
-except Exception:
-    AutoTokenizer = None
-    AutoModelForSequenceClassification = None
-    transformers_available = False
+def _regime_history(symbol):
+    return data_processing.get_candle_store().tail(symbol, config['timeframe'], config.get('regime_fit_bars', 8760))
 
-try:
-    import tweepy
-except Exception:
-    tweepy = None
+def register_models(config):
+    ai_models.register_loader('exchange', _load_exchange)
+    if importlib.util.find_spec('transformers') is not None:
+        ai_models.register_loader('sentiment_engine', lambda: ai_models.init_sentiment_engine(
+            quantize=config.get('sentiment_quantize', False),
+            num_threads=config.get('sentiment_threads')
+        ))
+    else:
+        logger.warning("transformers not available; sentiment agent disabled")
+    from utils.regime import RegimeDetector
+    for symbol in config.get('symbols') or [config['symbol']]:
+        # fitted once on stored history and cached on disk; later starts only load it
+        ai_models.register_loader(f'regime_detector:{symbol}', lambda symbol=symbol: RegimeDetector.load_or_fit(
+            _regime_path(symbol), lambda: _regime_history(symbol), config.get('regime'), config.get('indicators')
+        ))
+    ai_models.register_loader('trading_agent', lambda: ai_models.load_trading_agent(config['trading_agent_path']))
+    ai_models.register_loader('risk_agent', lambda: ai_models.load_risk_agent(config['risk_agent_path']))
+    ai_models.register_loader('monitoring_agent', lambda: ai_models.load_monitoring_agent(config['monitoring_agent_path']))
 
-try:
-    import praw
-except Exception:
-    praw = None
+def bootstrap(path=CONFIG_PATH):
+    global config
+    config = load_config(path)
+    setup_logging(config)
+    register_models(config)
+    return config
 
-try:
-    from stable_baselines3 import DQN, PPO
-except Exception:
-    DQN = None
-    PPO = None
+class TradingState:
+    """Mutable state shared by the scheduled jobs of one bot process."""
 
-import api
-from utils import risk_management, data_processing, ai_models
+    def __init__(self, config):
+        from utils.multi_symbol import MultiSymbolEngine
+        self.first_cycle = True
+        self.last_model_reset = datetime.now()
+        self.sentiment = 0.0
+        self.halted = False
+        self.stream = None
+        self.balance = None
+        # last fetched balance and prices with their time.monotonic() stamps,
+        # shared by the decision cycle and the metrics job
+        self.balance_at = None
+        self.prices = None
+        self.prices_at = None
+        # one engine evaluates every configured pair; models, sentiment and
+        # the exchange session are shared, indicators and history are per symbol
+        self.engine = MultiSymbolEngine(config)
+        self.primary = self.engine.contexts[self.engine.symbols[0]]
+        self.trade_history = self.primary.trade_history
+        from utils.correlation import RollingCorrelation
+        assets = list(dict.fromkeys(self.engine.symbols + config.get('correlation_assets', [])))
+        self.correlation = RollingCorrelation(assets, config.get('correlation_window', 720)) if len(assets) > 1 else None
+        self.engine.correlation = self.correlation
+        from utils.metrics_store import get_metrics_store
+        self.metrics = get_metrics_store()
+        self.risk_percent = config.get('risk_percent', 1.0)
+        if os.path.exists(config['drawdown_save_file']):
+            with open(config['drawdown_save_file'], 'r') as f:
+                saved = json.load(f)
+                self.peak_portfolio = saved['peak_portfolio']
+                self.last_portfolio = saved['last_portfolio']
+        else:
+            self.peak_portfolio = 10000.0
+            self.last_portfolio = 10000.0
 
-with open('config.json') as f:
-    config = json.load(f)
-log_dir = os.path.dirname(config.get('log_file') or '') or '.'
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    filename=config.get('log_file', 'app.log'),
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-logger = logging.getLogger()
+def save_drawdown_state(state):
+    with open(config['drawdown_save_file'], 'w') as f:
+        json.dump({
+            'peak_portfolio': state.peak_portfolio,
+            'last_portfolio': state.last_portfolio
+        }, f)
 
-exchange = None
-if ccxt is not None:
-    try:
-        exchange = ccxt.binance({
-            'apiKey': os.getenv('BINANCE_API_KEY'),
-            'secret': os.getenv('BINANCE_SECRET'),
-            'enableRateLimit': True,
-            'urls': {
-                'api': {
-                    'public': 'https://testnet.binance.vision/api/v3',
-                    'private': 'https://testnet.binance.vision/api/v3'
-                }
-            }
-        })
-        logger.info("✅ Połączono z Binance Testnet")
-    except Exception as e:
-        logger.error(f"❌ Błąd inicjalizacji exchange: {e}")
-        exchange = None
-else:
-    logger.warning("ccxt not available; exchange functionality disabled")
+@tracing.timed('rading_ai.refresh_sentiment')
+def refresh_sentiment(state):
+    texts = api.fetch_sentiment_texts(default_timeout=config.get('sentiment_fetch_timeout', 5.0))
+    state.sentiment = ai_models.analyze_sentiment(texts)
+    logger.info(f"📰 Sentyment: {state.sentiment:.2f} ({len(texts)} tekstów)")
+
+def check_model_reset(state):
+    if (datetime.now() - state.last_model_reset).days > config['model_reset_days']:
+        logger.info("🔄 Resetowanie modelu...")
+        state.last_model_reset = datetime.now()
+        logger.info("✅ Model został zresetowany")
+
+@tracing.timed('rading_ai.refresh_balance')
+def refresh_balance(state):
+    exchange = ai_models.get_model('exchange')
+    if exchange is not None:
+        state.balance = exchange.fetch_balance()
+        state.balance_at = time.monotonic()
+
+def _is_fresh(stamp, max_age):
+    return stamp is not None and time.monotonic() - stamp <= max_age
+
+def get_current_price(state, exchange, symbol=None):
+    symbol = symbol or state.primary.symbol
+    return state.engine.fetch_prices(exchange, state.stream, [symbol])[symbol]
+
+@tracing.timed('rading_ai.record_metrics')
+def record_metrics(state, equity=None):
+    """Fold the current equity and newly realized trades into the dashboard rollups."""
+    from utils.trade_journal import get_journal
+    if equity is None:
+        exchange = ai_models.get_model('exchange')
+        if exchange is None:
+            return
+        # reuse what the last cycle (or the balance job) fetched; in REST mode
+        # hit the exchange only once it is older than one metrics interval
+        max_age = config.get('metrics_interval_seconds', 60)
+        rest = state.stream is None
+        if state.balance is None or (rest and not _is_fresh(state.balance_at, max_age)):
+            refresh_balance(state)
+        prices = state.prices
+        if not rest or prices is None or not _is_fresh(state.prices_at, max_age):
+            prices = state.engine.fetch_prices(exchange, state.stream)
+            if rest:
+                state.prices, state.prices_at = prices, time.monotonic()
+        equity = state.engine.portfolio_value(state.balance, prices)
+    state.metrics.add_realized(get_journal().trades(action='sell', after_id=state.metrics.last_trade_id))
+    state.metrics.record(equity, risk_percent=state.risk_percent)
+
+@tracing.timed('rading_ai.refresh_correlation')
+def refresh_correlation(state):
+    tracker = state.correlation
+    bars = tracker.window + 1
+    candles = {}
+    for asset in tracker.assets:
+        if state.stream is not None and asset in state.stream.symbols:
+            candles[asset] = state.stream.candles(asset, bars)
+        else:
+            candles[asset] = data_processing.get_market_data(asset, config['timeframe'], bars, as_arrays=True)
+        if candles[asset] is None:
+            logger.warning(f"⚠️ Brak danych {asset} - korelacje nie zostały zaktualizowane")
+            return
+    tracker.update(candles)
+    tracker.save(config.get('correlation_file', 'correlation_matrix.json'))
 
-# Optional scikit-learn imports (make sklearn optional to avoid hard dependency at startup)
-try:
-    from sklearn.ensemble import IsolationForest
-except Exception:
-    IsolationForest = None
-    logger.warning("scikit-learn not available; anomaly detection disabled until installed")
-if transformers_available:
-    try:
-        tokenizer = AutoTokenizer.from_pretrained("yiyanghkust/finbert-tone")
-        finbert_model = AutoModelForSequenceClassification.from_pretrained("yiyanghkust/finbert-tone")
-        logger.info("✅ Agent sentimentu (LLM) załadowany pomyślnie")
-    except Exception as e:
-        logger.error(f"❌ Błąd ładowania agenta sentimentu: {str(e)}")
-        finbert_model = None
-        tokenizer = None
-else:
-    tokenizer = None
-    finbert_model = None
-    logger.warning("transformers not available; sentiment agent disabled")
+def start_stream(state, scheduler):
+    from utils.streaming import MarketStream, TESTNET_STREAM_URL, is_local_stream, rest_backfill
+    # one REST sync so the stream starts from full, up-to-date history
+    state.engine.load_candles()
+    url = config.get('stream_url') or TESTNET_STREAM_URL
+    persist = config.get('stream_persist', True)
+    if persist and is_local_stream(url):
+        # a local replay server re-bases recorded bars into the future
+        logger.warning("⚠️ Lokalny strumień powtórek - świece nie będą zapisywane do magazynu")
+        persist = False
+    state.stream = MarketStream(
+        state.engine.symbols, config['timeframe'],
+        base_url=url,
+        history=config.get('data_points', 500),
+        store=data_processing.get_candle_store(),
+        persist=persist,
+        on_candle_close=lambda event: scheduler.trigger('decision'),
+        backfill=rest_backfill(ai_models.get_model('exchange'), config['timeframe'])
+    ).start()
 
-try:
-    trading_agent = ai_models.load_trading_agent(config['trading_agent_path'])
-    logger.info("✅ Agent handlowy (RL) załadowany pomyślnie")
-except Exception as e:
-    logger.error(f"❌ Błąd ładowania agenta handlowego: {str(e)}")
-    raise
+def halt_trading(state, scheduler, drawdown):
+    alert_msg = f"🚨 DRAWDOWN PRZEKROCZONY! {drawdown:.2%} > {config['max_drawdown_percent']}%"
+    logger.critical(alert_msg)
+    api.send_alert(alert_msg)
+    save_drawdown_state(state)
+    state.halted = True
+    cooldown = config.get('drawdown_cooldown_seconds', 86400)
+    # other jobs keep running during the cooldown; the process then exits as before
+    scheduler.once('shutdown', time.time() + cooldown, lambda: scheduler.stop(exit_code=1))
 
-try:
-    risk_agent = ai_models.load_risk_agent(config['risk_agent_path'])
-    logger.info("✅ Agent ryzyka (RL) załadowany pomyślnie")
-except Exception as e:
-    logger.error(f"❌ Błąd ładowania agenta ryzyka: {str(e)}")
-    raise
+def run_cycle(state, scheduler):
+    if state.halted:
+        logger.warning("⛔ Handel wstrzymany po przekroczeniu drawdownu")
+        return
+    with cycle_context(uuid.uuid4().hex[:12]) as cycle_id:
+        _run_cycle(state, scheduler, cycle_id)
+
+def _run_cycle(state, scheduler, cycle_id):
+    print("\n" + "="*50)
+    print(f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    started = time.perf_counter()
+    latency_ms = {}
+    
+    exchange = ai_models.get_model('exchange')
+    if exchange is None:
+        raise RuntimeError("Giełda niedostępna")
+    trading_agent = ai_models.get_model('trading_agent')
+    risk_agent = ai_models.get_model('risk_agent')
+    monitoring_agent = ai_models.get_model('monitoring_agent')
+    
+    step = time.perf_counter()
+    # in stream mode the balance is cached and refreshed by its own job and after trades
+    balance = state.balance if state.stream is not None and state.balance else exchange.fetch_balance()
+    prices = state.engine.fetch_prices(exchange, state.stream)
+    latency_ms['market_data'] = elapsed_ms(step)
+    if state.stream is None:
+        state.balance, state.balance_at = balance, time.monotonic()
+        state.prices, state.prices_at = prices, time.monotonic()
+    current_portfolio = state.engine.portfolio_value(balance, prices)
+    state.last_portfolio = current_portfolio
+    
+    holdings = ' | '.join(
+        f"{balance.get(c, {}).get('free', 0.0)} {c}"
+        for c in dict.fromkeys(part for s in state.engine.symbols for part in s.split('/'))
+    )
+    logger.info(f"📊 Portfel: {holdings}")
+    logger.info(f"💰 Aktualna wartość portfela: ${current_portfolio:.2f}",
+                extra={'event': 'portfolio', 'portfolio': current_portfolio, 'prices': prices})
+    
+    if current_portfolio > state.peak_portfolio:
+        state.peak_portfolio = current_portfolio
+        
+    drawdown = (state.peak_portfolio - current_portfolio) / state.peak_portfolio
+    logger.info(f"📉 Drawdown: {drawdown:.2%}", extra={'event': 'drawdown', 'drawdown': drawdown})
+    
+    if drawdown > config['max_drawdown_percent'] / 100:
+        halt_trading(state, scheduler, drawdown)
+        return
+    
+    closed_ms = None
+    step = time.perf_counter()
+    candles = state.engine.load_candles(state.stream)
+    latency_ms['candles'] = elapsed_ms(step)
+    if state.stream is not None:
+        # every streamed candle is closed, whatever the wall clock says (e.g. fast replay)
+        tf_ms = data_processing.timeframe_to_ms(config['timeframe'])
+        closed_ms = {s: int(df['timestamp'][-1]) + tf_ms for s, df in candles.items() if len(df['timestamp'])}
+    
+    step = time.perf_counter()
+    decisions = state.engine.evaluate(
+        candles, state.sentiment, trading_agent, risk_agent, monitoring_agent, closed_ms
+    )
+    latency_ms['decision'] = elapsed_ms(step)
+    regimes = {s: ctx.regime for s, ctx in state.engine.contexts.items() if ctx.regime is not None}
+    if regimes:
+        from utils.regime import save_regimes
+        save_regimes(config.get('regime_file', 'regime_state.json'),
+                     {s: dict(r, timestamp=state.engine.contexts[s].last_decided_ts) for s, r in regimes.items()})
+    step = time.perf_counter()
+    results = state.engine.execute(decisions, exchange, state.stream, equity=current_portfolio, balance=balance)
+    latency_ms['execution'] = elapsed_ms(step)
+    if any(ok for _, ok in results):
+        if state.stream is not None:
+            refresh_balance(state)
+        else:
+            # the metrics job fetches the post-trade balance
+            state.balance_at = None
+    if decisions:
+        state.risk_percent = decisions[0][2]['risk_percent']
+    executed = dict(results)
+    for symbol, decision, risk_params in decisions:
+        regime = state.engine.contexts[symbol].regime or {}
+        logger.info(f"🧭 {symbol}: {decision}", extra={
+            'event': 'decision', 'symbol': symbol, 'decision': decision,
+            'executed': executed.get(symbol), 'risk_percent': risk_params.get('risk_percent'),
+            'regime': regime.get('label'), 'anomaly_score': regime.get('anomaly_score')
+        })
+    record_metrics(state, current_portfolio)
+    
+    close_event = state.stream.last_close_event if state.stream is not None else None
+    if close_event is not None:
+        latency = time.time() - close_event['received']
+        logger.info(f"⏱️ Tick → decyzja: {latency * 1000:.0f} ms")
+    else:
+        period = data_processing.timeframe_to_ms(config['timeframe']) / 1000.0
+        latency = time.time() - (time.time() // period) * period
+        logger.info(f"⏱️ Decyzja {latency * 1000:.0f} ms po zamknięciu świecy")
+    latency_ms['close_to_decision'] = round(latency * 1000.0, 2)
+    latency_ms['cycle'] = elapsed_ms(started)
+    for stage, ms in latency_ms.items():
+        tracing.observe(f'cycle.{stage}', ms / 1000.0)
+    logger.info(f"🔁 Cykl {cycle_id} zakończony w {latency_ms['cycle']:.0f} ms", extra={
+        'event': 'cycle', 'latency_ms': latency_ms, 'portfolio': current_portfolio, 'drawdown': drawdown,
+        'decisions': len(decisions), 'executed_orders': sum(1 for _, ok in results if ok)
+    })
+    
+    if state.first_cycle:
+        state.first_cycle = False
+        startup = time.perf_counter() - _PROCESS_START
+        tracing.observe('process.startup_to_first_cycle', startup)
+        logger.info(f"⏱️ Czas od startu procesu do pierwszego cyklu: {startup:.2f} s",
+                    extra={'event': 'startup', 'latency_ms': {'startup': round(startup * 1000.0, 2)}})
 
-try:
-    monitoring_agent = ai_models.load_monitoring_agent(config['monitoring_agent_path'])
-    logger.info("✅ Agent monitorujący (RL) załadowany pomyślnie")
-except Exception as e:
-    logger.error(f"❌ Błąd ładowania agenta monitorującego: {str(e)}")
-    raise
+@tracing.timed('rading_ai.run_dca')
+def run_dca(state):
+    if state.halted:
+        return
+    exchange = ai_models.get_model('exchange')
+    if exchange is None:
+        return
+    symbol = state.primary.symbol
+    current_price = get_current_price(state, exchange, symbol)
+    risk_params = state.engine.risk_parameters(symbol)
+    step, min_amount, min_cost = state.engine.market_limits(exchange, symbol)
+    risk_params.update(equity=state.last_portfolio, atr_pct=state.primary.features.get('atr_pct', float('nan')),
+                       step=step, min_amount=min_amount, min_cost=min_cost)
+    # dca_amount is the fraction of a regular position bought on each DCA tick;
+    # scaling the inputs keeps the result rounded to the lot step
+    risk_params['risk_percent'] *= config.get('dca_amount', 0.0)
+    risk_params['max_position_size'] *= config.get('dca_amount', 0.0)
+    amount = risk_management.calculate_position_size('BUY', current_price, state.trade_history, risk_params)
+    if amount > 0:
+        logger.info(f"📅 DCA: kupno {amount} {symbol}")
+        api.execute_trade('BUY', amount, state.trade_history, current_price, symbol)
 
-twitter_client = None
-if config.get('twitter_bearer_token'):
-    try:
-        twitter_client = tweepy.Client(bearer_token=config['twitter_bearer_token'])
-        logger.info("✅ Twitter API połączony")
-    except Exception as e:
-        logger.error(f"❌ Błąd Twitter API: {str(e)}")
+@tracing.timed('rading_ai.fit_regime_detectors')
+def fit_regime_detectors(state):
+    # loads (on a first start: fits) the detectors off the decision path, which
+    # uses them only once loaded; one left unfitted for lack of history is
+    # fitted again on a later run
+    from utils.regime import fit_pending
+    for symbol in state.engine.symbols:
+        detector = ai_models.get_model(f'regime_detector:{symbol}')
+        if detector is not None:
+            fit_pending(detector, _regime_path(symbol), lambda: _regime_history(symbol))
 
-reddit_client = None
-if all([config.get('reddit_client_id'), config.get('reddit_client_secret'), config.get('reddit_user_agent')]):
-    try:
-        reddit_client = praw.Reddit(
-            client_id=config['reddit_client_id'],
-            client_secret=config['reddit_client_secret'],
-            user_agent=config['reddit_user_agent']
-        )
-        logger.info("✅ Reddit API połączony")
-    except Exception as e:
-        logger.error(f"❌ Błąd Reddit API: {str(e)}")
+def on_job_error(job, error):
+    error_msg = f"❌ BŁĄD KRYTYCZNY ({job.name}): {str(error)}"
+    logger.critical(error_msg)
+    api.send_alert(error_msg)
 
 def main():
+    from utils.scheduler import Scheduler
+    if config is None:
+        bootstrap()
     logger.info("🚀 Start systemu AI Handlu Krypto (Testnet)")
-    trade_history = []
-    last_model_reset = datetime.now()
+    state = TradingState(config)
+    scheduler = Scheduler(on_error=on_job_error)
+    tracing_config = config.get('tracing', {})
+    if tracing_config.get('enabled'):
+        tracing.enable()
+        if tracing_config.get('port'):
+            tracing.start_http_server(tracing_config['port'], tracing_config.get('host', '127.0.0.1'))
+        scheduler.every('span_summary', tracing_config.get('summary_seconds', 300), tracing.log_summary,
+                        background=True)
     
-    if os.path.exists(config['drawdown_save_file']):
-        with open(config['drawdown_save_file'], 'r') as f:
-            state = json.load(f)
-            peak_portfolio = state['peak_portfolio']
-            last_portfolio = state['last_portfolio']
+    # decisions run on the scheduler thread, right after each candle closes;
+    # everything else is independent and must not delay them
+    if config.get('market_data_mode') == 'stream':
+        scheduler.on_demand('decision', lambda: run_cycle(state, scheduler))
+        scheduler.every('balance', config.get('balance_refresh_seconds', 60), lambda: refresh_balance(state),
+                        background=True, run_now=True)
+        start_stream(state, scheduler)
     else:
-        peak_portfolio = 10000.0
-        last_portfolio = 10000.0
+        scheduler.at_candle_close('decision', config['timeframe'], lambda: run_cycle(state, scheduler),
+                                  delay=config.get('candle_close_delay', 0.5), run_now=True, retry_after=60)
+    scheduler.every('sentiment', config.get('sentiment_refresh_seconds', 900), lambda: refresh_sentiment(state),
+                    background=True, run_now=True)
+    if state.correlation is not None:
+        scheduler.at_candle_close('correlation', config['timeframe'], lambda: refresh_correlation(state),
+                                  delay=config.get('candle_close_delay', 0.5), background=True, run_now=True)
+    scheduler.every('metrics', config.get('metrics_interval_seconds', 60), lambda: record_metrics(state),
+                    background=True)
+    scheduler.every('checkpoint', config.get('checkpoint_seconds', 600), lambda: save_drawdown_state(state),
+                    background=True)
+    scheduler.every('regime_fit', config.get('regime_fit_retry_seconds', 3600), lambda: fit_regime_detectors(state),
+                    background=True, run_now=True)
+    scheduler.every('model_reset', 3600, lambda: check_model_reset(state), background=True)
+    if config.get('dca_enabled'):
+        # placing orders touches trade_history, so DCA shares the decision thread
+        scheduler.every('dca', config.get('dca_interval', 3600), lambda: run_dca(state), retry_after=60)
     
-    while True:
-        try:
-            print("\n" + "="*50)
-            print(f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            balance = exchange.fetch_balance()
-            quote_currency = config['symbol'].split('/')[1]
-            base_currency = config['symbol'].split('/')[0]
-            current_portfolio = (
-                balance[base_currency]['free'] * exchange.fetch_ticker(config['symbol'])['last'] +
-                balance[quote_currency]['free']
-            )
-            
-            logger.info(f"📊 Portfel: {balance[base_currency]['free']} {base_currency} | {balance[quote_currency]['free']} {quote_currency}")
-            logger.info(f"💰 Aktualna wartość portfela: ${current_portfolio:.2f}")
-            
-            if current_portfolio > peak_portfolio:
-                peak_portfolio = current_portfolio
-                
-            drawdown = (peak_portfolio - current_portfolio) / peak_portfolio
-            logger.info(f"📉 Drawdown: {drawdown:.2%}")
-            
-            if drawdown > config['max_drawdown_percent'] / 100:
-                alert_msg = f"🚨 DRAWDOWN PRZEKROCZONY! {drawdown:.2%} > {config['max_drawdown_percent']}%"
-                logger.critical(alert_msg)
-                api.send_alert(alert_msg)
-                
-                with open(config['drawdown_save_file'], 'w') as f:
-                    json.dump({
-                        'peak_portfolio': peak_portfolio,
-                        'last_portfolio': current_portfolio
-                    }, f)
-                
-                time.sleep(86400)
-                sys.exit(1)
-            
-            if datetime.now().minute % 10 == 0:
-                with open(config['drawdown_save_file'], 'w') as f:
-                    json.dump({
-                        'peak_portfolio': peak_portfolio,
-                        'last_portfolio': current_portfolio
-                    }, f)
-            
-            if (datetime.now() - last_model_reset).days > config['model_reset_days']:
-                logger.info("🔄 Resetowanie modelu...")
-                last_model_reset = datetime.now()
-                logger.info("✅ Model został zresetowany")
-            
-            df = data_processing.get_market_data()
-            if df is None or len(df) < 50:
-                logger.error("❌ Brak wystarczających danych do analizy")
-                time.sleep(config['sleep_seconds'])
-                continue
-            
-            texts = []
-            texts.extend(api.fetch_news())
-            texts.extend(api.fetch_tweets())
-            texts.extend(api.fetch_reddit_posts())
-            sentiment = ai_models.analyze_sentiment(texts)
-            
-            risk_params = risk_management.get_risk_parameters(config)
-            new_risk = risk_management.manage_system_parameters(trade_history, df, sentiment, risk_agent)
-            risk_params['risk_percent'] = new_risk
-            
-            monitoring_agent = ai_models.monitor_system_health(monitoring_agent, df, trade_history)
-            
-            decision = ai_models.make_trading_decision(trade_history, df, sentiment, risk_params, trading_agent)
-            logger.info(f"💡 Decyzja: {decision}")
-            
-            if decision in ["BUY", "SELL"]:
-                current_price = exchange.fetch_ticker(config['symbol'])['last']
-                amount = risk_management.calculate_position_size(decision, current_price, trade_history, risk_params)
-                if amount > 0:
-                    api.execute_trade(decision, amount, trade_history, current_price)
-                else:
-                    logger.warning("❌ Nie wykonano transakcji - nieprawidłowy rozmiar pozycji")
-            
-            sleep_time = config['sleep_seconds']
-            logger.info(f"⏳ Czekam {sleep_time} sekund przed kolejną decyzją")
-            time.sleep(sleep_time)
-            
-        except Exception as e:
-            error_msg = f"❌ BŁĄD KRYTYCZNY: {str(e)}"
-            logger.critical(error_msg)
-            api.send_alert(error_msg)
-            time.sleep(60)
+    sys.exit(scheduler.run_forever())
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Handel Krypto (Testnet)")
+    parser.add_argument('--config', default=CONFIG_PATH, help="ścieżka do pliku konfiguracyjnego")
+    parser.add_argument('--warmup', action='store_true',
+                        help="wczytaj modele w wątkach w tle zanim wystartuje pierwszy cykl")
+    args = parser.parse_args()
+    bootstrap(args.config)
+    if args.warmup:
+        ai_models.warmup()
     main()
\ No newline at end of file
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+HOUR_MS = 3600 * 1000
+
+
+def synthetic_candles(n, seed=0, start=30000.0, t0=0):
+    """Seeded hourly GBM candles as a {column: array} dict."""
+    rng = np.random.default_rng(seed)
+    close = start * np.exp(np.cumsum(rng.normal(0.0, 0.006, n)))
+    open_ = np.concatenate([[start], close[:-1]])
+    spread = np.abs(rng.normal(0.0, 0.003, n)) * close
+    return {
+        'timestamp': t0 + np.arange(n, dtype=np.int64) * HOUR_MS,
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.gamma(2.0, 50.0, n),
+    }
+
+
+@pytest.fixture
+def candles():
+    return synthetic_candles
+
+
+@pytest.fixture
+def model_registry(monkeypatch):
+    """Empty ai_models loader registry, restored after the test."""
+    from utils import ai_models
+    for name in ('_loaders', '_models', '_failed', '_model_locks'):
+        monkeypatch.setattr(ai_models, name, {})
+    return ai_models
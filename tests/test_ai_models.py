@@ -0,0 +1,53 @@
+import pytest
+
+from utils import ai_models
+
+
+@pytest.fixture
+def registry(model_registry, monkeypatch):
+    """Isolated loader registry with a controllable clock."""
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(ai_models.time, 'monotonic', lambda: clock['now'])
+    return clock
+
+
+def test_failed_loader_is_retried_after_a_backoff(registry):
+    attempts = []
+
+    def flaky():
+        attempts.append(registry['now'])
+        if len(attempts) < 3:
+            raise ConnectionError('DNS lookup failed')
+        return 'exchange'
+
+    ai_models.register_loader('exchange', flaky)
+    assert ai_models.get_model('exchange') is None
+    # not retried on every call while backing off
+    assert ai_models.get_model('exchange') is None
+    assert len(attempts) == 1
+
+    registry['now'] += ai_models.FAILED_LOAD_RETRY
+    assert ai_models.get_model('exchange') is None
+    assert len(attempts) == 2
+    # the backoff doubles after a second consecutive failure
+    registry['now'] += ai_models.FAILED_LOAD_RETRY
+    assert ai_models.get_model('exchange') is None
+    assert len(attempts) == 2
+    registry['now'] += ai_models.FAILED_LOAD_RETRY
+    assert ai_models.get_model('exchange') == 'exchange'
+    assert ai_models.is_loaded('exchange')
+
+
+def test_backoff_is_capped(registry):
+    ai_models.register_loader('model', lambda: 1 / 0)
+    for _ in range(10):
+        ai_models.get_model('model')
+        registry['now'] += ai_models.FAILED_LOAD_RETRY_MAX
+    assert ai_models._failed['model'][1] == 10
+
+
+def test_register_loader_clears_the_failure(registry):
+    ai_models.register_loader('model', lambda: 1 / 0)
+    assert ai_models.get_model('model', default='fallback') == 'fallback'
+    ai_models.register_loader('model', lambda: 'fixed')
+    assert ai_models.get_model('model') == 'fixed'
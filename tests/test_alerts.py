@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from utils.alerts import AlertDispatcher, Channel
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, retry_after='0'):
+        self.status_code = status_code
+        self.headers = {'Retry-After': retry_after}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """Records every post; answers with the queued status codes, then 200."""
+
+    def __init__(self, statuses=(), gate=None):
+        self.posts = []
+        self.statuses = list(statuses)
+        self.gate = gate
+        self.lock = threading.Lock()
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        if self.gate is not None:
+            self.gate.wait(5)
+        with self.lock:
+            self.posts.append((url, json))
+            status = self.statuses.pop(0) if self.statuses else 200
+        return FakeResponse(status)
+
+
+def _channel(name='slack'):
+    return Channel(name, f"https://{name}.example/hook", lambda text: {'text': text}, rate=1000.0, burst=1000)
+
+
+@pytest.fixture
+def make_dispatcher():
+    dispatchers = []
+
+    def make(session, channels=None, **kwargs):
+        kwargs.setdefault('batch_window', 0.05)
+        dispatcher = AlertDispatcher(channels or [_channel()], session_factory=lambda: session, **kwargs)
+        dispatchers.append(dispatcher)
+        return dispatcher
+    yield make
+    for dispatcher in dispatchers:
+        dispatcher.stop(timeout=1.0)
+
+
+def test_flush_waits_for_delivery(make_dispatcher):
+    session = FakeSession()
+    dispatcher = make_dispatcher(session)
+    assert dispatcher.send('drawdown 12%')
+    assert dispatcher.flush(timeout=5)
+    assert session.posts == [('https://slack.example/hook', {'text': 'drawdown 12%'})]
+    assert dispatcher.stats['sent'] == 1
+
+
+def test_repeats_within_the_window_are_suppressed_and_counted(make_dispatcher):
+    session = FakeSession()
+    dispatcher = make_dispatcher(session, dedup_window=0.2)
+    assert dispatcher.send('exchange down')
+    assert not dispatcher.send('exchange down')
+    assert not dispatcher.send('exchange down')
+    assert dispatcher.flush(timeout=5)
+    assert dispatcher.stats['suppressed'] == 2
+
+    time.sleep(0.25)
+    assert dispatcher.send('exchange down')
+    assert dispatcher.flush(timeout=5)
+    texts = [payload['text'] for _, payload in session.posts]
+    assert texts == ['exchange down', 'exchange down (powtórzono 2× od poprzedniego alertu)']
+
+
+def test_messages_in_one_window_go_out_as_one_request_per_channel(make_dispatcher):
+    session = FakeSession()
+    dispatcher = make_dispatcher(session, channels=[_channel('slack'), _channel('telegram')], batch_window=0.3)
+    for i in range(3):
+        dispatcher.send(f"alert {i}")
+    assert dispatcher.flush(timeout=5)
+    assert sorted(url for url, _ in session.posts) == ['https://slack.example/hook', 'https://telegram.example/hook']
+    assert all(payload['text'] == 'alert 0\nalert 1\nalert 2' for _, payload in session.posts)
+
+
+def test_full_queue_drops_without_blocking_and_flush_still_returns(make_dispatcher):
+    gate = threading.Event()
+    session = FakeSession(gate=gate)
+    dispatcher = make_dispatcher(session, queue_size=1, batch_window=0.0)
+    results = [dispatcher.send(f"alert {i}") for i in range(50)]
+    assert not all(results)
+    assert dispatcher.stats['dropped'] >= 1
+    gate.set()
+    assert dispatcher.flush(timeout=5)
+    assert dispatcher._pending == 0
+
+
+def test_rate_limited_delivery_is_retried_not_dropped(make_dispatcher):
+    session = FakeSession(statuses=[429, 429])
+    dispatcher = make_dispatcher(session)
+    dispatcher.send('margin call')
+    assert dispatcher.flush(timeout=5)
+    assert len(session.posts) == 3
+    assert dispatcher.stats['retried'] == 2
+    assert dispatcher.stats['sent'] == 1
+    assert dispatcher.stats['failed'] == 0
+
+
+def test_delivery_fails_after_max_retries(make_dispatcher):
+    session = FakeSession(statuses=[429] * 10)
+    dispatcher = make_dispatcher(session, max_retries=1)
+    dispatcher.send('margin call')
+    assert dispatcher.flush(timeout=5)
+    assert len(session.posts) == 2
+    assert dispatcher.stats['failed'] == 1
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from utils.correlation import RollingCorrelation
+
+ASSETS = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+
+
+def _correlated_candles(n, seed=0):
+    """Closes of three assets driven partly by a common factor."""
+    rng = np.random.default_rng(seed)
+    common = rng.normal(0.0, 0.01, n)
+    ts = np.arange(n, dtype=np.int64) * 3600 * 1000
+    candles = {}
+    for j, (asset, beta) in enumerate(zip(ASSETS, (1.0, 0.8, -0.5))):
+        returns = beta * common + rng.normal(0.0, 0.006, n)
+        candles[asset] = {'timestamp': ts, 'close': 100.0 * (j + 1) * np.exp(np.cumsum(returns))}
+    return candles
+
+
+def _window_returns(candles, end, window):
+    closes = np.column_stack([candles[a]['close'][:end] for a in ASSETS])
+    return np.diff(np.log(closes), axis=0)[-window:]
+
+
+def _slice(candles, end):
+    return {a: {c: v[:end] for c, v in cols.items()} for a, cols in candles.items()}
+
+
+def test_incremental_correlation_matches_corrcoef():
+    candles = _correlated_candles(400, seed=1)
+    window = 50
+    rolling = RollingCorrelation(ASSETS, window=window)
+    rolling.update(_slice(candles, 20))
+    for end in range(21, 401):
+        rolling.update(_slice(candles, end))
+        returns = _window_returns(candles, end, window)
+        np.testing.assert_allclose(rolling.correlation(), np.corrcoef(returns, rowvar=False), atol=1e-9)
+        np.testing.assert_allclose(rolling.covariance(), np.cov(returns, rowvar=False), atol=1e-12)
+    assert rolling.n == window
+
+
+def test_long_run_stays_exact_across_resyncs():
+    candles = _correlated_candles(200, seed=2)
+    window = 10
+    rolling = RollingCorrelation(ASSETS, window=window)
+    # 8 * window pushes trigger a resync; run past several of them
+    for end in range(3, 201):
+        rolling.update(_slice(candles, end))
+    returns = _window_returns(candles, 200, window)
+    np.testing.assert_allclose(rolling.correlation(), np.corrcoef(returns, rowvar=False), atol=1e-9)
+
+
+def test_assets_are_aligned_on_common_timestamps():
+    candles = _correlated_candles(120, seed=3)
+    # SOL misses a few bars; only timestamps shared by every asset count
+    keep = np.ones(120, dtype=bool)
+    keep[[30, 31, 77]] = False
+    candles['SOL/USDT'] = {c: v[keep] for c, v in candles['SOL/USDT'].items()}
+    rolling = RollingCorrelation(ASSETS, window=500).update(candles)
+
+    closes = np.column_stack([candles['BTC/USDT']['close'][keep], candles['ETH/USDT']['close'][keep],
+                              candles['SOL/USDT']['close']])
+    expected = np.corrcoef(np.diff(np.log(closes), axis=0), rowvar=False)
+    np.testing.assert_allclose(rolling.correlation(), expected, atol=1e-9)
+    assert rolling.n == keep.sum() - 1
+
+
+def test_gap_before_the_saved_bar_rebuilds():
+    candles = _correlated_candles(300, seed=4)
+    rolling = RollingCorrelation(ASSETS, window=40).update(_slice(candles, 100))
+    # the bar the state ended on is no longer in the data
+    later = {a: {c: v[150:] for c, v in cols.items()} for a, cols in candles.items()}
+    rolling.update(later)
+    returns = np.diff(np.log(np.column_stack([later[a]['close'] for a in ASSETS])), axis=0)[-40:]
+    np.testing.assert_allclose(rolling.correlation(), np.corrcoef(returns, rowvar=False), atol=1e-9)
+
+
+def test_get_and_to_dict():
+    candles = _correlated_candles(100, seed=5)
+    rolling = RollingCorrelation(ASSETS, window=60).update(candles)
+    corr = rolling.correlation()
+    assert rolling.get('BTC/USDT', 'ETH/USDT') == pytest.approx(corr[0, 1])
+    assert rolling.get('BTC/USDT', 'SOL/USDT') < 0
+    doc = rolling.to_dict()
+    assert doc['assets'] == ASSETS
+    assert doc['samples'] == 60
+    assert doc['timestamp'] == int(candles['BTC/USDT']['timestamp'][-1])
+
+
+def test_too_few_bars_gives_nan_covariance_and_identity_correlation():
+    rolling = RollingCorrelation(ASSETS, window=10)
+    assert np.isnan(rolling.covariance()).all()
+    np.testing.assert_array_equal(rolling.correlation(), np.eye(3))
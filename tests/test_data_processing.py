@@ -0,0 +1,43 @@
+from utils.candle_store import ColumnarCandleStore
+from utils.data_processing import sync_candles
+from utils.sim_exchange import SimExchange
+
+SYMBOL = 'BTC/USDT'
+
+
+def _sim(candles, n):
+    return SimExchange({SYMBOL: candles(n, seed=1)}, '1h')
+
+
+def test_history_shorter_than_limit_is_backfilled_once(candles, tmp_path):
+    sim = _sim(candles, 600)
+    store = ColumnarCandleStore(str(tmp_path))
+    sync_candles(sim, SYMBOL, '1h', 1000, store)
+    assert store.count(SYMBOL, '1h') == 600
+    assert store.history_start(SYMBOL, '1h') == store.first_timestamp(SYMBOL, '1h')
+
+    calls = sim.calls['fetch_ohlcv']
+    sync_candles(sim, SYMBOL, '1h', 1000, store)
+    # incremental: one request for candles newer than the last stored one
+    assert sim.calls['fetch_ohlcv'] == calls + 1
+    assert store.count(SYMBOL, '1h') == 600
+
+
+def test_incremental_sync_appends_new_closed_candles(candles, tmp_path):
+    sim = SimExchange({SYMBOL: candles(300, seed=2)}, '1h', start=250)
+    store = ColumnarCandleStore(str(tmp_path))
+    sync_candles(sim, SYMBOL, '1h', 1000, store)
+    assert store.count(SYMBOL, '1h') == 251
+    sim.advance(3)
+    calls = sim.calls['fetch_ohlcv']
+    sync_candles(sim, SYMBOL, '1h', 1000, store)
+    assert sim.calls['fetch_ohlcv'] == calls + 1
+    assert store.count(SYMBOL, '1h') == 254
+
+
+def test_full_history_does_not_record_a_start(candles, tmp_path):
+    sim = _sim(candles, 600)
+    store = ColumnarCandleStore(str(tmp_path))
+    sync_candles(sim, SYMBOL, '1h', 200, store)
+    assert store.count(SYMBOL, '1h') == 200
+    assert store.history_start(SYMBOL, '1h') is None
@@ -0,0 +1,88 @@
+import pytest
+
+from utils.exchange_session import ExchangeSession, RateLimiter
+
+
+class RateLimitExceeded(Exception):
+    code = 429
+
+
+class FlakyExchange:
+    markets = {'BTC/USDT': {}}
+
+    def __init__(self, failures, error=RateLimitExceeded):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def load_markets(self, reload=False):
+        return self.markets
+
+    def fetch_ticker(self, symbol):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error(f"binance {symbol} request rejected")
+        return {'symbol': symbol, 'last': 100.0}
+
+
+def _session(exchange, **kwargs):
+    return ExchangeSession(exchange, RateLimiter(rate=1000.0, burst=1000.0), retry_delay=0.01, **kwargs)
+
+
+def test_rate_limited_call_is_retried_after_backing_off():
+    exchange = FlakyExchange(failures=2)
+    session = _session(exchange)
+    assert session.fetch_ticker('BTC/USDT')['last'] == 100.0
+    assert exchange.calls == 3
+
+
+def test_gives_up_after_max_retries_with_the_exchange_error():
+    exchange = FlakyExchange(failures=10)
+    session = _session(exchange, max_retries=2)
+    with pytest.raises(RateLimitExceeded):
+        session.fetch_ticker('BTC/USDT')
+    assert exchange.calls == 3
+
+
+def test_other_errors_are_not_retried():
+    exchange = FlakyExchange(failures=1, error=ValueError)
+    with pytest.raises(ValueError):
+        _session(exchange).fetch_ticker('BTC/USDT')
+    assert exchange.calls == 1
+
+
+def test_rate_limit_is_recognized_by_message():
+    class ExchangeError(Exception):
+        pass
+
+    exchange = FlakyExchange(failures=1, error=lambda msg: ExchangeError(f"{msg}: rate limit exceeded"))
+    assert _session(exchange).fetch_ticker('BTC/USDT')['last'] == 100.0
+    assert exchange.calls == 2
+
+
+class OrderExchange(FlakyExchange):
+    def create_market_buy_order(self, symbol, amount):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error(f"binance {symbol} order rejected: rate limit")
+        return {'id': '1', 'amount': amount}
+
+
+def test_orders_are_retried_once_at_most():
+    exchange = OrderExchange(failures=5)
+    with pytest.raises(RateLimitExceeded):
+        _session(exchange).create_market_buy_order('BTC/USDT', 0.1)
+    assert exchange.calls == 2
+
+    exchange = OrderExchange(failures=1)
+    assert _session(exchange).create_market_buy_order('BTC/USDT', 0.1)['id'] == '1'
+
+
+def test_orders_are_not_retried_on_a_rate_limit_message_alone():
+    class ExchangeError(Exception):
+        pass
+
+    exchange = OrderExchange(failures=1, error=ExchangeError)
+    with pytest.raises(ExchangeError):
+        _session(exchange).create_market_buy_order('BTC/USDT', 0.1)
+    assert exchange.calls == 1
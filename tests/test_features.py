@@ -0,0 +1,81 @@
+import math
+
+import pytest
+
+from utils.features import FeaturePipeline, compute_features
+
+HOUR_MS = 3600 * 1000
+
+
+def _assert_latest_matches(latest, arrays, i):
+    for name, values in arrays.items():
+        expected = values[i]
+        if math.isnan(expected):
+            assert math.isnan(latest[name]), name
+        else:
+            assert latest[name] == pytest.approx(expected, rel=1e-9, abs=1e-12), name
+
+
+def test_incremental_updates_match_full_recompute(candles):
+    data = candles(400, seed=1)
+    arrays = compute_features(data)
+    pipeline = FeaturePipeline('1h')
+    # rebuild from the first 100 bars, then one new closed candle per update
+    for end in range(100, 401):
+        window = {c: v[:end] for c, v in data.items()}
+        latest = pipeline.update(window, now_ms=int(window['timestamp'][-1]) + HOUR_MS)
+        _assert_latest_matches(latest, arrays, end - 1)
+    assert pipeline.n == 400
+
+
+def test_update_from_the_first_bar_matches_warmup_nans(candles):
+    data = candles(60, seed=2)
+    arrays = compute_features(data)
+    pipeline = FeaturePipeline('1h')
+    for end in range(1, 61):
+        window = {c: v[:end] for c, v in data.items()}
+        latest = pipeline.update(window, now_ms=int(window['timestamp'][-1]) + HOUR_MS)
+        _assert_latest_matches(latest, arrays, end - 1)
+
+
+def test_forming_candle_is_ignored(candles):
+    data = candles(200, seed=3)
+    pipeline = FeaturePipeline('1h')
+    # the last bar closes only at its timestamp + 1h
+    latest = pipeline.update(data, now_ms=int(data['timestamp'][-1]) + HOUR_MS // 2)
+    assert pipeline.last_ts == data['timestamp'][-2]
+    _assert_latest_matches(latest, compute_features(data), 198)
+
+
+def test_saved_state_resumes_incrementally(candles, tmp_path):
+    data = candles(300, seed=4)
+    arrays = compute_features(data)
+    path = str(tmp_path / 'features.json')
+    first = FeaturePipeline('1h')
+    first.update({c: v[:250] for c, v in data.items()}, now_ms=int(data['timestamp'][249]) + HOUR_MS)
+    first.save(path)
+
+    restored = FeaturePipeline.load(path, '1h')
+    assert restored.last_ts == first.last_ts
+    latest = restored.update(data, now_ms=int(data['timestamp'][-1]) + HOUR_MS)
+    _assert_latest_matches(latest, arrays, 299)
+
+
+def test_gap_in_the_data_rebuilds_the_state(candles):
+    data = candles(300, seed=5)
+    pipeline = FeaturePipeline('1h')
+    pipeline.update({c: v[:100] for c, v in data.items()}, now_ms=int(data['timestamp'][99]) + HOUR_MS)
+    # the next window starts well after the last processed bar
+    later = {c: v[150:] for c, v in data.items()}
+    latest = pipeline.update(later, now_ms=int(data['timestamp'][-1]) + HOUR_MS)
+    _assert_latest_matches(latest, compute_features(later), len(later['close']) - 1)
+
+
+def test_load_with_changed_params_starts_fresh(candles, tmp_path):
+    data = candles(100, seed=6)
+    path = str(tmp_path / 'features.json')
+    pipeline = FeaturePipeline('1h')
+    pipeline.update(data, now_ms=int(data['timestamp'][-1]) + HOUR_MS)
+    pipeline.save(path)
+    restored = FeaturePipeline.load(path, '1h', params={'rsi_period': 7})
+    assert restored.last_ts is None
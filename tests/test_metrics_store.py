@@ -0,0 +1,19 @@
+from utils.metrics_store import MetricsStore
+
+MINUTE = 60 * 1000
+DAY = 86400 * 1000
+
+
+def test_record_prunes_expired_rollup_rows(tmp_path):
+    store = MetricsStore(str(tmp_path / 'metrics.db'), retention={'1m': DAY})
+    start = 1_700_000_000_000 - 1_700_000_000_000 % DAY
+    for minute in range(0, 2 * 24 * 60, 30):
+        store.record(1000.0 + minute, timestamp=start + minute * MINUTE)
+
+    last = start + (2 * 24 * 60 - 30) * MINUTE
+    minutes = store.series('1m', since=0, limit=10_000)['bucket']
+    assert minutes[0] >= last - DAY
+    assert minutes[-1] == last
+    # the coarser rollups keep their default retention
+    assert store.series('1h', since=0, limit=10_000)['bucket'][0] == start
+    assert store.series('1d', since=0)['bucket'] == [start, start + DAY]
@@ -0,0 +1,48 @@
+from utils import ai_models
+from utils.features import compute_features
+from utils.regime import REGIMES, RegimeDetector, fit_pending
+
+
+def _latest(features):
+    return {k: float(v[-1]) for k, v in features.items()}
+
+
+def _no_refit():
+    raise AssertionError("the cached detector should have been loaded")
+
+
+def test_short_history_leaves_an_unfitted_detector_that_fits_later(candles, tmp_path):
+    path = str(tmp_path / 'regime.pkl')
+    history = {'candles': candles(50, seed=1)}
+    detector = RegimeDetector.load_or_fit(path, lambda: history['candles'])
+    assert not detector.is_fitted()
+    data = history['candles']
+    assert detector.classify(_latest(compute_features(data)), data['close']) is None
+
+    history['candles'] = candles(500, seed=1)
+    assert fit_pending(detector, path, lambda: history['candles']) is detector
+    assert detector.is_fitted()
+    data = history['candles']
+    assert detector.classify(_latest(compute_features(data)), data['close'])['label'] in REGIMES.values()
+    # the next start loads the saved fit instead of fitting again
+    reloaded = RegimeDetector.load_or_fit(path, _no_refit)
+    assert reloaded.trend_threshold == detector.trend_threshold
+
+
+def test_failed_fit_does_not_poison_the_model_registry(candles, tmp_path, model_registry):
+    path = str(tmp_path / 'regime.pkl')
+    ai_models.register_loader('regime_detector:TEST', lambda: RegimeDetector.load_or_fit(path, lambda: candles(10)))
+    detector = ai_models.get_model('regime_detector:TEST')
+    assert detector is not None and not detector.is_fitted()
+    fit_pending(detector, path, lambda: candles(300, seed=2))
+    assert ai_models.get_model('regime_detector:TEST').is_fitted()
+
+
+def test_pickle_from_another_module_layout_is_refitted(candles, tmp_path):
+    path = tmp_path / 'regime.pkl'
+    # a pickle referring to a module that no longer exists
+    path.write_bytes(b"cno_such_module\nRegimeDetector\n.")
+    detector = RegimeDetector.load_or_fit(str(path), lambda: candles(300, seed=3))
+    assert detector.is_fitted()
+    assert RegimeDetector.load(str(path)).trend_threshold == detector.trend_threshold
+
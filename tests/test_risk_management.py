@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from utils.risk_management import amount_limits, calculate_position_size, kelly_cap, position_sizes
+
+
+def test_risked_notional_without_atr():
+    # 1% of 10,000 = 100 USDT at 50 -> 2 units
+    amount = position_sizes(True, [50.0], equity=10000.0, risk_percent=1.0, max_size=100.0)
+    assert amount[0] == pytest.approx(2.0)
+
+
+def test_atr_targeting_sizes_the_stop_loss_to_the_risk():
+    # a stop 2 ATRs (2 * 2%) away loses exactly 100 USDT
+    amount = position_sizes(True, [100.0], equity=10000.0, risk_percent=1.0, max_size=100.0,
+                            atr_pct=0.02, stop_multiple=2.0)
+    assert amount[0] == pytest.approx(25.0)
+    assert amount[0] * 100.0 * 0.04 == pytest.approx(100.0)
+
+
+def test_kelly_caps_buys_only():
+    kwargs = dict(equity=10000.0, risk_percent=1.0, max_size=1000.0, atr_pct=0.005, kelly=0.2)
+    # volatility targeting alone would trade 10,000 USDT; Kelly allows 20% of equity
+    buy, sell = position_sizes([True, False], [100.0, 100.0], **kwargs)
+    assert buy == pytest.approx(20.0)
+    assert sell == pytest.approx(100.0)
+
+
+def test_nan_kelly_means_no_cap():
+    amount = position_sizes(True, [100.0], equity=10000.0, risk_percent=1.0, max_size=1000.0,
+                            atr_pct=0.005, kelly=np.nan)
+    assert amount[0] == pytest.approx(100.0)
+
+
+def test_caps_by_max_size_and_available_funds():
+    # buys are capped by quote funds, sells by the base currency held
+    amounts = position_sizes([True, True, False], [10.0, 10.0, 10.0], equity=10000.0, risk_percent=5.0,
+                             max_size=[3.0, 100.0, 100.0], available=[1e9, 250.0, 7.5])
+    np.testing.assert_allclose(amounts, [3.0, 25.0, 7.5])
+
+
+def test_rounds_down_to_the_lot_step():
+    amounts = position_sizes(True, [3.0, 3.0, 1.0], equity=100.0, risk_percent=[1.0, 1.0, 30.0],
+                             max_size=100.0, step=[0.01, 0.1, 0.1])
+    np.testing.assert_allclose(amounts, [0.33, 0.3, 30.0])
+    # 0.3 / 0.1 is 2.9999999999999996 in floating point and must not floor to 0.2
+    amount = position_sizes(True, [1.0], equity=100.0, risk_percent=0.3, max_size=100.0, step=0.1)
+    assert amount[0] == pytest.approx(0.3)
+
+
+def test_orders_below_exchange_minimums_are_zeroed():
+    amounts = position_sizes(True, [100.0, 100.0, 100.0], equity=1000.0, risk_percent=1.0, max_size=1.0,
+                             min_amount=[0.2, 0.0, 0.0], min_cost=[0.0, 11.0, 10.0])
+    # 0.1 units = 10 USDT
+    np.testing.assert_allclose(amounts, [0.0, 0.0, 0.1])
+
+
+def test_never_negative_or_nan():
+    amounts = position_sizes(True, [0.0, 100.0], equity=1000.0, risk_percent=1.0, max_size=1.0,
+                             available=[np.nan, -5.0])
+    assert np.all(amounts == 0.0)
+
+
+def test_kelly_cap_needs_enough_closed_trades():
+    history = [{'profit': 1.0, 'cost': 10.0}] * 5
+    assert kelly_cap(history, min_trades=20) is None
+    # 60% winners of +10%, losers of -5%: Kelly = 0.6 - 0.4 / 2 = 0.4, half of it
+    history = [{'profit': 1.0, 'cost': 10.0}] * 12 + [{'profit': -0.5, 'cost': 10.0}] * 8
+    assert kelly_cap(history, fraction=0.5, min_trades=20) == pytest.approx(0.2)
+    assert kelly_cap([{'profit': -1.0, 'cost': 10.0}] * 20) == 0.0
+
+
+def test_amount_limits_from_market_metadata():
+    market = {'precision': {'amount': 0.001}, 'limits': {'amount': {'min': 0.001}, 'cost': {'min': 5.0}}}
+    assert amount_limits(market) == (0.001, 0.001, 5.0)
+    # DECIMAL_PLACES precision mode: the precision is a number of digits
+    assert amount_limits({'precision': {'amount': 3}}, precision_mode=2) == (0.001, 0.0, 0.0)
+    assert amount_limits(None) == (0.0, 0.0, 0.0)
+
+
+def test_calculate_position_size_uses_risk_params():
+    params = {'risk_percent': 1.0, 'max_position_size': 1.0, 'equity': 10000.0, 'atr_pct': 0.02,
+              'step': 0.001, 'min_amount': 0.001, 'min_cost': 5.0}
+    assert calculate_position_size('BUY', 30000.0, [], params) == pytest.approx(0.083)
@@ -0,0 +1,142 @@
+import threading
+import types
+
+import pytest
+
+from utils import scheduler as scheduler_module
+from utils.scheduler import Scheduler, next_boundary
+
+HOUR = 3600.0
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(10 * HOUR + 100.0)
+    monkeypatch.setattr(scheduler_module, 'time', types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+def test_next_boundary():
+    assert next_boundary('1h', now=5 * HOUR + 10) == 6 * HOUR
+    assert next_boundary('1h', now=5 * HOUR + 10, delay=0.5) == 6 * HOUR + 0.5
+    # a time exactly on a boundary waits for the next one
+    assert next_boundary('1h', now=5 * HOUR) == 6 * HOUR
+    assert next_boundary('15m', now=5 * HOUR + 1) == 5 * HOUR + 900
+
+
+def test_candle_close_job_runs_after_the_boundary(clock):
+    sched = Scheduler()
+    runs = []
+    job = sched.at_candle_close('decision', '1h', lambda: runs.append(clock.now), delay=0.5)
+
+    wait = sched.run_pending()
+    assert runs == []
+    assert wait == pytest.approx(11 * HOUR + 0.5 - clock.now)
+
+    clock.now = 11 * HOUR + 0.4
+    sched.run_pending()
+    assert runs == []
+
+    clock.now = 11 * HOUR + 0.5
+    sched.run_pending()
+    assert runs == [11 * HOUR + 0.5]
+    assert job.last_latency == pytest.approx(0.5)
+    # rescheduled for the next candle, not `interval` seconds later
+    assert sched.run_pending() == pytest.approx(12 * HOUR + 0.5 - clock.now)
+
+
+def test_late_wakeup_runs_once_and_realigns(clock):
+    sched = Scheduler()
+    runs = []
+    sched.at_candle_close('decision', '1h', lambda: runs.append(clock.now), delay=0.5)
+    # the process slept through three candle closes
+    clock.now = 14 * HOUR + 10
+    sched.run_pending()
+    assert len(runs) == 1
+    assert sched.run_pending() == pytest.approx(15 * HOUR + 0.5 - clock.now)
+
+
+def test_due_jobs_run_in_due_time_then_registration_order(clock):
+    sched = Scheduler()
+    order = []
+    sched.every('b', 60, lambda: order.append('b'))
+    sched.every('c', 30, lambda: order.append('c'))
+    sched.every('a', 60, lambda: order.append('a'))
+    sched.at_candle_close('close', '1h', lambda: order.append('close'), delay=0.0)
+    clock.now += 3600
+    sched.run_pending()
+    assert order == ['c', 'b', 'a', 'close']
+
+
+def test_interval_job_is_rescheduled_from_its_finish(clock):
+    sched = Scheduler()
+    runs = []
+
+    def slow():
+        runs.append(clock.now)
+        clock.now += 5
+
+    sched.every('metrics', 60, slow, run_now=True)
+    sched.run_pending()
+    assert runs == [10 * HOUR + 100]
+    assert sched.run_pending() == pytest.approx(60)
+
+
+def test_failed_job_is_retried_after_retry_after(clock):
+    errors = []
+    sched = Scheduler(on_error=lambda job, e: errors.append((job.name, str(e))))
+    calls = []
+
+    def flaky():
+        calls.append(clock.now)
+        if len(calls) == 1:
+            raise RuntimeError('exchange down')
+
+    sched.at_candle_close('decision', '1h', flaky, delay=0.0, run_now=True, retry_after=30)
+    sched.run_pending()
+    assert errors == [('decision', 'exchange down')]
+    assert sched.run_pending() == pytest.approx(30)
+    clock.now += 30
+    sched.run_pending()
+    assert len(calls) == 2
+    assert sched.run_pending() == pytest.approx(11 * HOUR - clock.now)
+
+
+def test_on_demand_job_runs_only_when_triggered(clock):
+    sched = Scheduler()
+    runs = []
+    sched.on_demand('decision', lambda: runs.append(clock.now))
+    assert sched.run_pending() is None
+    sched.trigger('decision', boundary=clock.now - 1)
+    sched.run_pending()
+    assert runs == [clock.now]
+    # on-demand jobs are not rescheduled
+    assert sched.run_pending() is None
+
+
+def test_running_background_job_is_skipped_not_stacked(clock):
+    sched = Scheduler(max_workers=2)
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def slow():
+        runs.append(clock.now)
+        started.set()
+        release.wait(5)
+
+    sched.every('sentiment', 60, slow, background=True, run_now=True)
+    sched.run_pending()
+    assert started.wait(5)
+    clock.now += 60
+    sched.run_pending()
+    release.set()
+    sched._pool.shutdown(wait=True)
+    assert len(runs) == 1
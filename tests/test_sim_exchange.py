@@ -0,0 +1,97 @@
+import pytest
+
+from utils.sim_exchange import SimExchange
+
+HOUR_MS = 3600 * 1000
+SYMBOL = 'BTC/USDT'
+
+
+def _rows(n=10, t0=0):
+    # close = 100 + i, volume = 10 for bar i
+    return [[t0 + i * HOUR_MS, 100.0 + i, 101.0 + i, 99.0 + i, 100.0 + i, 10.0] for i in range(n)]
+
+
+def _sim(**kwargs):
+    kwargs.setdefault('start', 4)
+    return SimExchange({SYMBOL: _rows()}, '1h', rebase=False, seed=0, **kwargs)
+
+
+def test_only_closed_bars_are_visible_and_advance_reveals_the_next():
+    sim = _sim()
+    candles = sim.fetch_ohlcv(SYMBOL, '1h')
+    assert [c[0] for c in candles] == [i * HOUR_MS for i in range(5)]
+    assert sim.fetch_ticker(SYMBOL)['last'] == 104.0
+    sim.advance()
+    assert sim.fetch_ohlcv(SYMBOL, '1h', limit=2)[-1][4] == 105.0
+    assert sim.fetch_ohlcv(SYMBOL, '1h', since=3 * HOUR_MS) == _rows()[3:6]
+
+
+def test_rebase_shifts_the_last_bar_to_the_latest_closed_hour():
+    sim = SimExchange({SYMBOL: _rows()}, '1h')
+    last = sim.fetch_ohlcv(SYMBOL, '1h')[-1][0]
+    assert (last + HOUR_MS) % HOUR_MS == 0
+    assert sim.milliseconds() == last + HOUR_MS
+
+
+def test_market_buy_and_sell_update_balances_with_fees():
+    sim = _sim(balance={'USDT': 1000.0}, fee_rate=0.001)
+    order = sim.create_market_buy_order(SYMBOL, 2.0)
+    assert order['status'] == 'closed'
+    assert order['average'] == 104.0
+    assert order['cost'] == pytest.approx(208.0)
+    assert order['fee']['cost'] == pytest.approx(0.208)
+    balance = sim.fetch_balance()
+    assert balance['free']['BTC'] == pytest.approx(2.0)
+    assert balance['USDT']['free'] == pytest.approx(1000.0 - 208.0 - 0.208)
+
+    sim.advance()
+    sim.create_market_sell_order(SYMBOL, 2.0)
+    assert sim.fetch_balance()['free']['BTC'] == pytest.approx(0.0)
+    assert sim.fetch_balance()['free']['USDT'] == pytest.approx(1000.0 - 208.208 + 210.0 - 0.21)
+    assert sim.fetch_order(order['id'], SYMBOL) == order
+
+
+def test_slippage_moves_fills_against_the_taker():
+    sim = _sim(slippage_bps=50)
+    assert sim.create_market_buy_order(SYMBOL, 1.0)['average'] == pytest.approx(104.0 * 1.005)
+    assert sim.create_market_sell_order(SYMBOL, 1.0)['average'] == pytest.approx(104.0 * 0.995)
+
+
+def test_volume_participation_caps_the_fill():
+    sim = _sim(max_participation=0.1)
+    order = sim.create_order(SYMBOL, 'market', 'buy', 5.0)
+    assert order['filled'] == pytest.approx(1.0)
+    assert order['remaining'] == pytest.approx(4.0)
+    assert order['status'] == 'canceled'
+    assert sim.fetch_balance()['free']['BTC'] == pytest.approx(1.0)
+
+
+def test_insufficient_funds_and_minimum_amount_raise():
+    sim = _sim(balance={'USDT': 100.0})
+    with pytest.raises(Exception, match='insufficient balance'):
+        sim.create_market_buy_order(SYMBOL, 1.0)
+    with pytest.raises(Exception, match='insufficient balance'):
+        sim.create_market_sell_order(SYMBOL, 0.5)
+    with pytest.raises(Exception, match='minimum amount'):
+        sim.create_market_buy_order(SYMBOL, 0.000001)
+    assert sim.fetch_balance()['free']['USDT'] == 100.0
+
+
+def test_rate_limit_answers_429():
+    sim = _sim(rate_limit=3, rate_window=60.0)
+    for _ in range(3):
+        sim.fetch_ticker(SYMBOL)
+    with pytest.raises(Exception) as excinfo:
+        sim.fetch_ticker(SYMBOL)
+    assert excinfo.value.code == 429
+    assert sim.calls['fetch_ticker'] == 4
+
+
+def test_markets_and_unknown_symbols():
+    sim = _sim()
+    market = sim.load_markets()[SYMBOL]
+    assert (market['base'], market['quote']) == ('BTC', 'USDT')
+    with pytest.raises(Exception, match='does not have market symbol'):
+        sim.fetch_ticker('DOGE/USDT')
+    with pytest.raises(Exception, match='1h candles only'):
+        sim.fetch_ohlcv(SYMBOL, '5m')
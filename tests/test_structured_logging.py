@@ -0,0 +1,113 @@
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.multi_symbol import MultiSymbolEngine
+from utils.structured_logging import ElasticsearchBulkHandler, _StructuredQueueHandler, cycle_context
+
+
+class BulkServer:
+    """Local _bulk endpoint that answers `status` and records the documents."""
+
+    def __init__(self):
+        self.status = 200
+        self.delay = 0.0
+        self.docs = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+                time.sleep(server.delay)
+                if server.status == 200:
+                    lines = body.splitlines()
+                    server.docs.extend(json.loads(line)['message'] for line in lines[1::2])
+                self.send_response(server.status)
+                self.end_headers()
+                self.wfile.write(b'{"errors": false}')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+@pytest.fixture
+def server():
+    server = BulkServer()
+    yield server
+    server.close()
+
+
+def _record(message):
+    return logging.LogRecord('test', logging.INFO, __file__, 0, message, (), None)
+
+
+def test_emit_never_waits_for_the_cluster(server):
+    server.delay = 1.0
+    handler = ElasticsearchBulkHandler(server.url, batch_size=2, flush_interval=60)
+    try:
+        start = time.perf_counter()
+        for i in range(10):
+            handler.emit(_record(f"line {i}"))
+        assert time.perf_counter() - start < 0.5
+    finally:
+        server.delay = 0.0
+        handler.close()
+    assert server.docs == [f"line {i}" for i in range(10)]
+
+
+def test_failed_batches_are_kept_for_the_next_attempt(server, capsys):
+    server.status = 503
+    handler = ElasticsearchBulkHandler(server.url, batch_size=100, flush_interval=60)
+    try:
+        for i in range(3):
+            handler.emit(_record(f"line {i}"))
+        handler.flush()
+        assert server.docs == []
+        assert 'ponowię później' in capsys.readouterr().err
+        server.status = 200
+        handler.emit(_record('line 3'))
+        handler.flush()
+        assert server.docs == ['line 0', 'line 1', 'line 2', 'line 3']
+    finally:
+        handler.close()
+
+
+def test_full_buffer_drops_the_oldest_records(server, capsys):
+    server.status = 503
+    handler = ElasticsearchBulkHandler(server.url, batch_size=100, flush_interval=60, max_buffer=3)
+    try:
+        for i in range(5):
+            handler.emit(_record(f"line {i}"))
+        server.status = 200
+        handler.flush()
+        assert server.docs == ['line 2', 'line 3', 'line 4']
+        assert 'pominięto 2 najstarszych' in capsys.readouterr().err
+    finally:
+        handler.close()
+
+
+def test_pool_tasks_keep_the_cycle_id():
+    engine = MultiSymbolEngine({'symbol': 'BTC/USDT', 'timeframe': '1h'}, max_workers=2)
+    records = queue.Queue()
+    handler = _StructuredQueueHandler(records)
+    logger = logging.getLogger('test.cycle')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        with cycle_context('abc123'):
+            engine._map(lambda i: logger.info(f"task {i}"), range(4))
+    finally:
+        logger.removeHandler(handler)
+    assert sorted(records.get_nowait().cycle_id for _ in range(4)) == ['abc123'] * 4
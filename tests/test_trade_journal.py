@@ -0,0 +1,90 @@
+import pytest
+
+from utils.trade_journal import TradeJournal
+
+SYMBOL = 'BTC/USDT'
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = TradeJournal(str(tmp_path / 'trades.db'))
+    yield journal
+    journal.close()
+
+
+def test_partial_sells_consume_lots_first_in_first_out(journal):
+    first = journal.record_buy(SYMBOL, 1.0, 100.0, 100.0, timestamp=1)
+    second = journal.record_buy(SYMBOL, 2.0, 110.0, 220.0, timestamp=2)
+
+    # 0.5 of the first lot at 120: 60 - 50
+    assert journal.record_sell(SYMBOL, 0.5, 120.0, 60.0, timestamp=3) == pytest.approx(10.0)
+    assert journal.oldest_open_lot(SYMBOL)['id'] == first
+
+    # the rest of the first lot (basis 50) and 0.5 of the second (basis 55) at 130
+    assert journal.record_sell(SYMBOL, 1.0, 130.0, 130.0, timestamp=4) == pytest.approx(25.0)
+    lots = journal.open_lots(SYMBOL)
+    assert [lot['id'] for lot in lots] == [second]
+    assert lots[0]['remaining'] == pytest.approx(1.5)
+    assert lots[0]['realized'] == pytest.approx(65.0 - 55.0)
+    assert journal.position(SYMBOL) == pytest.approx(1.5)
+
+    # close the second lot at a loss: 1.5 * 100 - 165
+    assert journal.record_sell(SYMBOL, 1.5, 100.0, 150.0, timestamp=5) == pytest.approx(-15.0)
+    assert journal.open_lots(SYMBOL) == []
+    assert journal.oldest_open_lot(SYMBOL) is None
+
+
+def test_realized_pnl_is_stored_with_the_sell(journal):
+    journal.record_buy(SYMBOL, 1.0, 100.0, 100.0, timestamp=1)
+    journal.record_sell(SYMBOL, 0.4, 150.0, 60.0, timestamp=2)
+    sells = journal.trades(SYMBOL, action='sell')
+    assert len(sells) == 1
+    assert sells[0]['profit'] == pytest.approx(20.0)
+    arrays = journal.trades(as_arrays=True)
+    assert list(arrays['action']) == ['buy', 'sell']
+    assert arrays['profit'][1] == pytest.approx(20.0)
+
+
+def test_sell_beyond_open_lots_counts_the_excess_at_zero_profit(journal):
+    journal.record_buy(SYMBOL, 1.0, 100.0, 100.0, timestamp=1)
+    # 2 units sold for 300: 1 matched (150 - 100), 1 without a known basis
+    assert journal.record_sell(SYMBOL, 2.0, 150.0, 300.0, timestamp=2) == pytest.approx(50.0)
+    assert journal.position(SYMBOL) == 0.0
+
+
+def test_symbols_are_matched_separately(journal):
+    journal.record_buy(SYMBOL, 1.0, 100.0, 100.0, timestamp=1)
+    journal.record_buy('ETH/USDT', 1.0, 10.0, 10.0, timestamp=2)
+    assert journal.record_sell('ETH/USDT', 1.0, 12.0, 12.0, timestamp=3) == pytest.approx(2.0)
+    assert journal.position(SYMBOL) == 1.0
+
+
+def test_closing_a_lot_marks_its_trade_history_record(journal):
+    record = {'action': 'buy', 'amount': 1.0, 'cost': 100.0}
+    journal.record_buy(SYMBOL, 1.0, 100.0, 100.0, timestamp=1, record=record)
+    journal.record_sell(SYMBOL, 0.5, 120.0, 60.0, timestamp=2)
+    assert 'sold' not in record
+    journal.record_sell(SYMBOL, 0.5, 90.0, 45.0, timestamp=3)
+    assert record['sold'] is True
+    assert record['profit'] == pytest.approx(5.0)
+
+
+def test_open_lots_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'trades.db')
+    journal = TradeJournal(path)
+    journal.record_buy(SYMBOL, 1.0, 100.0, 100.0, timestamp=1)
+    journal.record_buy(SYMBOL, 1.0, 200.0, 200.0, timestamp=2)
+    journal.record_sell(SYMBOL, 0.5, 150.0, 75.0, timestamp=3)
+    journal.close()
+
+    reopened = TradeJournal(path)
+    try:
+        assert reopened.position(SYMBOL) == pytest.approx(1.5)
+        history = reopened.history(SYMBOL)
+        assert [r['action'] for r in history] == ['buy', 'buy', 'sell']
+        # the rest of the first lot (basis 50) and all of the second (basis 200)
+        assert reopened.record_sell(SYMBOL, 1.5, 180.0, 270.0, timestamp=4) == pytest.approx(20.0)
+        assert history[0]['sold'] is True and history[1]['sold'] is True
+        assert history[0]['profit'] == pytest.approx(25.0 + 40.0)
+    finally:
+        reopened.close()
@@ -1,11 +1,4 @@
-import ccxt
-import pandas as pd
-import numpy as np
-from stable_baselines3 import DQN
-import ta
 import os
-import time
-from datetime import datetime
 
 def create_placeholder_model(path="../models/trading_agent.zip"):
     os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -4,4 +4,7 @@ This package contains lightweight implementations of ai_models,
 data_processing and risk_management to make the repository runnable
 without the original missing modules.
 """
-__all__ = ["api", "ai_models", "data_processing", "risk_management"]
+__all__ = ["api", "ai_models", "alerts", "backtest", "candle_store", "correlation", "data_processing",
+           "exchange_session", "features", "figure_cache", "forecast", "metrics_store", "multi_symbol", "param_sweep",
+           "regime", "risk_management", "scheduler", "sentiment_engine", "sim_exchange", "streaming",
+           "structured_logging", "tracing", "trade_journal", "training_runner"]
@@ -2,8 +2,85 @@ import random
 import os
 import pickle
 import logging
+import threading
+import time
+
+from .tracing import timed
+
 logger = logging.getLogger(__name__)
 
+# name -> zero-argument callable building the model; filled by the application
+_loaders = {}
+_models = {}
+# name -> (time.monotonic() of the next attempt, consecutive failures)
+_failed = {}
+# a failed loader (e.g. the exchange during a network blip) is retried after
+# this many seconds, doubling per consecutive failure up to the maximum
+FAILED_LOAD_RETRY = 30.0
+FAILED_LOAD_RETRY_MAX = 600.0
+_registry_lock = threading.Lock()
+_model_locks = {}
+
+def register_loader(name, loader):
+    """Register how to build a model; nothing is loaded until get_model(name)."""
+    with _registry_lock:
+        _loaders[name] = loader
+        _model_locks.setdefault(name, threading.Lock())
+        _models.pop(name, None)
+        _failed.pop(name, None)
+
+def get_model(name, default=None):
+    """Return the model registered under `name`, loading it on first use.
+
+    A loader that raised is not retried on every call; `default` is returned
+    instead until its backoff (FAILED_LOAD_RETRY, doubling per consecutive
+    failure) has passed or register_loader() is called again for that name.
+    """
+    if name in _models:
+        return _models[name]
+    if name not in _model_locks or _backing_off(name):
+        return default
+    with _model_locks[name]:
+        if name in _models:
+            return _models[name]
+        if _backing_off(name):
+            return default
+        start = time.perf_counter()
+        try:
+            model = _loaders[name]()
+        except Exception as e:
+            failures = _failed.get(name, (0.0, 0))[1] + 1
+            delay = min(FAILED_LOAD_RETRY * 2 ** (failures - 1), FAILED_LOAD_RETRY_MAX)
+            _failed[name] = (time.monotonic() + delay, failures)
+            logger.error(f"❌ Błąd ładowania modelu {name}: {e} - ponowna próba za {delay:.0f} s")
+            return default
+        _models[name] = model
+        _failed.pop(name, None)
+        logger.info(f"✅ Załadowano {name} w {time.perf_counter() - start:.2f} s")
+        return model
+
+def _backing_off(name):
+    failed = _failed.get(name)
+    return failed is not None and time.monotonic() < failed[0]
+
+def is_loaded(name):
+    return name in _models
+
+def warmup(names=None, background=True):
+    """Preload registered models, each in its own daemon thread by default."""
+    names = list(names or _loaders)
+    if not background:
+        for name in names:
+            get_model(name)
+        return []
+    threads = [
+        threading.Thread(target=get_model, args=(name,), name=f"warmup-{name}", daemon=True)
+        for name in names
+    ]
+    for t in threads:
+        t.start()
+    return threads
+
 class DummyAgent:
     def __init__(self, name="dummy"):
         self.name = name
@@ -27,10 +104,24 @@ def load_risk_agent(path=None):
 def load_monitoring_agent(path=None):
     return DummyAgent('monitoring_agent')
 
+def init_sentiment_engine(quantize=False, num_threads=None, cache_size=4096):
+    """Create and load the FinBERT engine used by analyze_sentiment."""
+    from .sentiment_engine import FinbertSentimentEngine
+    engine = FinbertSentimentEngine(quantize=quantize, num_threads=num_threads, cache_size=cache_size)
+    return engine.load()
+
+@timed()
 def analyze_sentiment(texts):
-    # very simple sentiment: -1..1
+    # -1..1; FinBERT when registered and loadable, keyword counting otherwise
     if not texts:
         return 0.0
+    engine = get_model('sentiment_engine')
+    if engine is not None:
+        try:
+            scores = engine.score(texts)
+            return max(-1.0, min(1.0, sum(scores) / len(scores)))
+        except Exception as e:
+            logger.warning(f"Błąd modelu sentymentu, używam słów kluczowych: {e}")
     score = 0.0
     for t in texts[:10]:
         if 'buy' in t.lower():
@@ -39,14 +130,42 @@ def analyze_sentiment(texts):
             score -= 0.2
     return max(-1.0, min(1.0, score))
 
-def monitor_system_health(monitoring_agent, df, trade_history):
+def _feature(features, name):
+    value = (features or {}).get(name)
+    return value if value is not None and value == value else None
+
+@timed()
+def monitor_system_health(monitoring_agent, df, trade_history, features=None):
+    if features:
+        missing = [k for k, v in features.items() if v is None or v != v]
+        if missing:
+            logger.warning(f"Brak wartości wskaźników (rozgrzewanie lub luka w danych): {', '.join(missing)}")
+        atr_pct = _feature(features, 'atr_pct')
+        if atr_pct is not None and atr_pct > 0.05:
+            logger.warning(f"Bardzo wysoka zmienność rynku: ATR {atr_pct:.2%} ceny")
     return monitoring_agent
 
-def make_trading_decision(trade_history, df, sentiment, risk_params, trading_agent):
-    # Simple rule-based decision for stability
-    if sentiment > 0.1:
+# market regimes as published by utils.regime (the dashboard gauge scale)
+HIGH_VOL_REGIME, RANGE_REGIME, TREND_REGIME = 0, 1, 2
+
+@timed()
+def make_trading_decision(trade_history, df, sentiment, risk_params, trading_agent, features=None):
+    # Simple rule-based decision for stability: sentiment is the only entry
+    # signal; the features can only veto it. RSI keeps entries out of
+    # overbought/oversold markets, anomalous bars are sat out, high volatility
+    # allows only exits and in a range an entry has to buy the lower half
+    # (sell the upper half) of it
+    if (features or {}).get('anomaly'):
+        return 'HOLD'
+    regime = _feature(features, 'regime')
+    rsi = _feature(features, 'rsi')
+    if sentiment > 0.1 and (rsi is None or rsi < 70):
+        if regime == HIGH_VOL_REGIME or (regime == RANGE_REGIME and rsi is not None and rsi >= 50):
+            return 'HOLD'
         return 'BUY'
-    if sentiment < -0.1:
+    if sentiment < -0.1 and (rsi is None or rsi > 30):
+        if regime == RANGE_REGIME and rsi is not None and rsi <= 50:
+            return 'HOLD'
         return 'SELL'
     return 'HOLD'
 
@@ -84,6 +203,7 @@ class TrainableAgent:
         except Exception:
             return cls()
 
+@timed()
 def train_simple_agent(episodes=100, steps_per_episode=50, save_path='../models/trading_agent.zip'):
     agent = TrainableAgent()
     for ep in range(episodes):
@@ -105,3 +225,116 @@ def train_simple_agent(episodes=100, steps_per_episode=50, save_path='../models/
             agent.update(action, reward)
     agent.save(save_path)
     return agent
+
+def _synthetic_prices(n, seed=None, start=100.0):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    return start + np.cumsum(rng.uniform(-1.0, 1.0, n))
+
+def _vectorized_rollout(prices, scores, n_envs, steps_per_episode, epsilon, rng, learn=True):
+    """Run `n_envs` episodes in lockstep on random windows of `prices`.
+
+    Returns the updated scores plus per-action reward sums and counts. With
+    learn=True the scores are updated after every step with the mean reward
+    of each action across environments, which is what TrainableAgent.update
+    would do if the environments were stepped one after another.
+    """
+    import numpy as np
+    scores = np.array(scores, dtype=np.float64)
+    starts = rng.integers(0, len(prices) - steps_per_episode, size=n_envs)
+    balance = np.full(n_envs, 1000.0)
+    position = np.zeros(n_envs)
+    cost_basis = np.zeros(n_envs)
+    reward_sum = np.zeros(3)
+    reward_count = np.zeros(3)
+    for step in range(steps_per_episode):
+        price = prices[starts + step]
+        explore = rng.random(n_envs) < epsilon
+        actions = np.where(explore, rng.integers(0, 3, size=n_envs), int(np.argmax(scores)))
+        buy = actions == 1
+        sell = (actions == 2) & (position > 0)
+        position += buy
+        balance -= np.where(buy, price, 0.0)
+        cost_basis += np.where(buy, price, 0.0)
+        # realised return of one unit sold at the average entry price
+        avg_entry = np.divide(cost_basis, position, out=np.ones(n_envs), where=position > 0)
+        reward = np.where(sell, price / avg_entry - 1.0, 0.0)
+        cost_basis -= np.where(sell, avg_entry, 0.0)
+        position -= sell
+        balance += np.where(sell, price, 0.0)
+        sums = np.bincount(actions, weights=reward, minlength=3)
+        counts = np.bincount(actions, minlength=3)
+        reward_sum += sums
+        reward_count += counts
+        if learn:
+            chosen = counts > 0
+            scores[chosen] = scores[chosen] * 0.9 + sums[chosen] / counts[chosen]
+    return scores, reward_sum, reward_count
+
+_rollout_prices = None
+
+def _init_rollout_worker(prices):
+    global _rollout_prices
+    _rollout_prices = prices
+
+def _rollout_worker(args):
+    import numpy as np
+    scores, n_envs, steps_per_episode, epsilon, seed = args
+    rng = np.random.default_rng(seed)
+    _, reward_sum, reward_count = _vectorized_rollout(
+        _rollout_prices, scores, n_envs, steps_per_episode, epsilon, rng, learn=False
+    )
+    return reward_sum, reward_count
+
+def train_vectorized_agent(prices=None, episodes=1024, n_envs=128, steps_per_episode=500,
+                           save_path='../models/trading_agent.zip', workers=0, epsilon=0.2, seed=None):
+    """Batched counterpart of train_simple_agent.
+
+    Simulates `n_envs` environments in lockstep with NumPy arrays on real
+    price history (a random walk if `prices` is None) until `episodes`
+    episodes have run. With workers > 1 each round's environments are split
+    across processes that roll out a snapshot of the policy, and the parent
+    applies their averaged per-action rewards. Returns (agent, stats).
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    if prices is None:
+        prices = _synthetic_prices(max(steps_per_episode * 20, 10000), seed)
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    steps_per_episode = min(steps_per_episode, len(prices) - 1)
+    agent = TrainableAgent()
+    scores = np.array([agent.scores[a] for a in (0, 1, 2)])
+    rounds = max(1, -(-episodes // n_envs))
+
+    start = time.perf_counter()
+    if workers and workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        per_worker = max(1, n_envs // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_rollout_worker, initargs=(prices,)) as pool:
+            for _ in range(rounds):
+                seeds = rng.integers(0, 2**31, size=workers)
+                jobs = [(scores, per_worker, steps_per_episode, epsilon, int(s)) for s in seeds]
+                total_sum, total_count = np.zeros(3), np.zeros(3)
+                for reward_sum, reward_count in pool.map(_rollout_worker, jobs):
+                    total_sum += reward_sum
+                    total_count += reward_count
+                chosen = total_count > 0
+                scores[chosen] = scores[chosen] * 0.9 + total_sum[chosen] / total_count[chosen]
+        done = rounds * per_worker * workers
+    else:
+        for _ in range(rounds):
+            scores, _, _ = _vectorized_rollout(prices, scores, n_envs, steps_per_episode, epsilon, rng)
+        done = rounds * n_envs
+    elapsed = time.perf_counter() - start
+
+    agent.scores = {a: float(scores[a]) for a in (0, 1, 2)}
+    agent.save(save_path)
+    stats = {
+        'episodes': done,
+        'steps': done * steps_per_episode,
+        'seconds': elapsed,
+        'episodes_per_sec': done / elapsed if elapsed > 0 else float('inf'),
+        'steps_per_sec': done * steps_per_episode / elapsed if elapsed > 0 else float('inf'),
+    }
+    logger.info(f"Trening wektorowy: {done} epizodów w {elapsed:.2f} s ({stats['episodes_per_sec']:.0f} epizodów/s)")
+    return agent, stats
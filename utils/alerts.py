@@ -0,0 +1,213 @@
+"""Background alert delivery for ``api.send_alert``.
+
+``AlertDispatcher.send`` only deduplicates and enqueues, so callers (the
+trading loop, exception handlers) return in microseconds. A dispatcher
+thread collects messages for a short batch window and hands each batch to
+one worker per channel, which delivers it as a single request over its
+own pooled HTTP session, paced by a per-channel token bucket. Repeats of
+a message within the dedup window are suppressed and reported as a count
+with the next occurrence.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+from .exchange_session import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_DEDUP_WINDOW = 300.0
+DEFAULT_BATCH_WINDOW = 2.0
+DEFAULT_TIMEOUT = 10
+# deliveries of one batch answered with HTTP 429 before it counts as failed
+DEFAULT_MAX_RETRIES = 3
+ALERT_TITLE = "🚨 *Crypto Trading Alert*"
+
+
+class Channel:
+    """One delivery target: builds the request for a batch of messages."""
+
+    def __init__(self, name, url, payload_fn, headers=None, rate=1.0, burst=3):
+        self.name = name
+        self.url = url
+        self.payload_fn = payload_fn
+        self.headers = headers or {}
+        self.limiter = RateLimiter(rate, burst)
+
+
+def channels_from_env():
+    """SendGrid, Slack and Telegram channels for the configured env variables."""
+    channels = []
+    if os.getenv('SENDGRID_API_KEY') and os.getenv('ALERT_EMAIL'):
+        channels.append(Channel(
+            'sendgrid', "https://api.sendgrid.com/v3/mail/send",
+            lambda text: {
+                "personalizations": [{"to": [{"email": os.getenv('ALERT_EMAIL')}]}],
+                "from": {"email": "system@example.com"},
+                "subject": "ALERT: System Handlu Krypto",
+                "content": [{"type": "text/plain", "value": text}]
+            },
+            headers={"Authorization": f"Bearer {os.getenv('SENDGRID_API_KEY')}",
+                     "Content-Type": "application/json"},
+            rate=0.2
+        ))
+    if os.getenv('SLACK_WEBHOOK_URL'):
+        channels.append(Channel(
+            'slack', os.getenv('SLACK_WEBHOOK_URL'),
+            lambda text: {"text": f"{ALERT_TITLE}\n```{text}```", "mrkdwn": True}
+        ))
+    if os.getenv('TELEGRAM_BOT_TOKEN') and os.getenv('TELEGRAM_CHAT_ID'):
+        channels.append(Channel(
+            'telegram', f"https://api.telegram.org/bot{os.getenv('TELEGRAM_BOT_TOKEN')}/sendMessage",
+            lambda text: {"chat_id": os.getenv('TELEGRAM_CHAT_ID'),
+                          "text": f"{ALERT_TITLE}\n```{text}```", "parse_mode": "Markdown"}
+        ))
+    return channels
+
+
+def _default_session():
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class AlertDispatcher:
+    def __init__(self, channels, queue_size=DEFAULT_QUEUE_SIZE, dedup_window=DEFAULT_DEDUP_WINDOW,
+                 batch_window=DEFAULT_BATCH_WINDOW, timeout=DEFAULT_TIMEOUT, session_factory=None,
+                 max_retries=DEFAULT_MAX_RETRIES):
+        self.channels = list(channels)
+        self.dedup_window = dedup_window
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session_factory = session_factory or _default_session
+        self._queue = queue.Queue(maxsize=queue_size)
+        # message -> [first seen (monotonic), repeats suppressed since]
+        self._recent = {}
+        self._recent_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._pending = 0
+        self._idle = threading.Condition()
+        # bumped from the caller and from every worker thread
+        self._stats_lock = threading.Lock()
+        self.stats = {'queued': 0, 'suppressed': 0, 'dropped': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+        self._workers = {}
+        for channel in self.channels:
+            inbox = queue.Queue(maxsize=queue_size)
+            thread = threading.Thread(target=self._deliver_loop, args=(channel, inbox),
+                                      name=f"alert-{channel.name}", daemon=True)
+            self._workers[channel.name] = inbox
+            thread.start()
+        self._thread = threading.Thread(target=self._batch_loop, name='alert-dispatcher', daemon=True)
+        self._thread.start()
+
+    def send(self, message):
+        """Queue `message` for every channel; never blocks. Returns False if
+        it was suppressed as a repeat or dropped because the queue is full."""
+        now = time.monotonic()
+        with self._recent_lock:
+            seen = self._recent.get(message)
+            if seen is not None and now - seen[0] < self.dedup_window:
+                seen[1] += 1
+                self._count('suppressed')
+                return False
+            repeats = seen[1] if seen is not None else 0
+            self._recent[message] = [now, 0]
+            if len(self._recent) > 4 * self._queue.maxsize:
+                cutoff = now - self.dedup_window
+                self._recent = {m: s for m, s in self._recent.items() if s[0] >= cutoff}
+        text = f"{message} (powtórzono {repeats}× od poprzedniego alertu)" if repeats else message
+        # counted before it is visible to the dispatcher, so flush() cannot
+        # see the batch finish before it was counted
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(text)
+        except queue.Full:
+            self._count('dropped')
+            self._done()
+            return False
+        self._count('queued')
+        return True
+
+    def _batch_loop(self):
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            text = "\n".join(batch)
+            for channel in self.channels:
+                with self._idle:
+                    self._pending += 1
+                try:
+                    self._workers[channel.name].put_nowait(text)
+                except queue.Full:
+                    self._count('dropped')
+                    self._done()
+            for _ in batch:
+                self._done()
+
+    def _deliver_loop(self, channel, inbox):
+        session = None
+        while not self._stopped.is_set():
+            try:
+                text = inbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                session = session or self.session_factory()
+                for attempt in range(self.max_retries + 1):
+                    channel.limiter.acquire()
+                    response = session.post(channel.url, json=channel.payload_fn(text),
+                                            headers=channel.headers, timeout=self.timeout)
+                    if getattr(response, 'status_code', 200) != 429 or attempt == self.max_retries:
+                        break
+                    # the limiter holds the next attempt back until Retry-After passed
+                    retry_after = float(response.headers.get('Retry-After', 30))
+                    channel.limiter.penalize(retry_after)
+                    self._count('retried')
+                    logger.warning(f"⚠️ Kanał {channel.name} ogranicza alerty - ponowienie za {retry_after:.0f} s")
+                response.raise_for_status()
+                self._count('sent')
+                logger.info(f"🔔 Alert wysłany ({channel.name}): {text}")
+            except Exception as e:
+                self._count('failed')
+                logger.error(f"❌ Błąd wysyłania alertu ({channel.name}): {str(e)}")
+            finally:
+                self._done()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _done(self):
+        with self._idle:
+            self._pending -= 1
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every queued alert was delivered or failed."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout)
+
+    def stop(self, timeout=5.0):
+        self.flush(timeout)
+        self._stopped.set()
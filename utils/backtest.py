@@ -0,0 +1,225 @@
+"""Backtesting on stored OHLCV history.
+
+Two engines share the same metrics:
+
+* ``run_vectorized_backtest`` - signal arrays in, equity curve out, entirely
+  in NumPy. Used for rule-based strategies such as ``decision_signals``,
+  which mirrors ``ai_models.make_trading_decision`` over a whole window.
+* ``run_event_backtest`` - replays bars one by one through a decision
+  function and ``risk_management.calculate_position_size`` so stateful
+  agents (``TrainableAgent``, RL agents) see the same inputs as in ``main()``.
+
+Metrics match the dashboard cards: current/peak value, drawdown, Sharpe
+ratio and profit factor.
+"""
+import logging
+import math
+
+import numpy as np
+
+from . import ai_models, risk_management
+from .data_processing import timeframe_to_ms
+from .features import compute_features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEE = 0.001        # Binance spot taker fee
+DEFAULT_SLIPPAGE = 0.0005
+DEFAULT_INITIAL_EQUITY = 10000.0
+ACTIONS = {0: 'HOLD', 1: 'BUY', 2: 'SELL'}
+_YEAR_MS = 365 * 24 * 3600 * 1000
+
+
+def periods_per_year(timeframe):
+    return _YEAR_MS / timeframe_to_ms(timeframe)
+
+
+def performance_metrics(equity, trade_pnls, timeframe='1h'):
+    equity = np.asarray(equity, dtype=np.float64)
+    pnls = np.asarray(trade_pnls, dtype=np.float64)
+    peak = np.maximum.accumulate(equity)
+    drawdown = (peak - equity) / peak
+    returns = equity[1:] / equity[:-1] - 1.0 if len(equity) > 1 else np.zeros(0)
+    std = returns.std() if len(returns) else 0.0
+    sharpe = returns.mean() / std * math.sqrt(periods_per_year(timeframe)) if std > 0 else 0.0
+    gross_profit = pnls[pnls > 0].sum()
+    gross_loss = -pnls[pnls < 0].sum()
+    if gross_loss > 0:
+        profit_factor = gross_profit / gross_loss
+    else:
+        profit_factor = float('inf') if gross_profit > 0 else 0.0
+    return {
+        'current_value': float(equity[-1]),
+        'peak_value': float(peak[-1]),
+        'total_return': float(equity[-1] / equity[0] - 1.0),
+        'current_drawdown': float(drawdown[-1]),
+        'max_drawdown': float(drawdown.max()),
+        'sharpe_ratio': float(sharpe),
+        'profit_factor': float(profit_factor),
+        'trades': int(len(pnls)),
+        'win_rate': float((pnls > 0).mean()) if len(pnls) else 0.0,
+    }
+
+
+def decision_signals(features, sentiment=0.0):
+    """Vectorized counterpart of ai_models.make_trading_decision:
+    +1 = BUY, -1 = SELL, 0 = HOLD for every bar."""
+    rsi = features.get('rsi')
+    n = len(next(iter(features.values())))
+    sentiment = np.broadcast_to(np.asarray(sentiment, dtype=np.float64), (n,))
+    have_rsi = ~np.isnan(rsi) if rsi is not None else np.zeros(n, dtype=bool)
+    rsi_v = np.where(have_rsi, rsi, 50.0) if rsi is not None else np.full(n, 50.0)
+
+    buy = (sentiment > 0.1) & (~have_rsi | (rsi_v < 70))
+    sell = (sentiment < -0.1) & (~have_rsi | (rsi_v > 30))
+    regime = features.get('regime')
+    if regime is not None:
+        regime = np.asarray(regime)
+        in_range = regime == ai_models.RANGE_REGIME
+        buy &= (regime != ai_models.HIGH_VOL_REGIME) & ~(in_range & have_rsi & (rsi_v >= 50))
+        sell &= ~(in_range & have_rsi & (rsi_v <= 50))
+    signals = np.zeros(n, dtype=np.int8)
+    signals[sell] = -1
+    signals[buy] = 1
+    anomaly = features.get('anomaly')
+    if anomaly is not None:
+        signals[np.asarray(anomaly, dtype=bool)] = 0
+    return signals
+
+
+def run_vectorized_backtest(candles, signals, fee=DEFAULT_FEE, slippage=DEFAULT_SLIPPAGE,
+                            initial_equity=DEFAULT_INITIAL_EQUITY, exposure=1.0,
+                            allow_short=False, timeframe='1h'):
+    """Backtest a signal array (+1 buy, -1 sell, 0 keep the current position).
+
+    A signal observed at the close of bar t sets the position held over bar
+    t+1; every change of position pays fee + slippage on the traded notional.
+    """
+    close = np.asarray(candles['close'], dtype=np.float64)
+    sig = np.asarray(signals, dtype=np.float64)
+    n = len(close)
+
+    target = np.where(sig > 0, 1.0, np.where(sig < 0, -1.0 if allow_short else 0.0, np.nan))
+    target[0] = 0.0 if np.isnan(target[0]) else target[0]
+    # forward-fill "keep" bars with the last explicit target
+    last = np.where(~np.isnan(target), np.arange(n), 0)
+    target = target[np.maximum.accumulate(last)]
+    position = np.concatenate(([0.0], target[:-1])) * exposure
+
+    returns = np.zeros(n)
+    returns[1:] = close[1:] / close[:-1] - 1.0
+    turnover = np.abs(np.diff(position, prepend=0.0))
+    net = position * returns - turnover * (fee + slippage)
+    equity = initial_equity * np.cumprod(1.0 + net)
+
+    # attribute each bar's PnL to a trade; the exit bar's cost belongs to the trade it closes
+    pnl = np.diff(equity, prepend=initial_equity)
+    trade_id = np.cumsum(turnover > 0)
+    exiting = (position == 0) & (turnover > 0)
+    trade_id = np.where(exiting, trade_id - 1, trade_id)
+    in_trade = (position != 0) | exiting
+    per_trade = np.bincount(trade_id[in_trade], weights=pnl[in_trade]) if in_trade.any() else np.zeros(0)
+    trade_pnls = per_trade[np.bincount(trade_id[in_trade]) > 0] if in_trade.any() else per_trade
+
+    peak = np.maximum.accumulate(equity)
+    return {
+        'equity': equity,
+        'drawdown': (peak - equity) / peak,
+        'position': position,
+        'trade_pnls': trade_pnls,
+        'metrics': performance_metrics(equity, trade_pnls, timeframe),
+    }
+
+
+def agent_decision(trade_history, df, sentiment, risk_params, agent, features=None):
+    """Decision function for agents exposing act() (TrainableAgent) or
+    predict() (stable-baselines3 style)."""
+    obs = np.array([features.get(k, 0.0) for k in sorted(features)], dtype=np.float32) if features else None
+    if hasattr(agent, 'act'):
+        action = agent.act(obs)
+    else:
+        action, _ = agent.predict(obs, deterministic=True)
+    return ACTIONS.get(int(action), 'HOLD')
+
+
+def run_event_backtest(candles, decide=None, agent=None, risk_params=None, sentiment=0.0,
+                       fee=DEFAULT_FEE, slippage=DEFAULT_SLIPPAGE,
+                       initial_equity=DEFAULT_INITIAL_EQUITY, warmup=50, timeframe='1h',
+                       feature_params=None, size_fn=None, features=None,
+                       stop_loss_percent=None, max_drawdown_percent=None):
+    """Replay bars through `decide` (default: ai_models.make_trading_decision)
+    and `size_fn` (default: risk_management.calculate_position_size), filling
+    market orders at the bar close with slippage and fees.
+
+    `stop_loss_percent` closes the position once price falls that far below
+    its average entry; `max_drawdown_percent` stops trading for the rest of
+    the run once breached, as main() does. Precomputed `features` may be
+    passed to skip the indicator pass.
+    """
+    decide = decide or ai_models.make_trading_decision
+    size_fn = size_fn or risk_management.calculate_position_size
+    risk_params = risk_params or {'risk_percent': 1.0, 'max_position_size': 0.01}
+    close = np.asarray(candles['close'], dtype=np.float64)
+    timestamps = np.asarray(candles['timestamp'])
+    if features is None:
+        features = compute_features(candles, feature_params)
+    n = len(close)
+    stop_loss = stop_loss_percent / 100.0 if stop_loss_percent else None
+    max_drawdown = max_drawdown_percent / 100.0 if max_drawdown_percent else None
+    peak_equity = float(initial_equity)
+    halted = False
+
+    cash, base, base_cost = float(initial_equity), 0.0, 0.0
+    equity = np.empty(n)
+    trade_history, trade_pnls = [], []
+    for i in range(n):
+        price = close[i]
+        if i >= warmup and not halted:
+            if stop_loss is not None and base > 0 and price <= base_cost / base * (1.0 - stop_loss):
+                decision, amount = 'SELL', base
+            else:
+                feats = {k: float(v[i]) for k, v in features.items()}
+                window = {c: candles[c][:i + 1] for c in ('timestamp', 'open', 'high', 'low', 'close', 'volume')}
+                decision = decide(trade_history, window, sentiment, risk_params, agent, feats)
+                if decision in ('BUY', 'SELL'):
+                    # size from the running equity, as main() does from the live balance
+                    params = dict(risk_params, equity=cash + base * price, atr_pct=feats.get('atr_pct', np.nan),
+                                  available=cash / (1.0 + fee) if decision == 'BUY' else base)
+                    amount = size_fn(decision, price, trade_history, params)
+                else:
+                    amount = 0
+            if decision in ('BUY', 'SELL'):
+                if decision == 'BUY' and amount > 0:
+                    fill = price * (1.0 + slippage)
+                    cost = amount * fill * (1.0 + fee)
+                    if cost <= cash:
+                        cash -= cost
+                        base += amount
+                        base_cost += cost
+                        trade_history.append({'action': 'buy', 'entry_price': fill, 'amount': amount,
+                                              'cost': cost, 'timestamp': timestamps[i]})
+                elif decision == 'SELL' and base > 0:
+                    amount = min(amount, base) if amount > 0 else base
+                    fill = price * (1.0 - slippage)
+                    proceeds = amount * fill * (1.0 - fee)
+                    cost_basis = base_cost * amount / base
+                    cash += proceeds
+                    base -= amount
+                    base_cost -= cost_basis
+                    trade_pnls.append(proceeds - cost_basis)
+                    trade_history.append({'action': 'sell', 'entry_price': fill, 'amount': amount,
+                                          'cost': proceeds, 'profit': proceeds - cost_basis,
+                                          'timestamp': timestamps[i]})
+        equity[i] = cash + base * price
+        peak_equity = max(peak_equity, equity[i])
+        if max_drawdown is not None and (peak_equity - equity[i]) / peak_equity > max_drawdown:
+            halted = True
+
+    peak = np.maximum.accumulate(equity)
+    return {
+        'equity': equity,
+        'drawdown': (peak - equity) / peak,
+        'trades': trade_history,
+        'trade_pnls': np.asarray(trade_pnls),
+        'metrics': performance_metrics(equity, trade_pnls, timeframe),
+    }
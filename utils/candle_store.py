@@ -0,0 +1,160 @@
+"""Columnar, memory-mapped OHLCV storage.
+
+Each symbol/timeframe lives in its own directory with one fixed-width
+binary file per column (``timestamp.i8``, ``open.f8``, ...). Files are
+append-only and read through ``numpy.memmap``, so the bot, dashboard and
+trainer share the same pages from the OS cache instead of each building
+their own DataFrame.
+"""
+import csv
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+DTYPES = {
+    'timestamp': np.int64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64,
+}
+_ITEMSIZE = 8
+
+
+class ColumnarCandleStore:
+    """Per symbol/timeframe column files with zero-copy tail slices."""
+
+    def __init__(self, root):
+        self.root = root
+        # (symbol, timeframe) -> (row_count, {column: memmap})
+        self._maps = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def lock(self, symbol, timeframe):
+        """Re-entrant lock serializing writers of one symbol/timeframe."""
+        with self._locks_guard:
+            return self._locks.setdefault((symbol, timeframe), threading.RLock())
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, f"{symbol.replace('/', '_')}_{timeframe}")
+
+    def _column_file(self, symbol, timeframe, column):
+        ext = 'i8' if column == 'timestamp' else 'f8'
+        return os.path.join(self.path(symbol, timeframe), f"{column}.{ext}")
+
+    def _legacy_csv(self, symbol, timeframe):
+        return self.path(symbol, timeframe) + '.csv'
+
+    def count(self, symbol, timeframe):
+        directory = self.path(symbol, timeframe)
+        if not os.path.isdir(directory):
+            self._import_legacy_csv(symbol, timeframe)
+            if not os.path.isdir(directory):
+                return 0
+        sizes = []
+        for column in COLUMNS:
+            try:
+                sizes.append(os.path.getsize(self._column_file(symbol, timeframe, column)))
+            except OSError:
+                return 0
+        # a crash between column writes leaves some files longer; ignore the tail
+        return min(sizes) // _ITEMSIZE
+
+    def columns(self, symbol, timeframe):
+        """Return {column: read-only memmap} covering every stored row."""
+        n = self.count(symbol, timeframe)
+        key = (symbol, timeframe)
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == n:
+            return cached[1]
+        if n == 0:
+            maps = {c: np.empty(0, dtype=DTYPES[c]) for c in COLUMNS}
+        else:
+            maps = {
+                c: np.memmap(self._column_file(symbol, timeframe, c), dtype=DTYPES[c], mode='r', shape=(n,))
+                for c in COLUMNS
+            }
+        self._maps[key] = (n, maps)
+        return maps
+
+    def tail(self, symbol, timeframe, n):
+        """Last `n` bars as {column: view}; slices of the memmaps, no copy."""
+        cols = self.columns(symbol, timeframe)
+        return {c: arr[-n:] if n else arr[:0] for c, arr in cols.items()}
+
+    def first_timestamp(self, symbol, timeframe):
+        ts = self.columns(symbol, timeframe)['timestamp']
+        return int(ts[0]) if len(ts) else None
+
+    def last_timestamp(self, symbol, timeframe):
+        ts = self.columns(symbol, timeframe)['timestamp']
+        return int(ts[-1]) if len(ts) else None
+
+    def _history_start_file(self, symbol, timeframe):
+        return os.path.join(self.path(symbol, timeframe), 'history_start')
+
+    def history_start(self, symbol, timeframe):
+        """Timestamp of the oldest candle the exchange has, if it was found
+        to have less history than requested (None if unknown)."""
+        try:
+            with open(self._history_start_file(symbol, timeframe)) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def set_history_start(self, symbol, timeframe, timestamp):
+        os.makedirs(self.path(symbol, timeframe), exist_ok=True)
+        path = self._history_start_file(symbol, timeframe)
+        with open(path + '.tmp', 'w') as f:
+            f.write(str(int(timestamp)))
+        os.replace(path + '.tmp', path)
+
+    def _write(self, symbol, timeframe, candles, mode):
+        data = np.asarray(candles, dtype=np.float64).reshape(-1, len(COLUMNS))
+        directory = self.path(symbol, timeframe)
+        os.makedirs(directory, exist_ok=True)
+        for i, column in enumerate(COLUMNS):
+            path = self._column_file(symbol, timeframe, column)
+            target = path + '.tmp' if mode == 'wb' else path
+            with open(target, mode) as f:
+                f.write(data[:, i].astype(DTYPES[column]).tobytes())
+            if mode == 'wb':
+                os.replace(target, path)
+        self._maps.pop((symbol, timeframe), None)
+
+    def append(self, symbol, timeframe, candles):
+        with self.lock(symbol, timeframe):
+            last_ts = self.last_timestamp(symbol, timeframe)
+            new = [c for c in candles if last_ts is None or c[0] > last_ts]
+            if not new:
+                return 0
+            n = self.count(symbol, timeframe)
+            if n:
+                # drop a torn tail so every column is the same length before appending
+                for column in COLUMNS:
+                    path = self._column_file(symbol, timeframe, column)
+                    if os.path.getsize(path) != n * _ITEMSIZE:
+                        os.truncate(path, n * _ITEMSIZE)
+            self._write(symbol, timeframe, new, 'ab')
+            return len(new)
+
+    def replace(self, symbol, timeframe, candles):
+        with self.lock(symbol, timeframe):
+            self._write(symbol, timeframe, candles, 'wb')
+
+    def _import_legacy_csv(self, symbol, timeframe):
+        path = self._legacy_csv(symbol, timeframe)
+        if not os.path.exists(path):
+            return
+        with open(path, newline='') as f:
+            rows = [[float(v) for v in rec] for rec in csv.reader(f) if len(rec) == len(COLUMNS)]
+        if rows:
+            self._write(symbol, timeframe, rows, 'wb')
+            logger.info(f"📦 Zmigrowano {len(rows)} świec {symbol} {timeframe} do formatu kolumnowego")
@@ -0,0 +1,165 @@
+"""Rolling correlation and covariance across the traded and correlation assets.
+
+Log returns of closed candles are aligned on common timestamps and fed one
+bar at a time into a windowed Welford update of the mean vector and the
+co-moment matrix, so each new bar costs O(k²) for k assets instead of a
+``df.corr()`` over the whole window. The matrices are used by
+``risk_management.correlation_scale`` when sizing positions and written to
+``correlation_file`` for the dashboard's "Asset Correlation" graph.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 720  # one month of hourly bars
+
+
+def _align(candles_by_asset, assets, since=None):
+    """Timestamps shared by every asset (from `since` on) and the matching
+    close matrix (T × k)."""
+    columns = []
+    for asset in assets:
+        asset_ts = np.asarray(candles_by_asset[asset]['timestamp'], dtype=np.int64)
+        start = int(np.searchsorted(asset_ts, since)) if since is not None else 0
+        columns.append((asset_ts[start:], np.asarray(candles_by_asset[asset]['close'], dtype=np.float64)[start:]))
+    ts = columns[0][0]
+    for asset_ts, _ in columns[1:]:
+        ts = np.intersect1d(ts, asset_ts, assume_unique=True)
+    closes = np.empty((len(ts), len(assets)))
+    for j, (asset_ts, close) in enumerate(columns):
+        closes[:, j] = close[np.searchsorted(asset_ts, ts)]
+    return ts, closes
+
+
+class RollingCorrelation:
+    """Windowed covariance/correlation of log returns, updated per bar."""
+
+    def __init__(self, assets, window=DEFAULT_WINDOW):
+        self.assets = list(assets)
+        self.index = {a: i for i, a in enumerate(self.assets)}
+        self.window = window
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        k = len(self.assets)
+        self.n = 0
+        self.last_ts = None
+        self.last_close = None
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+        self._buffer = np.zeros((self.window, k))
+        self._head = 0
+        self._since_resync = 0
+
+    def _resync(self):
+        data = self._buffer[:self.n]
+        self.mean = data.mean(axis=0)
+        centered = data - self.mean
+        self.comoment = centered.T @ centered
+        self._since_resync = 0
+
+    def push(self, returns):
+        x = np.asarray(returns, dtype=np.float64)
+        mean = self.mean
+        if self.n < self.window:
+            self.n += 1
+            new_mean = mean + (x - mean) / self.n
+            self.comoment += np.outer(x - mean, x - new_mean)
+        else:
+            old = self._buffer[self._head].copy()
+            new_mean = mean + (x - old) / self.n
+            self.comoment += np.outer(x - mean, x - new_mean) - np.outer(old - mean, old - new_mean)
+        self.mean = new_mean
+        self._buffer[self._head] = x
+        self._head = (self._head + 1) % self.window
+        self._since_resync += 1
+        # bound floating-point drift; amortized O(k²) per bar
+        if self._since_resync >= self.window * 8:
+            self._resync()
+
+    def update(self, candles_by_asset):
+        """Advance with any newly closed bars common to all assets; rebuilds
+        from the window if the saved state does not connect to the data."""
+        ts, closes = _align(candles_by_asset, self.assets, self.last_ts)
+        if self.last_ts is not None and (not len(ts) or ts[0] != self.last_ts):
+            # the last processed bar is missing from the data: start over
+            ts, closes = _align(candles_by_asset, self.assets)
+            self.last_ts = None
+        if len(ts) < 2:
+            return self
+        with self._lock:
+            self._advance(ts, closes)
+        return self
+
+    def _advance(self, ts, closes):
+        if self.last_ts is None or self.last_ts < ts[0] or self.last_ts > ts[-1]:
+            self._rebuild(ts, closes)
+            return
+        start = int(np.searchsorted(ts, self.last_ts, side='right'))
+        prev = self.last_close
+        for i in range(start, len(ts)):
+            self.push(np.log(closes[i] / prev))
+            prev = closes[i]
+        self.last_ts = int(ts[-1])
+        self.last_close = closes[-1].copy()
+
+    def _rebuild(self, ts, closes):
+        self.reset()
+        closes = closes[-(self.window + 1):]
+        returns = np.diff(np.log(closes), axis=0)
+        self.n = len(returns)
+        self._buffer[:self.n] = returns
+        self._head = self.n % self.window
+        self._resync()
+        self.last_ts = int(ts[-1])
+        self.last_close = closes[-1].copy()
+
+    def covariance(self):
+        with self._lock:
+            if self.n < 2:
+                return np.full((len(self.assets),) * 2, np.nan)
+            return self.comoment / (self.n - 1)
+
+    def correlation(self):
+        cov = self.covariance()
+        std = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        corr = np.clip(np.nan_to_num(corr), -1.0, 1.0)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def get(self, a, b):
+        return float(self.correlation()[self.index[a], self.index[b]])
+
+    def to_dict(self):
+        cov = self.covariance()
+        return {
+            'assets': self.assets,
+            'window': self.window,
+            'samples': self.n,
+            'timestamp': self.last_ts,
+            'correlation': self.correlation().round(4).tolist(),
+            'covariance': cov.tolist() if self.n >= 2 else None,
+        }
+
+    def save(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+
+def load_correlation(path):
+    """Matrix saved by RollingCorrelation.save, for readers such as the dashboard."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -1,19 +1,134 @@
 import logging
 import os
+import time
 from datetime import datetime
+
+from .tracing import timed
+
 logger = logging.getLogger(__name__)
 
-def get_market_data(symbol='BTC/USDT', timeframe='1h', limit=500):
+CANDLE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+DEFAULT_STORE_DIR = os.getenv('CANDLE_STORE_DIR', '../data/candles')
+# Binance returns at most 1000 candles per fetch_ohlcv call
+FETCH_PAGE_LIMIT = 1000
+
+_TIMEFRAME_UNITS_MS = {
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+}
+
+
+def timeframe_to_ms(timeframe):
+    """Convert a ccxt timeframe string ('1m', '1h', '1d', ...) to milliseconds."""
+    try:
+        return int(timeframe[:-1]) * _TIMEFRAME_UNITS_MS[timeframe[-1]]
+    except (KeyError, ValueError, IndexError):
+        raise ValueError(f"Nieobsługiwany interwał: {timeframe}")
+
+
+_default_store = None
+
+
+def get_candle_store():
+    global _default_store
+    if _default_store is None:
+        from .candle_store import ColumnarCandleStore
+        _default_store = ColumnarCandleStore(DEFAULT_STORE_DIR)
+    return _default_store
+
+
+def fetch_ohlcv_range(exchange, symbol, timeframe, since, until=None):
+    """Paginated fetch of all candles with timestamp >= since (and < until)."""
+    tf_ms = timeframe_to_ms(timeframe)
+    candles = []
+    while True:
+        page = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=FETCH_PAGE_LIMIT)
+        if not page:
+            break
+        candles.extend(c for c in page if until is None or c[0] < until)
+        next_since = page[-1][0] + tf_ms
+        if len(page) < FETCH_PAGE_LIMIT or next_since <= since or (until is not None and next_since >= until):
+            break
+        since = next_since
+    return candles
+
+
+@timed()
+def sync_candles(exchange, symbol, timeframe, limit, store=None):
+    """Bring the local store up to date with the exchange.
+
+    The first call for a symbol/timeframe backfills `limit` candles with a
+    paginated fetch (or all the exchange has, for a younger pair); every
+    later call only requests candles newer than the last stored one. Only closed candles are persisted; the still-forming
+    candle (or None) is returned to the caller.
+    """
+    store = store or get_candle_store()
+    # the decision cycle and background jobs (e.g. correlations) may sync the
+    # same pair on the same candle close; unlocked they append duplicate rows
+    with store.lock(symbol, timeframe):
+        return _sync_candles(exchange, symbol, timeframe, limit, store)
+
+
+def _sync_candles(exchange, symbol, timeframe, limit, store):
+    tf_ms = timeframe_to_ms(timeframe)
+    now_ms = int(time.time() * 1000)
+    window_start = now_ms - (limit + 1) * tf_ms
+
+    first_ts = store.first_timestamp(symbol, timeframe)
+    last_ts = store.last_timestamp(symbol, timeframe)
+    # a pair younger than the window never fills it; once the exchange has
+    # shown it has nothing older, the stored history counts as complete
+    history_start = store.history_start(symbol, timeframe)
+    missing_older = first_ts is not None and first_ts > window_start + tf_ms and (
+        history_start is None or first_ts > history_start)
+    if first_ts is None or missing_older or last_ts < window_start:
+        logger.info(f"📥 Uzupełnianie historii {symbol} {timeframe}: {limit} świec")
+        fetched = fetch_ohlcv_range(exchange, symbol, timeframe, window_start)
+        if fetched and fetched[0][0] > window_start + tf_ms:
+            store.set_history_start(symbol, timeframe, fetched[0][0])
+        closed = [c for c in fetched if c[0] + tf_ms <= now_ms]
+        if first_ts is not None and closed:
+            # keep older stored history that precedes the backfilled window
+            old = store.columns(symbol, timeframe)
+            keep = int((old['timestamp'] < closed[0][0]).sum())
+            closed = [[old[c][i] for c in CANDLE_COLUMNS] for i in range(keep)] + closed
+        if closed:
+            store.replace(symbol, timeframe, closed)
+    else:
+        fetched = fetch_ohlcv_range(exchange, symbol, timeframe, last_ts + tf_ms)
+        store.append(symbol, timeframe, [c for c in fetched if c[0] + tf_ms <= now_ms])
+
+    forming = [c for c in fetched if c[0] + tf_ms > now_ms]
+    return forming[-1] if forming else None
+
+
+@timed()
+def get_market_data(symbol='BTC/USDT', timeframe='1h', limit=500, use_cache=True, as_arrays=False):
+    """Return the last `limit` candles as a DataFrame.
+
+    With ``as_arrays=True`` the closed candles are returned instead as a
+    ``{column: ndarray}`` dict of zero-copy views into the memory-mapped
+    store; the still-forming candle is left out of that view.
+    """
     try:
-        import ccxt
         import pandas as pd
-        exchange = ccxt.binance({
-            'apiKey': os.getenv('BINANCE_API_KEY'),
-            'secret': os.getenv('BINANCE_SECRET'),
-            'enableRateLimit': True
-        })
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        from .exchange_session import get_exchange
+        exchange = get_exchange()
+        if use_cache:
+            store = get_candle_store()
+            forming = sync_candles(exchange, symbol, timeframe, limit, store)
+            window = store.tail(symbol, timeframe, limit)
+            if as_arrays:
+                return window
+            df = pd.DataFrame({c: window[c] for c in CANDLE_COLUMNS})
+            if forming is not None:
+                df = pd.concat([df, pd.DataFrame([forming], columns=CANDLE_COLUMNS)], ignore_index=True)
+                df = df.iloc[-limit:].reset_index(drop=True)
+        else:
+            ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            df = pd.DataFrame(ohlcv, columns=CANDLE_COLUMNS)
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         return df
     except Exception as e:
@@ -0,0 +1,193 @@
+"""Single shared exchange client for the bot, api helpers and data loaders.
+
+Constructing ``ccxt.binance`` opens a new HTTP session and the first call
+reloads all markets. This module keeps one client per process with a
+pooled HTTP session, markets cached with a TTL and one token-bucket rate
+limit budget shared by every caller (``api.execute_trade``,
+``data_processing.get_market_data`` and the portfolio valuation in
+``rading_ai.main``). A call rejected with HTTP 429 pauses every caller and
+is retried with exponential backoff.
+"""
+import logging
+import os
+import threading
+import time
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+TESTNET_URLS = {
+    'api': {
+        'public': 'https://testnet.binance.vision/api/v3',
+        'private': 'https://testnet.binance.vision/api/v3'
+    }
+}
+# Binance allows 1200 request weight per minute; stay comfortably below it
+DEFAULT_RATE_PER_SEC = 10.0
+DEFAULT_BURST = 20
+DEFAULT_MARKETS_TTL = 6 * 3600
+POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_DELAY = 1.0
+# an order retried for long is sized from a stale price; one retry at most
+ORDER_MAX_RETRIES = 1
+_ORDER_PREFIXES = ('create', 'cancel', 'edit')
+
+# exchange methods that hit the network and consume rate-limit budget
+_BUDGETED_PREFIXES = ('fetch', 'create', 'cancel', 'edit', 'load_markets')
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by all exchange callers."""
+
+    def __init__(self, rate=DEFAULT_RATE_PER_SEC, burst=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, weight=1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._blocked_until and self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+                wait = max(self._blocked_until - now, (weight - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Pause every caller, e.g. after the exchange answered HTTP 429."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def is_rate_limited(error, strict=False):
+    """True for ccxt.RateLimitExceeded / HTTP 429 errors. Unless `strict`,
+    an error whose message mentions a rate limit counts as well."""
+    if getattr(error, 'code', None) == 429:
+        return True
+    if any(cls.__name__ == 'RateLimitExceeded' for cls in type(error).__mro__):
+        return True
+    return not strict and 'rate limit' in str(error).lower()
+
+
+class ExchangeSession:
+    """Proxy around a ccxt exchange that charges the shared rate limit budget
+    on network calls and refreshes markets only when the cache expires."""
+
+    def __init__(self, exchange, limiter=None, markets_ttl=DEFAULT_MARKETS_TTL,
+                 max_retries=DEFAULT_MAX_RETRIES, retry_delay=DEFAULT_RETRY_DELAY):
+        self.exchange = exchange
+        self.limiter = limiter or RateLimiter()
+        self.markets_ttl = markets_ttl
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._markets_loaded_at = None
+        self._markets_lock = threading.Lock()
+
+    def load_markets(self, reload=False):
+        with self._markets_lock:
+            expired = (
+                self._markets_loaded_at is None
+                or time.monotonic() - self._markets_loaded_at > self.markets_ttl
+            )
+            if reload or expired or not getattr(self.exchange, 'markets', None):
+                self.limiter.acquire()
+                self.exchange.load_markets(reload=True)
+                self._markets_loaded_at = time.monotonic()
+            return self.exchange.markets
+
+    def market(self, symbol):
+        return self.load_markets()[symbol]
+
+    def __getattr__(self, name):
+        attr = getattr(self.exchange, name)
+        if not callable(attr) or not name.startswith(_BUDGETED_PREFIXES):
+            return attr
+
+        # orders are retried once and only on an unambiguous 429, reads freely
+        order = name.startswith(_ORDER_PREFIXES)
+        max_retries = min(self.max_retries, ORDER_MAX_RETRIES) if order else self.max_retries
+
+        def budgeted(*args, **kwargs):
+            # ccxt would otherwise call load_markets() itself on the first request
+            self.load_markets()
+            for attempt in range(max_retries + 1):
+                with tracing.span('exchange.rate_limit_wait'):
+                    self.limiter.acquire()
+                try:
+                    with tracing.span(f'exchange.{name}'):
+                        return attr(*args, **kwargs)
+                except Exception as e:
+                    if attempt == max_retries or not is_rate_limited(e, strict=order):
+                        raise
+                    delay = self.retry_delay * (2 ** attempt)
+                    logger.warning(f"⚠️ Osiągnięto limit API ({name}) - czekam {delay:g} sekund")
+                    # back off every caller sharing the session, not just this one
+                    self.limiter.penalize(delay)
+        budgeted.__name__ = name
+        return budgeted
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _pooled_http_session():
+    try:
+        import requests
+        from requests.adapters import HTTPAdapter
+    except Exception:
+        return None
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    return http
+
+
+def create_exchange(testnet=None):
+    import ccxt
+    if testnet is None:
+        testnet = os.getenv('BINANCE_TESTNET', '1') != '0'
+    params = {
+        'apiKey': os.getenv('BINANCE_API_KEY'),
+        'secret': os.getenv('BINANCE_SECRET'),
+        # throttling is done by the shared RateLimiter instead
+        'enableRateLimit': False,
+    }
+    if testnet:
+        params['urls'] = TESTNET_URLS
+    http = _pooled_http_session()
+    if http is not None:
+        params['session'] = http
+    return ccxt.binance(params)
+
+
+def get_exchange():
+    """Return the process-wide ExchangeSession, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = ExchangeSession(create_exchange())
+                logger.info("✅ Utworzono współdzieloną sesję giełdy")
+    return _session
+
+
+def set_exchange(exchange, limiter=None, markets_ttl=DEFAULT_MARKETS_TTL):
+    """Install a custom exchange (e.g. a simulator) as the shared session."""
+    global _session
+    with _session_lock:
+        if exchange is None or isinstance(exchange, ExchangeSession):
+            _session = exchange
+        else:
+            _session = ExchangeSession(exchange, limiter, markets_ttl)
+    return _session
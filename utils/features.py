@@ -0,0 +1,364 @@
+"""Technical indicator features computed in NumPy.
+
+``compute_features`` evaluates the configured indicator set over a whole
+candle window in vectorized form (backtests, training). ``FeaturePipeline``
+keeps the rolling state of the same indicators so the live loop only pays
+O(1) per newly closed candle; the state can be saved between restarts.
+Both paths share the EMA seeding and warm-up rules, so they agree bar for bar.
+"""
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FEATURE_GROUPS = ('returns', 'volatility', 'rsi', 'macd', 'atr', 'bollinger')
+DEFAULT_PARAMS = {
+    'rsi_period': 14,
+    'macd_fast': 12,
+    'macd_slow': 26,
+    'macd_signal': 9,
+    'atr_period': 14,
+    'bb_period': 20,
+    'bb_std': 2.0,
+    'volatility_window': 24,
+}
+# keep w**-k below this inside one EMA chunk so the closed form stays exact
+_EMA_CHUNK_GROWTH = 1e8
+
+
+def _params(params):
+    merged = dict(DEFAULT_PARAMS)
+    merged.update(params or {})
+    return merged
+
+
+def _ema(x, alpha):
+    """Recursive EMA seeded with x[0], evaluated chunk-wise in closed form:
+    within a chunk ema[j] = w^(j+1) * (carry + alpha * sum_i x[i] / w^(i+1))."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.empty_like(x)
+    if not len(x):
+        return out
+    w = 1.0 - alpha
+    if w <= 0:
+        out[:] = x
+        return out
+    chunk = max(1, int(math.log(_EMA_CHUNK_GROWTH) / -math.log(w)))
+    powers = w ** np.arange(1, chunk + 1)
+    out[0] = x[0]
+    for start in range(1, len(x), chunk):
+        seg = x[start:start + chunk]
+        pw = powers[:len(seg)]
+        out[start:start + len(seg)] = pw * (out[start - 1] + alpha * np.cumsum(seg / pw))
+    return out
+
+
+def _rolling(x, window, fn):
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        view = np.lib.stride_tricks.sliding_window_view(x, window)
+        out[window - 1:] = fn(view)
+    return out
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    rsi = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), rsi)
+    return rsi
+
+
+def _columns(candles):
+    """Return (timestamp_ms, open, high, low, close, volume) float/int arrays
+    from a {column: array} mapping or a DataFrame."""
+    ts = candles['timestamp']
+    ts = np.asarray(ts.values if hasattr(ts, 'values') else ts)
+    if np.issubdtype(ts.dtype, np.datetime64):
+        ts = ts.astype('datetime64[ms]').astype(np.int64)
+    cols = [np.asarray(candles[c], dtype=np.float64) for c in ('open', 'high', 'low', 'close', 'volume')]
+    return (ts.astype(np.int64), *cols)
+
+
+def closes_until(candles, last_ts, n):
+    """The last `n` closes with timestamp <= last_ts (e.g. FeaturePipeline.last_ts)."""
+    ts, _, _, _, close, _ = _columns(candles)
+    end = int(np.searchsorted(ts, last_ts, side='right'))
+    return close[max(0, end - n):end]
+
+
+def compute_features(candles, params=None, include=FEATURE_GROUPS, ema_state=None):
+    """Compute indicator arrays aligned with the input rows (NaN during warm-up).
+
+    If `ema_state` is a dict it receives the final value of every EMA, which
+    lets FeaturePipeline continue incrementally from a vectorized pass.
+    """
+    p = _params(params)
+    emas = {}
+    _, _, high, low, close, _ = _columns(candles)
+    n = len(close)
+    idx = np.arange(n)
+    out = {}
+    diff = np.diff(close, prepend=close[:1])
+
+    if 'returns' in include or 'volatility' in include:
+        returns = np.full(n, np.nan)
+        returns[1:] = diff[1:] / close[:-1]
+        if 'returns' in include:
+            out['return'] = returns
+        if 'volatility' in include:
+            w = p['volatility_window']
+            vol = np.full(n, np.nan)
+            vol[1:] = _rolling(returns[1:], w, lambda v: v.std(axis=1))
+            out['volatility'] = vol
+
+    if 'rsi' in include:
+        alpha = 1.0 / p['rsi_period']
+        emas['gain'] = _ema(np.maximum(diff, 0.0), alpha)
+        emas['loss'] = _ema(np.maximum(-diff, 0.0), alpha)
+        rsi = _rsi_from_averages(emas['gain'], emas['loss'])
+        out['rsi'] = np.where(idx >= p['rsi_period'], rsi, np.nan)
+
+    if 'macd' in include:
+        emas['fast'] = _ema(close, 2.0 / (p['macd_fast'] + 1))
+        emas['slow'] = _ema(close, 2.0 / (p['macd_slow'] + 1))
+        macd = emas['fast'] - emas['slow']
+        emas['signal'] = signal = _ema(macd, 2.0 / (p['macd_signal'] + 1))
+        ready = idx >= p['macd_slow'] - 1
+        ready_signal = idx >= p['macd_slow'] + p['macd_signal'] - 2
+        out['macd'] = np.where(ready, macd, np.nan)
+        out['macd_signal'] = np.where(ready_signal, signal, np.nan)
+        out['macd_hist'] = np.where(ready_signal, macd - signal, np.nan)
+
+    if 'atr' in include:
+        prev_close = np.concatenate((close[:1], close[:-1]))
+        tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+        emas['atr'] = _ema(tr, 1.0 / p['atr_period'])
+        atr = np.where(idx >= p['atr_period'] - 1, emas['atr'], np.nan)
+        out['atr'] = atr
+        out['atr_pct'] = atr / close
+
+    if 'bollinger' in include:
+        w = p['bb_period']
+        mid = _rolling(close, w, lambda v: v.mean(axis=1))
+        std = _rolling(close, w, lambda v: v.std(axis=1))
+        out['bb_mid'] = mid
+        out['bb_upper'] = mid + p['bb_std'] * std
+        out['bb_lower'] = mid - p['bb_std'] * std
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['bb_pctb'] = (close - out['bb_lower']) / (out['bb_upper'] - out['bb_lower'])
+    if ema_state is not None and n:
+        ema_state.update({k: float(v[-1]) for k, v in emas.items()})
+    return out
+
+
+class _RollingWindow:
+    """Fixed-size window with running sums, shifted by a reference value so
+    the variance of e.g. BTC closes does not lose precision to cancellation."""
+
+    def __init__(self, size, values=()):
+        self.size = size
+        self.values = deque(values, maxlen=size)
+        self._resync()
+
+    def _resync(self):
+        self.shift = self.values[-1] if self.values else 0.0
+        self.total = float(sum(v - self.shift for v in self.values))
+        self.total_sq = float(sum((v - self.shift) ** 2 for v in self.values))
+        self._since_resync = 0
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            old = self.values[0] - self.shift
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(value)
+        d = value - self.shift
+        self.total += d
+        self.total_sq += d * d
+        self._since_resync += 1
+        # bound floating-point drift and keep the shift close to the data; amortized O(1)
+        if self._since_resync >= self.size * 8:
+            self._resync()
+
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.shift + self.total / len(self.values)
+
+    def std(self):
+        m = self.total / len(self.values)
+        return math.sqrt(max(self.total_sq / len(self.values) - m * m, 0.0))
+
+
+class FeaturePipeline:
+    """Incrementally maintained indicators over closed candles.
+
+    ``update`` accepts the latest candle window (DataFrame or column dict);
+    rows already processed are skipped, new closed rows cost O(1) each and
+    the still-forming candle is ignored. If the window does not connect to
+    the saved state (first run, gap, changed params) the state is rebuilt
+    from the whole window once.
+    """
+
+    def __init__(self, timeframe='1h', params=None, include=FEATURE_GROUPS):
+        from .data_processing import timeframe_to_ms
+        self.timeframe = timeframe
+        self.tf_ms = timeframe_to_ms(timeframe)
+        self.params = _params(params)
+        self.include = tuple(include)
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.last_ts = None
+        self.prev_close = None
+        self.ema = {}
+        p = self.params
+        self.returns_window = _RollingWindow(p['volatility_window'])
+        self.close_window = _RollingWindow(p['bb_period'])
+        self.latest = {}
+
+    def _ema_step(self, key, value, alpha):
+        prev = self.ema.get(key)
+        self.ema[key] = value if prev is None else prev + alpha * (value - prev)
+        return self.ema[key]
+
+    def _step(self, ts, high, low, close):
+        p = self.params
+        idx = self.n
+        prev_close = close if self.prev_close is None else self.prev_close
+        diff = close - prev_close
+        latest = {}
+        nan = float('nan')
+
+        if idx > 0:
+            ret = diff / prev_close
+            self.returns_window.push(ret)
+        else:
+            ret = nan
+        if 'returns' in self.include:
+            latest['return'] = ret
+        if 'volatility' in self.include:
+            latest['volatility'] = self.returns_window.std() if self.returns_window.full() else nan
+
+        if 'rsi' in self.include:
+            alpha = 1.0 / p['rsi_period']
+            gain = self._ema_step('gain', max(diff, 0.0), alpha)
+            loss = self._ema_step('loss', max(-diff, 0.0), alpha)
+            rsi = float(_rsi_from_averages(np.float64(gain), np.float64(loss)))
+            latest['rsi'] = rsi if idx >= p['rsi_period'] else nan
+
+        if 'macd' in self.include:
+            macd = (self._ema_step('fast', close, 2.0 / (p['macd_fast'] + 1))
+                    - self._ema_step('slow', close, 2.0 / (p['macd_slow'] + 1)))
+            signal = self._ema_step('signal', macd, 2.0 / (p['macd_signal'] + 1))
+            ready_signal = idx >= p['macd_slow'] + p['macd_signal'] - 2
+            latest['macd'] = macd if idx >= p['macd_slow'] - 1 else nan
+            latest['macd_signal'] = signal if ready_signal else nan
+            latest['macd_hist'] = macd - signal if ready_signal else nan
+
+        if 'atr' in self.include:
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+            atr = self._ema_step('atr', tr, 1.0 / p['atr_period'])
+            atr = atr if idx >= p['atr_period'] - 1 else nan
+            latest['atr'] = atr
+            latest['atr_pct'] = atr / close
+
+        self.close_window.push(close)
+        if 'bollinger' in self.include:
+            if self.close_window.full():
+                mid, std = self.close_window.mean(), self.close_window.std()
+                upper, lower = mid + p['bb_std'] * std, mid - p['bb_std'] * std
+                latest.update(bb_mid=mid, bb_upper=upper, bb_lower=lower,
+                              bb_pctb=(close - lower) / (upper - lower) if upper != lower else nan)
+            else:
+                latest.update(bb_mid=nan, bb_upper=nan, bb_lower=nan, bb_pctb=nan)
+
+        self.prev_close = close
+        self.last_ts = int(ts)
+        self.n += 1
+        self.latest = latest
+
+    def update(self, candles, now_ms=None):
+        """Advance the state with any newly closed candles and return the
+        latest indicator values as {name: float}."""
+        ts, _, high, low, close, _ = _columns(candles)
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        closed = int(np.searchsorted(ts, now_ms - self.tf_ms, side='right'))
+        ts, high, low, close = ts[:closed], high[:closed], low[:closed], close[:closed]
+        if not len(ts):
+            return self.latest
+
+        if self.last_ts is None or self.last_ts < ts[0] - self.tf_ms or self.last_ts > ts[-1]:
+            # no usable state for this window: rebuild it with one vectorized pass
+            self._rebuild(candles, closed)
+            return self.latest
+        start = int(np.searchsorted(ts, self.last_ts, side='right'))
+        for i in range(start, len(ts)):
+            self._step(ts[i], high[i], low[i], close[i])
+        return self.latest
+
+    def _rebuild(self, candles, closed):
+        self.reset()
+        window = {c: np.asarray(candles[c])[:closed] for c in ('timestamp', 'open', 'high', 'low', 'close', 'volume')}
+        ts, _, _, _, close, _ = _columns(window)
+        ema = {}
+        arrays = compute_features(window, self.params, self.include, ema_state=ema)
+        returns = np.diff(close) / close[:-1]
+        self.n = len(ts)
+        self.last_ts = int(ts[-1])
+        self.prev_close = float(close[-1])
+        self.ema = ema
+        self.returns_window = _RollingWindow(self.params['volatility_window'], returns[-self.params['volatility_window']:].tolist())
+        self.close_window = _RollingWindow(self.params['bb_period'], close[-self.params['bb_period']:].tolist())
+        self.latest = {k: float(v[-1]) for k, v in arrays.items()}
+
+    def state_dict(self):
+        return {
+            'timeframe': self.timeframe,
+            'params': self.params,
+            'include': list(self.include),
+            'n': self.n,
+            'last_ts': self.last_ts,
+            'prev_close': self.prev_close,
+            'ema': self.ema,
+            'returns_window': list(self.returns_window.values),
+            'close_window': list(self.close_window.values),
+            'latest': self.latest,
+        }
+
+    def save(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, timeframe='1h', params=None, include=FEATURE_GROUPS):
+        """Restore a saved pipeline, or start fresh if it was saved with
+        different settings or cannot be read."""
+        pipeline = cls(timeframe, params, include)
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return pipeline
+        if (state.get('timeframe') != timeframe or state.get('params') != pipeline.params
+                or state.get('include') != list(pipeline.include)):
+            logger.info("Zmieniono ustawienia wskaźników - stan zostanie odbudowany")
+            return pipeline
+        pipeline.n = state['n']
+        pipeline.last_ts = state['last_ts']
+        pipeline.prev_close = state['prev_close']
+        pipeline.ema = state['ema']
+        pipeline.returns_window = _RollingWindow(pipeline.params['volatility_window'], state['returns_window'])
+        pipeline.close_window = _RollingWindow(pipeline.params['bb_period'], state['close_window'])
+        pipeline.latest = state['latest']
+        return pipeline
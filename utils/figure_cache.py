@@ -0,0 +1,106 @@
+"""Server-side figure cache shared by all dashboard workers.
+
+Entries live in one SQLite file (WAL mode), so every gunicorn worker and
+every connected browser reuses a figure computed once. Keys combine the
+figure name, its inputs (slider values) and a data version such as the
+latest metrics bucket; new data therefore produces new keys, stale entries
+simply stop being hit and are purged once their TTL has passed.
+"""
+import functools
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv('DASH_CACHE_PATH', '../data/dashboard_cache.db')
+DEFAULT_TTL = 60.0
+# purge expired rows roughly every this many writes
+_PURGE_EVERY = 100
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_figure_cache():
+    global _default_cache
+    with _default_lock:
+        # one connection per process: gunicorn forks workers after import
+        if _default_cache is None or _default_cache.pid != os.getpid():
+            _default_cache = FigureCache(DEFAULT_CACHE_PATH)
+        return _default_cache
+
+
+class FigureCache:
+    def __init__(self, path, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.pid = os.getpid()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = self.misses = 0
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires REAL, value BLOB)')
+
+    @staticmethod
+    def make_key(name, *args, version=None):
+        return json.dumps([name, version, args], default=str, separators=(',', ':'))
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT expires, value FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[0] < time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(row[1])
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.default_ttl if ttl is None else ttl)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO cache (key, expires, value) VALUES (?, ?, ?)',
+                               (key, expires, blob))
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                self._conn.execute('DELETE FROM cache WHERE expires < ?', (time.time(),))
+
+    def invalidate(self, name=None):
+        """Drop every entry of figure `name` (all figures if None)."""
+        with self._lock, self._conn:
+            if name is None:
+                self._conn.execute('DELETE FROM cache')
+            else:
+                self._conn.execute('DELETE FROM cache WHERE key LIKE ?', (json.dumps([name])[:-1] + ',%',))
+
+    def get_or_compute(self, key, compute, ttl=None):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            try:
+                self.set(key, value, ttl)
+            except sqlite3.Error as e:
+                # a busy cache must never break the page
+                logger.warning(f"Nie udało się zapisać do pamięci podręcznej: {e}")
+        return value
+
+
+def cached(name, ttl=None, version=None):
+    """Decorator caching a figure function by `name`, its arguments and the
+    value of `version()` (the data version) at call time."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args):
+            cache = get_figure_cache()
+            key = FigureCache.make_key(name, *args, version=version() if version else None)
+            return cache.get_or_compute(key, lambda: fn(*args), ttl)
+        return wrapper
+    return decorator
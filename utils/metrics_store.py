@@ -0,0 +1,190 @@
+"""Pre-aggregated portfolio metrics for the dashboard.
+
+Every cycle ``MetricsStore.record`` folds the current equity into one row
+per 1m, 1h and 1d bucket (upserted in SQLite, WAL mode; old 1m and 1h
+buckets are pruned after RETENTION_MS) together with the
+running peak, drawdown, rolling Sharpe ratio, volatility and profit
+factor. A dashboard refresh is then an indexed read of at most a few
+hundred rows, and ``series(..., since=ts)`` returns only the buckets at or
+after `ts` (the last one may still be changing) so clients can append.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_PATH = os.getenv('METRICS_DB_PATH', '../data/metrics.db')
+RESOLUTIONS = {'1m': 60 * 1000, '1h': 3600 * 1000, '1d': 86400 * 1000}
+METRIC_COLUMNS = ('bucket', 'equity', 'equity_min', 'equity_max', 'peak', 'drawdown', 'max_drawdown',
+                  'sharpe', 'volatility', 'profit_factor', 'risk_percent', 'samples')
+# how long each rollup is kept (None = forever); pick_resolution never asks
+# the fine tables for spans this long
+RETENTION_MS = {'1m': 7 * 86400 * 1000, '1h': 365 * 86400 * 1000, '1d': None}
+# rolling Sharpe/volatility over the last 30 days of hourly closes
+SHARPE_WINDOW = 720
+_HOURS_PER_YEAR = 365 * 24
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_metrics_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = MetricsStore(DEFAULT_METRICS_PATH)
+        return _default_store
+
+
+def pick_resolution(span_ms, max_points=500):
+    """Finest rollup that covers `span_ms` in at most `max_points` buckets."""
+    for name, size in RESOLUTIONS.items():
+        if span_ms / size <= max_points:
+            return name
+    return '1d'
+
+
+class MetricsStore:
+    def __init__(self, path, retention=None):
+        self.path = path
+        self.retention = dict(RETENTION_MS, **(retention or {}))
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            for name in RESOLUTIONS:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS metrics_{name} ("
+                    "bucket INTEGER PRIMARY KEY, equity REAL, equity_min REAL, equity_max REAL, "
+                    "peak REAL, drawdown REAL, max_drawdown REAL, sharpe REAL, volatility REAL, "
+                    "profit_factor REAL, risk_percent REAL, samples INTEGER)"
+                )
+            self._conn.execute('CREATE TABLE IF NOT EXISTS realized (id INTEGER PRIMARY KEY, profit REAL)')
+        self._restore()
+
+    def _restore(self):
+        row = self._conn.execute('SELECT MAX(equity_max) FROM metrics_1d').fetchone()
+        self.peak = row[0]
+        row = self._conn.execute(
+            'SELECT COALESCE(SUM(CASE WHEN profit > 0 THEN profit END), 0), '
+            'COALESCE(-SUM(CASE WHEN profit < 0 THEN profit END), 0), MAX(id) FROM realized'
+        ).fetchone()
+        self.gross_profit, self.gross_loss, self.last_trade_id = row[0], row[1], row[2] or 0
+        closes = self._conn.execute(
+            f'SELECT equity FROM (SELECT bucket, equity FROM metrics_1h ORDER BY bucket DESC LIMIT {SHARPE_WINDOW + 1}) '
+            'ORDER BY bucket'
+        ).fetchall()
+        self._hourly = deque((r[0] for r in closes), maxlen=SHARPE_WINDOW + 1)
+        last = self._conn.execute('SELECT MAX(bucket) FROM metrics_1h').fetchone()[0]
+        self._hour = last
+
+    def add_realized(self, trades):
+        """Fold realized profits into the profit factor; `trades` are journal
+        rows (id, profit) and rows already seen are ignored."""
+        with self._lock, self._conn:
+            new = [(t['id'], t['profit']) for t in trades
+                   if t['id'] > self.last_trade_id and t.get('profit') is not None]
+            self._conn.executemany('INSERT OR IGNORE INTO realized (id, profit) VALUES (?, ?)', new)
+            for trade_id, profit in new:
+                if profit > 0:
+                    self.gross_profit += profit
+                elif profit < 0:
+                    self.gross_loss -= profit
+                self.last_trade_id = max(self.last_trade_id, trade_id)
+
+    def profit_factor(self):
+        if self.gross_loss > 0:
+            return self.gross_profit / self.gross_loss
+        return None if self.gross_profit == 0 else float('inf')
+
+    def _rolling_stats(self):
+        closes = np.asarray(self._hourly, dtype=np.float64)
+        if len(closes) < 3:
+            return None, None
+        returns = closes[1:] / closes[:-1] - 1.0
+        std = returns.std()
+        sharpe = returns.mean() / std * math.sqrt(_HOURS_PER_YEAR) if std > 0 else 0.0
+        return float(sharpe), float(std)
+
+    def record(self, equity, timestamp=None, risk_percent=None):
+        """Fold one equity observation into every rollup; returns the
+        derived metrics (peak, drawdown, sharpe, ...)."""
+        timestamp = int(time.time() * 1000) if timestamp is None else int(timestamp)
+        with self._lock:
+            self.peak = equity if self.peak is None else max(self.peak, equity)
+            drawdown = (self.peak - equity) / self.peak if self.peak else 0.0
+            hour = timestamp - timestamp % RESOLUTIONS['1h']
+            if hour == self._hour and self._hourly:
+                self._hourly[-1] = equity
+            else:
+                self._hourly.append(equity)
+                self._hour = hour
+            sharpe, volatility = self._rolling_stats()
+            pf = self.profit_factor()
+            values = (equity, equity, equity, self.peak, drawdown, drawdown, sharpe, volatility,
+                      None if pf is None or math.isinf(pf) else pf, risk_percent)
+            with self._conn:
+                for name, size in RESOLUTIONS.items():
+                    self._conn.execute(
+                        f"INSERT INTO metrics_{name} ({', '.join(METRIC_COLUMNS)}) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1) "
+                        "ON CONFLICT(bucket) DO UPDATE SET equity = excluded.equity, "
+                        "equity_min = MIN(equity_min, excluded.equity_min), "
+                        "equity_max = MAX(equity_max, excluded.equity_max), "
+                        "peak = excluded.peak, drawdown = excluded.drawdown, "
+                        "max_drawdown = MAX(max_drawdown, excluded.max_drawdown), "
+                        "sharpe = excluded.sharpe, volatility = excluded.volatility, "
+                        "profit_factor = excluded.profit_factor, "
+                        "risk_percent = COALESCE(excluded.risk_percent, risk_percent), "
+                        "samples = samples + 1",
+                        (timestamp - timestamp % size,) + values
+                    )
+                    if self.retention.get(name):
+                        # bucket is the primary key, so this is an index range delete
+                        self._conn.execute(f"DELETE FROM metrics_{name} WHERE bucket < ?",
+                                           (timestamp - self.retention[name],))
+        return {'equity': equity, 'peak': self.peak, 'drawdown': drawdown, 'sharpe': sharpe,
+                'volatility': volatility, 'profit_factor': pf, 'risk_percent': risk_percent}
+
+    def series(self, resolution='1h', since=None, limit=500):
+        """Rollup rows as {column: list}, oldest first. With `since` only
+        buckets starting at or after it are returned; otherwise the latest
+        `limit` buckets."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Nieznana rozdzielczość {resolution}")
+        table = f"metrics_{resolution}"
+        columns = ', '.join(METRIC_COLUMNS)
+        with self._lock:
+            if since is not None:
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM {table} WHERE bucket >= ? ORDER BY bucket LIMIT ?",
+                    (int(since) - int(since) % RESOLUTIONS[resolution], limit)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    f"SELECT * FROM (SELECT {columns} FROM {table} ORDER BY bucket DESC LIMIT ?) ORDER BY bucket",
+                    (limit,)
+                ).fetchall()
+        return {c: [r[i] for r in rows] for i, c in enumerate(METRIC_COLUMNS)}
+
+    def version(self):
+        """Changes whenever a new observation is recorded; used as a cache key."""
+        with self._lock:
+            row = self._conn.execute('SELECT bucket, samples FROM metrics_1m ORDER BY bucket DESC LIMIT 1').fetchone()
+        return f"{row[0]}:{row[1]}" if row else None
+
+    def latest(self):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(METRIC_COLUMNS)} FROM metrics_1m ORDER BY bucket DESC LIMIT 1"
+            ).fetchone()
+        return dict(zip(METRIC_COLUMNS, row)) if row else None
@@ -0,0 +1,236 @@
+"""Evaluate many trading pairs in one process.
+
+Each symbol keeps its own indicator pipeline, trade history and risk
+budget, while the exchange session, models and sentiment are shared.
+Prices for all symbols come from one ``fetch_tickers`` call (or the
+market stream), candle syncs and order placement run on a thread pool,
+and the per-symbol decision step is a few dictionary lookups, so one core
+handles dozens of pairs per cycle.
+
+Only ``config['symbol']`` is traded unless ``config['symbols']`` lists the
+pairs explicitly; opting in to more pairs places live orders on each of
+them, sized by the optional per-pair ``risk_budgets`` overrides:
+
+    "symbols": ["BTC/USDT", "ETH/USDT"],
+    "risk_budgets": {"ETH/USDT": {"risk_percent": 0.75, "max_position_size": 0.1}}
+"""
+import contextvars
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import ai_models, data_processing, risk_management, trade_journal
+from .features import FeaturePipeline, closes_until
+from .tracing import timed
+
+logger = logging.getLogger(__name__)
+
+MIN_BARS = 50
+
+
+def feature_state_path(base_path, symbol):
+    root, ext = os.path.splitext(base_path)
+    return f"{root}_{symbol.replace('/', '_')}{ext or '.json'}"
+
+
+class SymbolContext:
+    def __init__(self, symbol, timeframe, indicator_params, feature_state_file, risk_budget):
+        self.symbol = symbol
+        self.feature_state_file = feature_state_file
+        self.pipeline = FeaturePipeline.load(feature_state_file, timeframe, indicator_params)
+        # recent trades survive restarts; open buys stay linked to their journal lots
+        self.trade_history = trade_journal.get_journal().history(symbol)
+        self.risk_budget = risk_budget
+        self.last_decided_ts = None
+        self.features = {}
+        self.regime = None
+
+
+class MultiSymbolEngine:
+    def __init__(self, config, max_workers=8):
+        self.config = config
+        self.timeframe = config['timeframe']
+        self.data_points = config.get('data_points', 500)
+        self.symbols = list(config.get('symbols') or [config['symbol']])
+        base_file = config.get('feature_state_file', 'feature_state.json')
+        budgets = config.get('risk_budgets', {})
+        self.contexts = {
+            s: SymbolContext(
+                s, self.timeframe, config.get('indicators'),
+                feature_state_path(base_file, s), budgets.get(s, {})
+            )
+            for s in self.symbols
+        }
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='symbol')
+        # optional utils.correlation.RollingCorrelation used to size correlated positions down
+        self.correlation = None
+
+    def risk_parameters(self, symbol):
+        """Global risk parameters overridden by the symbol's risk budget."""
+        params = risk_management.get_risk_parameters(self.config)
+        params.update(self.contexts[symbol].risk_budget)
+        return params
+
+    def open_symbols(self):
+        journal = trade_journal.get_journal()
+        return [s for s in self.symbols if journal.oldest_open_lot(s) is not None]
+
+    @timed()
+    def fetch_prices(self, exchange, stream=None, symbols=None):
+        symbols = list(symbols or self.symbols)
+        prices = {}
+        if stream is not None:
+            for s in symbols:
+                price = stream.last_price(s)
+                if price is not None:
+                    prices[s] = price
+        missing = [s for s in symbols if s not in prices]
+        if missing:
+            if len(missing) == 1:
+                prices[missing[0]] = exchange.fetch_ticker(missing[0])['last']
+            else:
+                tickers = exchange.fetch_tickers(missing)
+                prices.update({s: tickers[s]['last'] for s in missing if s in tickers})
+        return prices
+
+    def portfolio_value(self, balance, prices):
+        quote = self.symbols[0].split('/')[1]
+        total = balance.get(quote, {}).get('free', 0.0) or 0.0
+        for symbol, price in prices.items():
+            base = symbol.split('/')[0]
+            total += (balance.get(base, {}).get('free', 0.0) or 0.0) * price
+        return total
+
+    def _map(self, fn, items):
+        # pool threads do not inherit context variables; each task runs in a
+        # copy of the caller's context so its log records keep the cycle_id
+        futures = [self._pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [f.result() for f in futures]
+
+    @timed()
+    def load_candles(self, stream=None):
+        """Closed candles per symbol; REST syncs run concurrently and share
+        the exchange session's rate limit."""
+        if stream is not None:
+            return {s: stream.candles(s, self.data_points) for s in self.symbols}
+
+        def load(symbol):
+            return symbol, data_processing.get_market_data(symbol, self.timeframe, self.data_points)
+        return dict(self._map(load, self.symbols))
+
+    def classify_regime(self, ctx, df, features):
+        """Regime/anomaly of the latest closed bar from the cached detector
+        registered as 'regime_detector:<symbol>' (None if unavailable).
+        The detector is loaded (and fitted) by a background job; until then
+        the decision path does not wait for it."""
+        name = f'regime_detector:{ctx.symbol}'
+        detector = ai_models.get_model(name) if ai_models.is_loaded(name) else None
+        if detector is None:
+            return None
+        window = detector.params['er_window'] + 1
+        return detector.classify(features, closes_until(df, ctx.pipeline.last_ts, window))
+
+    @timed()
+    def evaluate(self, candles, sentiment, trading_agent, risk_agent, monitoring_agent, closed_ms=None):
+        """Return a list of (symbol, decision, risk_params) for symbols whose
+        latest closed candle has not been decided on yet."""
+        decisions = []
+        held = self.open_symbols()
+        for symbol, df in candles.items():
+            ctx = self.contexts[symbol]
+            if df is None or len(df['close']) < MIN_BARS:
+                logger.error(f"❌ Brak wystarczających danych do analizy {symbol}")
+                continue
+            now_ms = closed_ms.get(symbol) if closed_ms else None
+            features = ctx.pipeline.update(df, now_ms=now_ms)
+            if ctx.pipeline.last_ts is None or ctx.pipeline.last_ts == ctx.last_decided_ts:
+                continue
+            ctx.pipeline.save(ctx.feature_state_file)
+            ctx.regime = self.classify_regime(ctx, df, features)
+            if ctx.regime is not None:
+                features = dict(features, regime=ctx.regime['regime'], anomaly=ctx.regime['is_anomaly'])
+                logger.info(f"🧭 Reżim {symbol}: {ctx.regime['label']}"
+                            + (" ⚠️ anomalia" if ctx.regime['is_anomaly'] else ""))
+            ctx.features = features
+            ctx.last_decided_ts = ctx.pipeline.last_ts
+
+            risk_params = self.risk_parameters(symbol)
+            risk_params['risk_percent'] = risk_management.manage_system_parameters(
+                ctx.trade_history, df, sentiment, risk_agent, features, base_risk=risk_params['risk_percent']
+            )
+            risk_params['risk_percent'] *= risk_management.correlation_scale(self.correlation, symbol, held)
+            ai_models.monitor_system_health(monitoring_agent, df, ctx.trade_history, features)
+            decision = ai_models.make_trading_decision(
+                ctx.trade_history, df, sentiment, risk_params, trading_agent, features
+            )
+            logger.info(f"💡 Decyzja {symbol}: {decision}")
+            decisions.append((symbol, decision, risk_params))
+        return decisions
+
+    def market_limits(self, exchange, symbol):
+        """(step, min amount, min notional) from the session's cached markets."""
+        try:
+            market = exchange.market(symbol)
+        except Exception as e:
+            logger.warning(f"⚠️ Brak danych rynku {symbol}: {e}")
+            return 0.0, 0.0, 0.0
+        mode = getattr(exchange, 'precisionMode', risk_management.TICK_SIZE)
+        return risk_management.amount_limits(market, mode)
+
+    def position_sizes(self, orders, prices, exchange, equity, balance=None):
+        """Size every (symbol, decision, risk_params) order in one array
+        operation from the live equity and the balance already fetched."""
+        symbols = [s for s, _, _ in orders]
+        buy = np.array([d == 'BUY' for _, d, _ in orders])
+        limits = np.array([self.market_limits(exchange, s) for s in symbols]).reshape(-1, 3)
+        kelly = []
+        for symbol, _, params in orders:
+            cap = risk_management.kelly_cap(self.contexts[symbol].trade_history,
+                                            params.get('kelly_fraction', 0.5), params.get('kelly_min_trades', 20))
+            kelly.append(np.nan if cap is None else cap)
+        available = np.full(len(orders), np.inf)
+        if balance is not None:
+            quote = symbols[0].split('/')[1]
+            quote_free = balance.get(quote, {}).get('free', 0.0) or 0.0
+            # buys placed in the same cycle split the free quote balance
+            for i, symbol in enumerate(symbols):
+                if buy[i]:
+                    available[i] = quote_free / buy.sum()
+                else:
+                    available[i] = balance.get(symbol.split('/')[0], {}).get('free', 0.0) or 0.0
+        return risk_management.position_sizes(
+            buy, [prices.get(s, np.nan) for s in symbols], equity,
+            risk_percent=[p['risk_percent'] for _, _, p in orders],
+            max_size=[p.get('max_position_size', 0.01) for _, _, p in orders],
+            atr_pct=[self.contexts[s].features.get('atr_pct', np.nan) for s in symbols],
+            stop_multiple=[p.get('atr_stop_multiple', 2.0) for _, _, p in orders],
+            kelly=kelly, available=available,
+            step=limits[:, 0], min_amount=limits[:, 1], min_cost=limits[:, 2],
+        )
+
+    @timed()
+    def execute(self, decisions, exchange, stream=None, equity=None, balance=None):
+        """Size and place orders for BUY/SELL decisions concurrently."""
+        import api
+        orders = [(s, d, p) for s, d, p in decisions if d in ('BUY', 'SELL')]
+        if not orders:
+            return []
+        prices = self.fetch_prices(exchange, stream, [s for s, _, _ in orders])
+        amounts = self.position_sizes(orders, prices, exchange,
+                                      equity or risk_management.DEFAULT_EQUITY, balance)
+
+        def place(i):
+            symbol, decision, _ = orders[i]
+            ctx = self.contexts[symbol]
+            price = prices.get(symbol)
+            if price is None:
+                logger.warning(f"❌ Brak ceny dla {symbol}")
+                return symbol, False
+            amount = float(amounts[i])
+            if amount <= 0:
+                logger.warning(f"❌ Nie wykonano transakcji {symbol} - nieprawidłowy rozmiar pozycji")
+                return symbol, False
+            return symbol, api.execute_trade(decision, amount, ctx.trade_history, price, symbol)
+        return self._map(place, range(len(orders)))
@@ -0,0 +1,177 @@
+"""Grid / random search over risk parameters using the event-driven backtester.
+
+Candle and indicator arrays are copied once into ``multiprocessing``
+shared memory; workers attach to them in their initializer, so each task
+only pickles a small parameter dict and the sweep scales with cores.
+
+    python -m utils.param_sweep --samples 200 --output sweep_results.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .backtest import run_event_backtest
+from .features import compute_features
+
+logger = logging.getLogger(__name__)
+
+SWEEP_PARAMS = ('risk_percent', 'max_position_size', 'stop_loss_percent', 'max_drawdown_percent')
+DEFAULT_SPACE = {
+    'risk_percent': [0.5, 1.0, 2.0, 3.0],
+    'max_position_size': [0.005, 0.01, 0.02, 0.05],
+    'stop_loss_percent': [2.0, 5.0, 10.0],
+    'max_drawdown_percent': [10.0, 15.0, 25.0],
+}
+RESULT_COLUMNS = ('rank',) + SWEEP_PARAMS + (
+    'sharpe_ratio', 'profit_factor', 'total_return', 'max_drawdown', 'trades', 'win_rate', 'current_value'
+)
+
+# worker-side views into the parent's shared memory
+_worker_arrays = None
+_worker_handles = None
+_worker_options = None
+
+
+def grid(space=None):
+    space = space or DEFAULT_SPACE
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_search(space=None, samples=100, seed=None):
+    """Sample `samples` combinations; a (low, high) tuple is sampled uniformly,
+    a list is sampled from its values."""
+    space = space or DEFAULT_SPACE
+    rng = random.Random(seed)
+    combos = []
+    for _ in range(samples):
+        combo = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                combo[name] = rng.uniform(*values)
+            else:
+                combo[name] = rng.choice(values)
+        combos.append(combo)
+    return combos
+
+
+def _share(arrays):
+    handles, spec = [], {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+        handles.append(shm)
+        spec[name] = (shm.name, arr.shape, arr.dtype.str)
+    return handles, spec
+
+
+def _attach(spec):
+    handles, arrays = [], {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        handles.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return handles, arrays
+
+
+def _init_worker(spec, options):
+    global _worker_arrays, _worker_handles, _worker_options
+    _worker_handles, _worker_arrays = _attach(spec)
+    _worker_options = options
+
+
+def _evaluate(combo):
+    candles = {k[2:]: v for k, v in _worker_arrays.items() if k.startswith('c:')}
+    features = {k[2:]: v for k, v in _worker_arrays.items() if k.startswith('f:')}
+    risk_params = {
+        'risk_percent': combo['risk_percent'],
+        'max_position_size': combo['max_position_size'],
+    }
+    result = run_event_backtest(
+        candles,
+        risk_params=risk_params,
+        features=features,
+        stop_loss_percent=combo.get('stop_loss_percent'),
+        max_drawdown_percent=combo.get('max_drawdown_percent'),
+        **_worker_options
+    )
+    return dict(combo, **result['metrics'])
+
+
+def run_sweep(candles, combos, workers=None, sort_by='sharpe_ratio', feature_params=None,
+              timeframe='1h', sentiment=0.0, fee=None, slippage=None, chunksize=None):
+    """Evaluate every parameter combination and return results ranked by `sort_by`."""
+    columns = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+    arrays = {f'c:{c}': np.asarray(candles[c]) for c in columns}
+    arrays.update({f'f:{k}': v for k, v in compute_features(candles, feature_params).items()})
+    options = {'timeframe': timeframe, 'sentiment': sentiment}
+    if fee is not None:
+        options['fee'] = fee
+    if slippage is not None:
+        options['slippage'] = slippage
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, len(combos) // (workers * 4))
+    handles, spec = _share(arrays)
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec, options)) as pool:
+            results = list(pool.map(_evaluate, combos, chunksize=chunksize))
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+    elapsed = time.perf_counter() - start
+    logger.info(f"🔎 Przeszukano {len(combos)} kombinacji w {elapsed:.1f} s ({workers} procesów)")
+
+    results.sort(key=lambda r: r[sort_by], reverse=sort_by != 'max_drawdown')
+    for rank, row in enumerate(results, 1):
+        row['rank'] = rank
+    return results
+
+
+def write_results(results, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Przeszukiwanie parametrów ryzyka na danych historycznych")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--bars', type=int, default=None, help="liczba świec (domyślnie data_points z configu)")
+    parser.add_argument('--samples', type=int, default=0, help="losowe próbkowanie zamiast pełnej siatki")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sort-by', default='sharpe_ratio')
+    parser.add_argument('--output', default='sweep_results.csv')
+    args = parser.parse_args(argv)
+
+    from .data_processing import get_candle_store
+    with open(args.config) as f:
+        config = json.load(f)
+    bars = args.bars or config.get('data_points', 8760)
+    candles = get_candle_store().tail(config['symbol'], config['timeframe'], bars)
+    if not len(candles['close']):
+        raise SystemExit(f"Brak zapisanych świec {config['symbol']} {config['timeframe']} - uruchom najpierw bota")
+
+    combos = random_search(samples=args.samples) if args.samples else grid()
+    results = run_sweep(candles, combos, workers=args.workers, sort_by=args.sort_by,
+                        feature_params=config.get('indicators'), timeframe=config['timeframe'])
+    write_results(results, args.output)
+    print(f"Zapisano {len(results)} wyników do {args.output}; najlepszy: "
+          f"{ {k: results[0][k] for k in SWEEP_PARAMS} }")
+
+
+if __name__ == '__main__':
+    main()
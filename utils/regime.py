@@ -0,0 +1,229 @@
+"""Market regime classification and anomaly scoring.
+
+Each closed bar is labelled as a trend, range or high-volatility regime
+(``TREND``/``RANGE``/``HIGH_VOL``, the 2/1/0 scale of the dashboard gauge)
+from the Kaufman efficiency ratio and realized volatility, and scored by an
+``IsolationForest`` over the same indicator vector. Thresholds and the
+forest are fitted offline on stored history and pickled next to the other
+models; the bot only loads them, so the online cost per bar is one
+efficiency ratio over a short window and one forest evaluation.
+
+    python -m utils.regime --bars 8760
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import time
+
+import numpy as np
+
+from .features import compute_features
+
+logger = logging.getLogger(__name__)
+
+HIGH_VOL, RANGE, TREND = 0, 1, 2
+REGIMES = {HIGH_VOL: 'high_vol', RANGE: 'range', TREND: 'trend'}
+ANOMALY_FEATURES = ('return', 'volatility', 'atr_pct', 'bb_pctb', 'macd_hist_pct', 'efficiency')
+DEFAULT_PARAMS = {
+    'er_window': 20,
+    # thresholds are these quantiles of the fitted history
+    'trend_quantile': 0.7,
+    'vol_quantile': 0.9,
+    'contamination': 0.01,
+    'n_estimators': 100,
+}
+
+
+def efficiency_ratio(close, window):
+    """Net move over the path length of the last `window` bars (0 = noise, 1 = straight line)."""
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) <= window:
+        return out
+    path = np.cumsum(np.abs(np.diff(close, prepend=close[0])))
+    travelled = path[window:] - path[:-window]
+    net = np.abs(close[window:] - close[:-window])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[window:] = np.where(travelled > 0, net / travelled, 0.0)
+    return out
+
+
+def anomaly_matrix(features, efficiency, close):
+    """Rows of ANOMALY_FEATURES; MACD is scaled by price so it is comparable over time."""
+    columns = dict(features, efficiency=efficiency)
+    columns['macd_hist_pct'] = np.asarray(features['macd_hist'], dtype=np.float64) / np.asarray(close, dtype=np.float64)
+    return np.column_stack([np.asarray(columns[k], dtype=np.float64) for k in ANOMALY_FEATURES])
+
+
+class RegimeDetector:
+    def __init__(self, params=None, feature_params=None):
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.feature_params = feature_params
+        self.trend_threshold = None
+        self.vol_threshold = None
+        self.forest = None
+        self.fitted_at = None
+        self.n_samples = 0
+
+    def fit(self, candles):
+        """Fit thresholds and the anomaly model on historical candles."""
+        close = np.asarray(candles['close'], dtype=np.float64)
+        if len(close) < self.params['er_window'] * 5:
+            raise ValueError(f"Za mało świec do dopasowania detektora reżimu: {len(close)}")
+        features = compute_features(candles, self.feature_params)
+        efficiency = efficiency_ratio(close, self.params['er_window'])
+        self.trend_threshold = float(np.nanquantile(efficiency, self.params['trend_quantile']))
+        self.vol_threshold = float(np.nanquantile(features['volatility'], self.params['vol_quantile']))
+        X = anomaly_matrix(features, efficiency, close)
+        X = X[np.isfinite(X).all(axis=1)]
+        self.n_samples = len(X)
+        try:
+            from sklearn.ensemble import IsolationForest
+        except Exception:
+            logger.warning("scikit-learn niedostępny - wykrywanie anomalii wyłączone")
+            self.forest = None
+        else:
+            start = time.perf_counter()
+            self.forest = IsolationForest(
+                n_estimators=self.params['n_estimators'],
+                contamination=self.params['contamination'],
+                random_state=0
+            ).fit(X)
+            logger.info(f"🌲 IsolationForest dopasowany na {len(X)} świecach w {time.perf_counter() - start:.1f} s")
+        # set last: classify() treats the detector as unfitted until then
+        self.fitted_at = time.time()
+        return self
+
+    def is_fitted(self):
+        return self.fitted_at is not None
+
+    def regimes(self, features, close):
+        """Vectorized regime labels for whole arrays (e.g. backtests)."""
+        efficiency = efficiency_ratio(close, self.params['er_window'])
+        labels = np.full(len(close), RANGE, dtype=np.int8)
+        labels[efficiency > self.trend_threshold] = TREND
+        labels[np.asarray(features['volatility']) > self.vol_threshold] = HIGH_VOL
+        return labels
+
+    def classify(self, features, close):
+        """Regime and anomaly score of the latest closed bar.
+
+        `features` are the latest indicator values (FeaturePipeline output)
+        and `close` the recent closes; only the last er_window + 1 are used.
+        None until the detector is fitted.
+        """
+        if self.fitted_at is None:
+            return None
+        window = self.params['er_window']
+        close = np.asarray(close, dtype=np.float64)[-(window + 1):]
+        efficiency = float(efficiency_ratio(close, window)[-1]) if len(close) > window else float('nan')
+        volatility = features.get('volatility', float('nan'))
+        if volatility == volatility and volatility > self.vol_threshold:
+            regime = HIGH_VOL
+        elif efficiency == efficiency and efficiency > self.trend_threshold:
+            regime = TREND
+        else:
+            regime = RANGE
+        result = {'regime': regime, 'label': REGIMES[regime], 'efficiency': efficiency,
+                  'anomaly_score': None, 'is_anomaly': False}
+        if self.forest is not None:
+            row = anomaly_matrix({k: [features.get(k, np.nan)] for k in ('return', 'volatility', 'atr_pct',
+                                                                          'bb_pctb', 'macd_hist')},
+                                 [efficiency], close[-1:])
+            if np.isfinite(row).all():
+                # decision_function < 0 marks outliers; flip so higher = more anomalous
+                score = -float(self.forest.decision_function(row)[0])
+                result.update(anomaly_score=score, is_anomaly=score > 0)
+        return result
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    @classmethod
+    def load_or_fit(cls, path, candles_fn, params=None, feature_params=None):
+        """Load the cached detector, fitting and saving it only if it is
+        missing or was fitted with different settings. If the fit fails (e.g.
+        too little stored history yet) an unfitted detector is returned;
+        fit_pending() retries it later."""
+        expected = cls(params, feature_params)
+        try:
+            detector = cls.load(path)
+            if detector.params == expected.params and detector.feature_params == feature_params:
+                return detector
+            logger.info("Zmieniono ustawienia detektora reżimu - dopasowuję ponownie")
+        # ImportError: pickled under an older module layout or library version
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError):
+            pass
+        return fit_pending(expected, path, candles_fn)
+
+
+def fit_pending(detector, path, candles_fn):
+    """Fit and save `detector` in place unless it is fitted already; on
+    failure it stays unfitted (classify returns None) and is returned as is."""
+    if detector.is_fitted():
+        return detector
+    try:
+        detector.fit(candles_fn())
+    except Exception as e:
+        logger.warning(f"⚠️ Detektor reżimu pozostaje niedopasowany: {e}")
+        return detector
+    detector.save(path)
+    return detector
+
+
+def regime_model_path(base_path, symbol):
+    root, ext = os.path.splitext(base_path)
+    return f"{root}_{symbol.replace('/', '_')}{ext or '.pkl'}"
+
+
+def save_regimes(path, regimes):
+    """Write the latest {symbol: classification} for the dashboard gauge."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(regimes, f)
+    os.replace(tmp, path)
+
+
+def load_regimes(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dopasowanie detektora reżimu rynku na zapisanej historii")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--bars', type=int, default=8760)
+    args = parser.parse_args(argv)
+
+    from .data_processing import get_candle_store
+    with open(args.config) as f:
+        config = json.load(f)
+    logging.basicConfig(level=logging.INFO)
+    store = get_candle_store()
+    for symbol in config.get('symbols') or [config['symbol']]:
+        candles = store.tail(symbol, config['timeframe'], args.bars)
+        if not len(candles['close']):
+            print(f"Brak zapisanych świec {symbol} {config['timeframe']} - pomijam")
+            continue
+        detector = RegimeDetector(config.get('regime'), config.get('indicators')).fit(candles)
+        path = regime_model_path(config.get('regime_model_path', '../models/regime_model.pkl'), symbol)
+        detector.save(path)
+        print(f"{symbol}: trend > {detector.trend_threshold:.3f}, zmienność > {detector.vol_threshold:.4f} -> {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,133 @@
 import logging
+
+import numpy as np
+
+from .tracing import timed
+
 logger = logging.getLogger(__name__)
 
+# used only until a live equity figure is available (e.g. in a bare backtest)
+DEFAULT_EQUITY = 10000.0
+# ccxt precisionMode value meaning 'precision' holds the step size itself
+TICK_SIZE = 4
+
 def get_risk_parameters(config):
     return {
         'risk_percent': config.get('risk_percent', 1.0),
-        'max_position_size': config.get('max_position_size', 0.01)
+        'max_position_size': config.get('max_position_size', 0.01),
+        'atr_stop_multiple': config.get('atr_stop_multiple', 2.0),
+        'kelly_fraction': config.get('kelly_fraction', 0.5),
+        'kelly_min_trades': config.get('kelly_min_trades', 20),
     }
 
-def manage_system_parameters(trade_history, df, sentiment, risk_agent):
-    # Return unchanged risk percent for now
-    return risk_agent.predict if hasattr(risk_agent, 'predict') else 1.0
+# realized hourly volatility above which risk is scaled down proportionally
+TARGET_VOLATILITY = 0.01
+
+def manage_system_parameters(trade_history, df, sentiment, risk_agent, features=None, base_risk=1.0):
+    # Scale the configured risk percent down in volatile markets
+    volatility = (features or {}).get('volatility')
+    if volatility is None or volatility != volatility or volatility <= TARGET_VOLATILITY:
+        return base_risk
+    return base_risk * TARGET_VOLATILITY / volatility
+
+def correlation_scale(correlation, symbol, held_symbols):
+    # Shrink risk for a symbol that moves together with positions already held:
+    # 1 / (1 + sum of positive correlations with the held symbols)
+    if correlation is None or symbol not in correlation.index:
+        return 1.0
+    corr = correlation.correlation()
+    i = correlation.index[symbol]
+    held = [correlation.index[s] for s in held_symbols if s != symbol and s in correlation.index]
+    if not held:
+        return 1.0
+    return 1.0 / (1.0 + float(np.clip(corr[i, held], 0.0, None).sum()))
+
+def kelly_cap(trade_history, fraction=0.5, min_trades=20):
+    # Fraction of equity allowed in one position by the (fractional) Kelly
+    # criterion on closed trades; None until there are enough of them
+    returns = np.array([t['profit'] / t['cost'] for t in trade_history
+                        if t.get('profit') is not None and t.get('cost')], dtype=np.float64)
+    if len(returns) < min_trades:
+        return None
+    wins, losses = returns[returns > 0], -returns[returns < 0]
+    if not len(losses):
+        return 1.0
+    if not len(wins):
+        return 0.0
+    p = len(wins) / len(returns)
+    b = wins.mean() / losses.mean()
+    return float(np.clip((p - (1.0 - p) / b) * fraction, 0.0, 1.0))
+
+def amount_limits(market, precision_mode=TICK_SIZE):
+    # (step, min amount, min notional) from ccxt market metadata
+    market = market or {}
+    precision = (market.get('precision') or {}).get('amount')
+    if precision is None:
+        step = 0.0
+    elif precision_mode == TICK_SIZE:
+        step = float(precision)
+    else:
+        step = 10.0 ** -int(precision)
+    limits = market.get('limits') or {}
+    min_amount = (limits.get('amount') or {}).get('min') or 0.0
+    min_cost = (limits.get('cost') or {}).get('min') or 0.0
+    return step, float(min_amount), float(min_cost)
+
+@timed()
+def position_sizes(buy, prices, equity, risk_percent, max_size, atr_pct=np.nan, stop_multiple=2.0,
+                   kelly=np.nan, available=np.inf, step=0.0, min_amount=0.0, min_cost=0.0):
+    """Order amounts for many symbols in one array operation.
+
+    The notional risked is ``equity * risk_percent``; with an ATR the
+    position is sized so a stop `stop_multiple` ATRs away loses exactly that
+    (volatility targeting), otherwise the risked notional itself is traded.
+    Buys are capped by the Kelly fraction of equity and the available quote
+    funds, every order by ``max_size`` and by the available base for sells.
+    Amounts are rounded down to the lot step and zeroed below the exchange
+    minimums. Every argument broadcasts against `prices`.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    buy = np.broadcast_to(np.asarray(buy, dtype=bool), prices.shape)
+    atr_pct = np.broadcast_to(np.asarray(atr_pct, dtype=np.float64), prices.shape)
+    kelly = np.broadcast_to(np.asarray(kelly, dtype=np.float64), prices.shape)
+    risked = np.asarray(equity, dtype=np.float64) * np.asarray(risk_percent, dtype=np.float64) / 100.0
+    stop = atr_pct * stop_multiple
+    with np.errstate(divide='ignore', invalid='ignore'):
+        notional = np.where(np.isfinite(stop) & (stop > 0), risked / stop, risked)
+        notional = np.where(buy & np.isfinite(kelly), np.minimum(notional, kelly * equity), notional)
+        amount = np.where(prices > 0, notional / prices, 0.0)
+        # for buys `available` is quote currency, for sells base currency
+        available = np.broadcast_to(np.asarray(available, dtype=np.float64), prices.shape)
+        cap = np.where(buy, available / prices, available)
+    amount = np.minimum(np.minimum(amount, max_size), np.nan_to_num(cap, nan=0.0, posinf=np.inf))
+    step = np.asarray(step, dtype=np.float64)
+    # a relative epsilon keeps e.g. 0.3 / 0.1 from flooring to 2
+    rounded = np.floor(amount / np.where(step > 0, step, 1.0) * (1 + 1e-9)) * step
+    amount = np.where(step > 0, rounded, amount)
+    amount = np.where((amount < min_amount) | (amount * prices < min_cost), 0.0, amount)
+    return np.nan_to_num(np.maximum(amount, 0.0))
 
+@timed()
 def calculate_position_size(decision, current_price, trade_history, risk_params):
+    # Single-symbol wrapper around position_sizes(); live equity, ATR, the
+    # available funds and lot limits are read from risk_params when present
     try:
-        risk_percent = float(risk_params.get('risk_percent', 1.0)) / 100.0
-        # simple notional size using fixed portfolio assumption
-        portfolio = 10000.0
-        notional = portfolio * risk_percent
-        amount = notional / float(current_price) if float(current_price) > 0 else 0
-        max_size = risk_params.get('max_position_size', 0.01)
-        return min(amount, max_size)
+        kelly = kelly_cap(trade_history, risk_params.get('kelly_fraction', 0.5),
+                          risk_params.get('kelly_min_trades', 20))
+        amount = position_sizes(
+            decision == 'BUY', [float(current_price)],
+            equity=risk_params.get('equity') or DEFAULT_EQUITY,
+            risk_percent=float(risk_params.get('risk_percent', 1.0)),
+            max_size=risk_params.get('max_position_size', 0.01),
+            atr_pct=risk_params.get('atr_pct', np.nan),
+            stop_multiple=risk_params.get('atr_stop_multiple', 2.0),
+            kelly=np.nan if kelly is None else kelly,
+            available=risk_params.get('available', np.inf),
+            step=risk_params.get('step', 0.0),
+            min_amount=risk_params.get('min_amount', 0.0),
+            min_cost=risk_params.get('min_cost', 0.0),
+        )
+        return float(amount[0])
     except Exception as e:
         logger.error(f"Błąd kalkulacji rozmiaru pozycji: {e}")
         return 0
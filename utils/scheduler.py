@@ -0,0 +1,165 @@
+"""Small job scheduler for the trading loop.
+
+Jobs either run at fixed intervals or at timeframe boundaries (candle
+closes). Everything is driven from one heap of due times, so nothing
+sleeps for a hard-coded period. Jobs marked ``background`` run on a
+thread pool and never delay the decision path; a background job that is
+still running when it becomes due again is skipped rather than stacked.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .data_processing import timeframe_to_ms
+
+logger = logging.getLogger(__name__)
+
+
+def next_boundary(timeframe, now=None, delay=0.0):
+    """Epoch seconds of the next `timeframe` boundary after `now`, plus `delay`."""
+    now = time.time() if now is None else now
+    period = timeframe_to_ms(timeframe) / 1000.0
+    return (now // period + 1) * period + delay
+
+
+class Job:
+    def __init__(self, name, fn, interval=None, timeframe=None, delay=0.0,
+                 background=False, retry_after=None):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.timeframe = timeframe
+        self.delay = delay
+        self.background = background
+        self.retry_after = retry_after
+        self.running = False
+        self.last_latency = None
+
+    def next_run(self, now):
+        """Return (due time, candle boundary or None) of the next run."""
+        if self.timeframe:
+            boundary = next_boundary(self.timeframe, now)
+            return boundary + self.delay, boundary
+        return now + self.interval, None
+
+
+class Scheduler:
+    def __init__(self, max_workers=4, on_error=None):
+        self._heap = []
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.on_error = on_error
+        self.exit_code = 0
+
+    def _push(self, when, job, boundary=None):
+        with self._lock:
+            heapq.heappush(self._heap, (when, next(self._seq), job, boundary))
+        self._wakeup.set()
+
+    def every(self, name, interval, fn, background=False, run_now=False, retry_after=None):
+        """Run `fn` every `interval` seconds."""
+        job = Job(name, fn, interval=interval, background=background, retry_after=retry_after)
+        now = time.time()
+        self._push(now if run_now else job.next_run(now)[0], job)
+        return job
+
+    def at_candle_close(self, name, timeframe, fn, delay=0.5, background=False,
+                        run_now=False, retry_after=None):
+        """Run `fn` right after every `timeframe` candle closes.
+
+        `delay` gives the exchange a moment to publish the closed candle;
+        the job's ``last_latency`` is the time from the boundary to the end
+        of the run.
+        """
+        job = Job(name, fn, timeframe=timeframe, delay=delay, background=background, retry_after=retry_after)
+        now = time.time()
+        if run_now:
+            self._push(now, job, now)
+        else:
+            when, boundary = job.next_run(now)
+            self._push(when, job, boundary)
+        return job
+
+    def on_demand(self, name, fn, background=False):
+        """Register `fn` to run only when trigger(name) is called, e.g. from
+        a market data stream callback."""
+        job = Job(name, fn, background=background)
+        self._jobs[name] = job
+        return job
+
+    def trigger(self, name, boundary=None):
+        """Run an on-demand job as soon as possible; safe from any thread."""
+        self._push(time.time(), self._jobs[name], boundary)
+
+    def once(self, name, when, fn, background=False):
+        """Run `fn` once at epoch time `when`."""
+        job = Job(name, fn, background=background)
+        self._push(when, job)
+        return job
+
+    def stop(self, exit_code=0):
+        self.exit_code = exit_code
+        self._stopped = True
+        self._wakeup.set()
+
+    def _execute(self, job, boundary=None):
+        try:
+            job.fn()
+            if boundary is not None:
+                job.last_latency = time.time() - boundary
+            return True
+        except Exception as e:
+            logger.exception(f"Błąd zadania {job.name}: {e}")
+            if self.on_error:
+                self.on_error(job, e)
+            return False
+        finally:
+            job.running = False
+
+    def _dispatch(self, job, boundary):
+        if job.running:
+            logger.warning(f"⚠️ Zadanie {job.name} nadal trwa - pomijam uruchomienie")
+            return True
+        job.running = True
+        if job.background:
+            self._pool.submit(self._execute, job, boundary)
+            return True
+        return self._execute(job, boundary)
+
+    def run_pending(self, now=None):
+        """Run every job that is due and reschedule it; returns seconds until
+        the next due job (or None if there are none)."""
+        now = time.time() if now is None else now
+        while True:
+            with self._lock:
+                if not self._heap or self._heap[0][0] > now or self._stopped:
+                    break
+                _, _, job, boundary = heapq.heappop(self._heap)
+            ok = self._dispatch(job, boundary)
+            if job.interval is None and job.timeframe is None:
+                continue
+            finished = time.time()
+            if not ok and job.retry_after:
+                self._push(finished + job.retry_after, job)
+            else:
+                when, boundary = job.next_run(finished)
+                self._push(when, job, boundary)
+        with self._lock:
+            return self._heap[0][0] - time.time() if self._heap else None
+
+    def run_forever(self):
+        while not self._stopped:
+            self._wakeup.clear()
+            wait = self.run_pending()
+            if self._stopped:
+                break
+            self._wakeup.wait(timeout=wait if wait is None or wait > 0 else 0)
+        self._pool.shutdown(wait=False)
+        return self.exit_code
@@ -0,0 +1,89 @@
+"""Batched FinBERT sentiment inference with a content-hash LRU cache.
+
+News titles and posts recur for hours, so each text is scored once and
+the result kept in an LRU keyed by its SHA-1. Texts not in the cache are
+tokenized into a single padded batch and run on CPU under
+``torch.inference_mode()``.
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "yiyanghkust/finbert-tone"
+
+
+def _text_key(text):
+    return hashlib.sha1(text.encode('utf-8', errors='ignore')).hexdigest()
+
+
+class FinbertSentimentEngine:
+    """Scores texts in [-1, 1] as P(positive) - P(negative)."""
+
+    def __init__(self, model_name=DEFAULT_MODEL, cache_size=4096, quantize=False,
+                 num_threads=None, max_length=128):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.max_length = max_length
+        self.tokenizer = None
+        self.model = None
+        self._cache = OrderedDict()
+        self.last_batch = {'size': 0, 'cached': 0, 'latency_ms': 0.0}
+
+    def load(self):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        if self.num_threads:
+            torch.set_num_threads(int(self.num_threads))
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        model.eval()
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        labels = {v.lower(): int(k) for k, v in model.config.id2label.items()}
+        self._pos = labels.get('positive')
+        self._neg = labels.get('negative')
+        return self
+
+    def _infer(self, texts):
+        import torch
+        batch = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors='pt'
+        )
+        with torch.inference_mode():
+            probs = torch.softmax(self.model(**batch).logits, dim=-1)
+        return (probs[:, self._pos] - probs[:, self._neg]).tolist()
+
+    def score(self, texts):
+        """Return one score per text, running the model only on cache misses."""
+        if self.model is None:
+            self.load()
+        start = time.perf_counter()
+        keys = [_text_key(t) for t in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+            elif key not in missing:
+                missing[key] = text
+        if missing:
+            for key, value in zip(missing, self._infer(list(missing.values()))):
+                self._cache[key] = value
+        scores = [self._cache[key] for key in keys]
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        self.last_batch = {
+            'size': len(missing),
+            'cached': len(texts) - len(missing),
+            'latency_ms': (time.perf_counter() - start) * 1000.0,
+        }
+        logger.info(
+            f"🧠 FinBERT: {self.last_batch['size']} nowych, {self.last_batch['cached']} z cache, "
+            f"{self.last_batch['latency_ms']:.1f} ms"
+        )
+        return scores
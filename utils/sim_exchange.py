@@ -0,0 +1,295 @@
+"""In-process exchange simulator with the ccxt surface the bot uses.
+
+``SimExchange`` replays stored candles through the same calls the bot makes
+against Binance (``fetch_balance``, ``fetch_ticker(s)``, ``fetch_ohlcv``,
+``create_market_buy_order``/``create_market_sell_order``, ``fetch_order``,
+``load_markets``/``markets``) and fills market orders against the current
+bar with configurable fees, slippage, volume participation, per-call
+latency and rate-limit errors (HTTP 429, which ``ExchangeSession``
+retries). Install it as the shared session:
+
+    from utils import exchange_session
+    from utils.sim_exchange import SimExchange
+    sim = SimExchange.from_store(['BTC/USDT'], '1h', start=-500)
+    exchange_session.set_exchange(sim)
+    ...
+    sim.advance()  # next bar closes
+
+Recorded timestamps are shifted so the last stored bar has just closed in
+wall-clock time; the simulated clock starts at bar `start` and only bars
+that closed by then are visible, so code using ``time.time()`` to tell
+closed from forming candles sees a consistent history.
+"""
+import collections
+import itertools
+import logging
+import threading
+import time
+
+import numpy as np
+
+from .candle_store import COLUMNS
+from .data_processing import get_candle_store, timeframe_to_ms
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEE_RATE = 0.001
+DEFAULT_QUOTE_BALANCE = 10000.0
+
+
+class SimExchangeError(Exception):
+    """Base of the stand-in error classes used when ccxt is not installed."""
+
+
+_fallback_errors = {}
+
+
+def _error(name, message, code=None):
+    # ccxt classes when available, so callers catching ccxt.BaseError still work
+    try:
+        import ccxt
+        cls = getattr(ccxt, name, ccxt.ExchangeError)
+    except ImportError:
+        cls = _fallback_errors.setdefault(name, type(name, (SimExchangeError,), {}))
+    error = cls(message)
+    error.code = code
+    return error
+
+
+class SimExchange:
+    id = 'sim'
+    precisionMode = 4  # ccxt TICK_SIZE: precision holds the step itself
+
+    def __init__(self, candles, timeframe='1h', balance=None, fee_rate=DEFAULT_FEE_RATE, slippage_bps=0.0,
+                 max_participation=None, latency=0.0, jitter=0.0, rate_limit=None, rate_window=60.0,
+                 error_rate=0.0, start=None, rebase=True, markets=None, seed=None):
+        """`candles` maps symbol -> rows of [timestamp, open, high, low, close,
+        volume] (or a {column: array} dict). `rate_limit` requests per
+        `rate_window` seconds and a random `error_rate` of calls fail with
+        429; `max_participation` caps a fill at that fraction of the bar's
+        volume (the rest is cancelled). `balance` defaults to 10,000 of the
+        first symbol's quote currency."""
+        self.timeframe = timeframe
+        self.tf_ms = timeframe_to_ms(timeframe)
+        self.fee_rate = fee_rate
+        self.slippage = slippage_bps / 10000.0
+        self.max_participation = max_participation
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.error_rate = error_rate
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self._requests = collections.deque()
+        self._ids = itertools.count(1)
+        self.orders = {}
+        self.calls = collections.Counter()
+
+        self.data = {}
+        for symbol, rows in candles.items():
+            if isinstance(rows, dict):
+                cols = {c: np.asarray(rows[c], dtype=np.float64) for c in COLUMNS}
+            else:
+                arr = np.asarray(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+                cols = {c: arr[:, i] for i, c in enumerate(COLUMNS)}
+            if not len(cols['timestamp']):
+                raise ValueError(f"Brak świec dla {symbol}")
+            cols['timestamp'] = cols['timestamp'].astype(np.int64)
+            self.data[symbol] = cols
+        last_close = max(int(c['timestamp'][-1]) for c in self.data.values()) + self.tf_ms
+        if rebase:
+            now_ms = int(time.time() * 1000)
+            shift = (now_ms - now_ms % self.tf_ms) - last_close
+            for cols in self.data.values():
+                cols['timestamp'] = cols['timestamp'] + shift
+            last_close += shift
+        primary = self.data[next(iter(self.data))]['timestamp']
+        # simulated now = close time of bar `start` of the first symbol
+        self.now_ms = last_close if start is None else int(primary[start]) + self.tf_ms
+
+        self.balance = {a: 0.0 for s in self.data for a in s.split('/')}
+        if balance is None:
+            balance = {next(iter(self.data)).split('/')[1]: DEFAULT_QUOTE_BALANCE}
+        self.balance.update(balance)
+        self.markets = markets or {s: self._default_market(s) for s in self.data}
+
+    @classmethod
+    def from_store(cls, symbols, timeframe, bars=None, store=None, **kwargs):
+        """Simulator over the last `bars` stored candles of every symbol
+        (copied, so the bot may keep writing to the same store)."""
+        store = store or get_candle_store()
+        candles = {}
+        for symbol in symbols:
+            cols = store.tail(symbol, timeframe, bars) if bars else store.columns(symbol, timeframe)
+            candles[symbol] = {c: np.array(cols[c]) for c in COLUMNS}
+        return cls(candles, timeframe, **kwargs)
+
+    @staticmethod
+    def _default_market(symbol):
+        base, quote = symbol.split('/')
+        return {
+            'id': symbol.replace('/', ''), 'symbol': symbol, 'base': base, 'quote': quote,
+            'type': 'spot', 'spot': True, 'active': True,
+            'precision': {'amount': 0.00001, 'price': 0.01},
+            'limits': {'amount': {'min': 0.00001, 'max': 9000.0}, 'cost': {'min': 5.0, 'max': None}},
+        }
+
+    # --- simulated clock -------------------------------------------------
+
+    def milliseconds(self):
+        return self.now_ms
+
+    def advance(self, bars=1):
+        """Move the simulated clock forward by `bars` candles."""
+        with self._lock:
+            self.now_ms += bars * self.tf_ms
+        return self.now_ms
+
+    def _visible(self, symbol):
+        """Number of bars of `symbol` closed at the simulated time."""
+        if symbol not in self.data:
+            raise _error('BadSymbol', f"sim does not have market symbol {symbol}")
+        return int(np.searchsorted(self.data[symbol]['timestamp'], self.now_ms - self.tf_ms, side='right'))
+
+    def _bar(self, symbol):
+        n = self._visible(symbol)
+        if n == 0:
+            raise _error('ExchangeError', f"sim has no closed {symbol} candle yet")
+        cols = self.data[symbol]
+        return {c: cols[c][n - 1] for c in COLUMNS}
+
+    # --- network behaviour -----------------------------------------------
+
+    def _request(self, method):
+        self.calls[method] += 1
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + self.jitter * self._rng.standard_normal()))
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise _error('RateLimitExceeded', f"sim 429 Too Many Requests (rate limit) in {method}", 429)
+        if self.rate_limit:
+            now = time.monotonic()
+            with self._lock:
+                while self._requests and now - self._requests[0] > self.rate_window:
+                    self._requests.popleft()
+                if len(self._requests) >= self.rate_limit:
+                    raise _error('RateLimitExceeded',
+                                 f"sim 429 Too Many Requests: rate limit of {self.rate_limit} per "
+                                 f"{self.rate_window:g} s exceeded", 429)
+                self._requests.append(now)
+
+    # --- ccxt surface ----------------------------------------------------
+
+    def load_markets(self, reload=False, params=None):
+        self._request('load_markets')
+        return self.markets
+
+    def market(self, symbol):
+        if symbol not in self.markets:
+            raise _error('BadSymbol', f"sim does not have market symbol {symbol}")
+        return self.markets[symbol]
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        self._request('fetch_ohlcv')
+        if timeframe != self.timeframe:
+            raise _error('BadRequest', f"sim replays {self.timeframe} candles only, not {timeframe}")
+        end = self._visible(symbol)
+        cols = self.data[symbol]
+        if since is None:
+            begin = max(0, end - limit) if limit else 0
+        else:
+            begin = int(np.searchsorted(cols['timestamp'], since, side='left'))
+            if limit:
+                end = min(end, begin + limit)
+        if begin >= end:
+            return []
+        ts = cols['timestamp'][begin:end].tolist()
+        rest = [cols[c][begin:end].tolist() for c in COLUMNS[1:]]
+        return [[t, *values] for t, *values in zip(ts, *rest)]
+
+    def fetch_ticker(self, symbol, params=None):
+        self._request('fetch_ticker')
+        return self._ticker(symbol)
+
+    def _ticker(self, symbol):
+        bar = self._bar(symbol)
+        last = float(bar['close'])
+        return {
+            'symbol': symbol, 'timestamp': self.now_ms, 'datetime': None,
+            'high': float(bar['high']), 'low': float(bar['low']), 'open': float(bar['open']),
+            'close': last, 'last': last, 'bid': last * (1 - self.slippage), 'ask': last * (1 + self.slippage),
+            'baseVolume': float(bar['volume']), 'quoteVolume': float(bar['volume']) * last,
+        }
+
+    def fetch_tickers(self, symbols=None, params=None):
+        self._request('fetch_tickers')
+        return {s: self._ticker(s) for s in (symbols or self.data)}
+
+    def fetch_balance(self, params=None):
+        self._request('fetch_balance')
+        with self._lock:
+            free = dict(self.balance)
+        result = {'free': free, 'used': {a: 0.0 for a in free}, 'total': dict(free), 'timestamp': self.now_ms}
+        result.update({a: {'free': v, 'used': 0.0, 'total': v} for a, v in free.items()})
+        return result
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        self._request('create_order')
+        if type != 'market':
+            raise _error('NotSupported', f"sim supports market orders only, not {type}")
+        return self._fill(symbol, side, amount)
+
+    def create_market_buy_order(self, symbol, amount, params=None):
+        self._request('create_market_buy_order')
+        return self._fill(symbol, 'buy', amount)
+
+    def create_market_sell_order(self, symbol, amount, params=None):
+        self._request('create_market_sell_order')
+        return self._fill(symbol, 'sell', amount)
+
+    def _fill(self, symbol, side, amount):
+        market = self.market(symbol)
+        base, quote = market['base'], market['quote']
+        amount = float(amount)
+        min_amount = market['limits']['amount'].get('min') or 0.0
+        if amount < min_amount:
+            raise _error('InvalidOrder', f"sim amount of {symbol} must be greater than minimum amount {min_amount}")
+        bar = self._bar(symbol)
+        price = float(bar['close']) * (1 + self.slippage if side == 'buy' else 1 - self.slippage)
+        filled = amount
+        if self.max_participation is not None:
+            filled = min(amount, float(bar['volume']) * self.max_participation)
+        cost = filled * price
+        fee = cost * self.fee_rate
+        with self._lock:
+            if side == 'buy':
+                if cost + fee > self.balance.get(quote, 0.0):
+                    raise _error('InsufficientFunds',
+                                 f"sim insufficient balance: {cost + fee:.2f} {quote} needed, "
+                                 f"{self.balance.get(quote, 0.0):.2f} available")
+                self.balance[quote] -= cost + fee
+                self.balance[base] = self.balance.get(base, 0.0) + filled
+            else:
+                if filled > self.balance.get(base, 0.0) + 1e-12:
+                    raise _error('InsufficientFunds',
+                                 f"sim insufficient balance: {filled} {base} needed, "
+                                 f"{self.balance.get(base, 0.0)} available")
+                self.balance[base] -= filled
+                self.balance[quote] = self.balance.get(quote, 0.0) + cost - fee
+            order = {
+                'id': str(next(self._ids)), 'clientOrderId': None, 'timestamp': self.now_ms, 'datetime': None,
+                'symbol': symbol, 'type': 'market', 'side': side, 'price': price, 'average': price,
+                'amount': amount, 'filled': filled, 'remaining': amount - filled, 'cost': cost,
+                # an unfilled remainder of a market order is cancelled (IOC)
+                'status': 'closed' if filled >= amount else 'canceled',
+                'fee': {'cost': fee, 'currency': quote, 'rate': self.fee_rate}, 'trades': [],
+            }
+            self.orders[order['id']] = order
+        return dict(order)
+
+    def fetch_order(self, id, symbol=None, params=None):
+        self._request('fetch_order')
+        order = self.orders.get(str(id))
+        if order is None or (symbol is not None and order['symbol'] != symbol):
+            raise _error('OrderNotFound', f"sim order {id} not found")
+        return dict(order)
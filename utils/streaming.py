@@ -0,0 +1,322 @@
+"""WebSocket market data: live Binance streams and a local replay server.
+
+``MarketStream`` subscribes to kline, bookTicker and trade streams on a
+background asyncio thread and keeps the latest price, top of book and
+closed candles in memory, so ``main()`` and the drawdown check no longer
+need ``fetch_ticker`` / ``fetch_ohlcv`` round-trips. Every closed kline
+fires ``on_candle_close`` with the receive time for tick-to-decision
+latency measurements.
+
+``ReplayServer`` streams candles from the local store in the same
+combined-stream format so the mode can be exercised offline:
+
+    python -m utils.streaming --symbol BTC/USDT --timeframe 1h --bars 500 --interval 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .data_processing import CANDLE_COLUMNS, fetch_ohlcv_range, timeframe_to_ms
+
+try:
+    import websockets
+except Exception:
+    websockets = None
+
+logger = logging.getLogger(__name__)
+
+BINANCE_STREAM_URL = 'wss://stream.binance.com:9443'
+TESTNET_STREAM_URL = 'wss://testnet.binance.vision'
+RECONNECT_MAX_DELAY = 30.0
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+# tolerated lead of the exchange clock over ours when judging a kline closed
+CLOCK_SKEW_MS = 2000
+
+
+def stream_symbol(symbol):
+    return symbol.replace('/', '').lower()
+
+
+def is_local_stream(url):
+    """True for a stream served from this machine (e.g. ReplayServer), whose
+    bars are re-based and must not end up in the production store."""
+    from urllib.parse import urlparse
+    return urlparse(url).hostname in LOCAL_HOSTS
+
+
+def rest_backfill(exchange, timeframe):
+    """Backfill callable for MarketStream: closed candles since a timestamp
+    fetched over REST (used to close gaps left by a disconnect)."""
+    tf_ms = timeframe_to_ms(timeframe)
+
+    def backfill(symbol, since):
+        now_ms = int(time.time() * 1000)
+        return [c for c in fetch_ohlcv_range(exchange, symbol, timeframe, since) if c[0] + tf_ms <= now_ms]
+    return backfill
+
+
+def build_stream_url(base, symbols, timeframe):
+    streams = []
+    for symbol in symbols:
+        s = stream_symbol(symbol)
+        streams += [f"{s}@kline_{timeframe}", f"{s}@bookTicker", f"{s}@trade"]
+    return f"{base.rstrip('/')}/stream?streams={'/'.join(streams)}"
+
+
+class MarketStream:
+    """In-process view of the market fed by a WebSocket connection."""
+
+    def __init__(self, symbols, timeframe='1h', base_url=TESTNET_STREAM_URL, history=500,
+                 store=None, persist=False, on_candle_close=None, backfill=None):
+        """With `persist` closed candles are appended to `store`; `backfill`
+        (symbol, since_ms) -> closed rows fills the gap after a reconnect."""
+        if websockets is None:
+            raise RuntimeError("Pakiet websockets nie jest zainstalowany")
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.tf_ms = timeframe_to_ms(timeframe)
+        self.url = build_stream_url(base_url, self.symbols, timeframe)
+        self.history = history
+        self.store = store
+        self.persist = persist
+        self.on_candle_close = on_candle_close
+        self.backfill = backfill
+        self._by_stream_symbol = {stream_symbol(s).upper(): s for s in self.symbols}
+        self._lock = threading.Lock()
+        self._candles = {s: deque(maxlen=history) for s in self.symbols}
+        self._tickers = {s: {} for s in self.symbols}
+        self._stopped = threading.Event()
+        self._thread = None
+        self.connected = threading.Event()
+        self.last_close_event = None
+        if store is not None:
+            for symbol in self.symbols:
+                tail = store.tail(symbol, timeframe, history)
+                rows = np.column_stack([tail[c] for c in CANDLE_COLUMNS]).tolist()
+                self._candles[symbol].extend(rows)
+
+    def start(self):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name='market-stream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    async def _run(self):
+        delay = 1.0
+        reconnect = False
+        while not self._stopped.is_set():
+            try:
+                async with websockets.connect(self.url, ping_interval=20) as ws:
+                    logger.info(f"🔌 Połączono ze strumieniem {self.url}")
+                    if reconnect and self.backfill is not None:
+                        # klines closed while disconnected never arrive over the socket;
+                        # messages received meanwhile wait in the connection buffer
+                        await asyncio.to_thread(self._backfill_gaps)
+                    reconnect = True
+                    self.connected.set()
+                    delay = 1.0
+                    while not self._stopped.is_set():
+                        try:
+                            raw = await asyncio.wait_for(ws.recv(), timeout=1.0)
+                        except asyncio.TimeoutError:
+                            continue
+                        self._handle(raw, time.time())
+            except Exception as e:
+                self.connected.clear()
+                if self._stopped.is_set():
+                    break
+                logger.warning(f"⚠️ Strumień rozłączony ({e}) - ponawiam za {delay:.0f} s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        self.connected.clear()
+
+    def _backfill_gaps(self):
+        for symbol in self.symbols:
+            with self._lock:
+                last = self._candles[symbol][-1][0] if self._candles[symbol] else None
+            if last is None:
+                continue
+            try:
+                rows = [list(r) for r in self.backfill(symbol, last + self.tf_ms)]
+            except Exception as e:
+                logger.warning(f"⚠️ Nie udało się uzupełnić luki {symbol} po ponownym połączeniu: {e}")
+                continue
+            with self._lock:
+                candles = self._candles[symbol]
+                rows = [r for r in rows if r[0] > candles[-1][0]]
+                candles.extend(rows)
+            if rows:
+                logger.info(f"📥 Uzupełniono {len(rows)} świec {symbol} po ponownym połączeniu")
+                self._persist(symbol, rows)
+
+    def _persist(self, symbol, rows):
+        if not self.persist or self.store is None:
+            return
+        # a candle closing in the future is replayed or re-based data, not market history
+        now_ms = int(time.time() * 1000)
+        closed = [r for r in rows if r[0] + self.tf_ms <= now_ms + CLOCK_SKEW_MS]
+        if len(closed) < len(rows):
+            logger.warning(f"⚠️ Pomijam zapis {len(rows) - len(closed)} świec {symbol} z przyszłości")
+        if not closed:
+            return
+        try:
+            self.store.append(symbol, self.timeframe, closed)
+        except Exception as e:
+            logger.warning(f"Nie udało się zapisać świecy {symbol}: {e}")
+
+    def _handle(self, raw, received):
+        msg = json.loads(raw)
+        data = msg.get('data', msg)
+        symbol = self._by_stream_symbol.get(str(data.get('s', '')).upper())
+        if symbol is None:
+            return
+        event = data.get('e')
+        if event == 'trade':
+            with self._lock:
+                self._tickers[symbol].update(last=float(data['p']), timestamp=data.get('T'), received=received)
+        elif event == 'kline':
+            self._handle_kline(symbol, data, received)
+        elif 'b' in data and 'a' in data:
+            # bookTicker payloads carry no event type
+            with self._lock:
+                self._tickers[symbol].update(
+                    bid=float(data['b']), bidVolume=float(data['B']),
+                    ask=float(data['a']), askVolume=float(data['A']), received=received
+                )
+
+    def _handle_kline(self, symbol, data, received):
+        k = data['k']
+        row = [int(k['t']), float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+        with self._lock:
+            self._tickers[symbol].setdefault('last', row[4])
+            if not k.get('x'):
+                return
+            candles = self._candles[symbol]
+            if candles and row[0] <= candles[-1][0]:
+                return
+            candles.append(row)
+            self.last_close_event = {
+                'symbol': symbol,
+                'timestamp': row[0],
+                'event_time': data.get('E'),
+                'received': received,
+            }
+            event = dict(self.last_close_event)
+        self._persist(symbol, [row])
+        if self.on_candle_close is not None:
+            self.on_candle_close(event)
+
+    def ticker(self, symbol):
+        """ccxt-like ticker dict ('last', 'bid', 'ask', ...) from the stream."""
+        with self._lock:
+            return dict(self._tickers[symbol])
+
+    def last_price(self, symbol):
+        return self.ticker(symbol).get('last')
+
+    def top_of_book(self, symbol):
+        t = self.ticker(symbol)
+        return t.get('bid'), t.get('ask')
+
+    def candles(self, symbol, limit=None):
+        """Closed candles as {column: ndarray}, oldest first."""
+        with self._lock:
+            rows = list(self._candles[symbol])
+        if limit:
+            rows = rows[-limit:]
+        data = np.array(rows, dtype=np.float64).reshape(-1, len(CANDLE_COLUMNS))
+        out = {c: data[:, i] for i, c in enumerate(CANDLE_COLUMNS)}
+        out['timestamp'] = out['timestamp'].astype(np.int64)
+        return out
+
+
+class ReplayServer:
+    """Serves recorded candles as Binance combined-stream messages.
+
+    Each bar is sent as trades at open/high/low/close, a bookTicker around
+    the close and a closed kline. Timestamps are re-based to continue from
+    the current time, one timeframe per bar, so a stream pre-filled from the
+    same store accepts them as new candles. Those bars lie in the future, so
+    a stream fed by this server must not persist them (MarketStream refuses
+    to, and rading_ai turns persistence off for local stream URLs).
+    """
+
+    def __init__(self, candles, symbol='BTC/USDT', timeframe='1h', interval=1.0,
+                 host='127.0.0.1', port=8765, spread=0.0001):
+        self.candles = candles
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.interval = interval
+        self.host = host
+        self.port = port
+        self.spread = spread
+
+    def _messages(self, i, ts):
+        s = stream_symbol(self.symbol)
+        upper = s.upper()
+        o, h, l, c, v = (float(self.candles[col][i]) for col in ('open', 'high', 'low', 'close', 'volume'))
+        now = int(time.time() * 1000)
+        for price in (o, h, l, c):
+            yield {'stream': f"{s}@trade",
+                   'data': {'e': 'trade', 'E': now, 's': upper, 'p': str(price), 'q': '0.001', 'T': now}}
+        yield {'stream': f"{s}@bookTicker",
+               'data': {'u': i, 's': upper, 'b': str(c * (1 - self.spread)), 'B': '1.0',
+                        'a': str(c * (1 + self.spread)), 'A': '1.0'}}
+        yield {'stream': f"{s}@kline_{self.timeframe}",
+               'data': {'e': 'kline', 'E': int(time.time() * 1000), 's': upper,
+                        'k': {'t': ts, 'T': ts + timeframe_to_ms(self.timeframe) - 1, 's': upper,
+                              'i': self.timeframe, 'o': str(o), 'h': str(h), 'l': str(l),
+                              'c': str(c), 'v': str(v), 'x': True}}}
+
+    async def _serve_client(self, ws, *args):
+        tf_ms = timeframe_to_ms(self.timeframe)
+        base = (int(time.time() * 1000) // tf_ms) * tf_ms
+        for i in range(len(self.candles['close'])):
+            for msg in self._messages(i, base + i * tf_ms):
+                await ws.send(json.dumps(msg))
+            await asyncio.sleep(self.interval)
+
+    async def serve_forever(self):
+        async with websockets.serve(self._serve_client, self.host, self.port):
+            logger.info(f"▶️ Serwer powtórek na ws://{self.host}:{self.port}")
+            await asyncio.Future()
+
+    def start_in_thread(self):
+        thread = threading.Thread(target=lambda: asyncio.run(self.serve_forever()), name='replay-server', daemon=True)
+        thread.start()
+        return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokalny serwer powtórek świec przez WebSocket")
+    parser.add_argument('--symbol', default='BTC/USDT')
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--bars', type=int, default=500)
+    parser.add_argument('--interval', type=float, default=1.0, help="sekundy między świecami")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+    if websockets is None:
+        raise SystemExit("Pakiet websockets nie jest zainstalowany")
+
+    from .data_processing import get_candle_store
+    candles = get_candle_store().tail(args.symbol, args.timeframe, args.bars)
+    if not len(candles['close']):
+        raise SystemExit(f"Brak zapisanych świec {args.symbol} {args.timeframe}")
+    logging.basicConfig(level=logging.INFO)
+    server = ReplayServer(candles, args.symbol, args.timeframe, args.interval, args.host, args.port)
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""JSON log records written off the hot path.
+
+``setup_logging`` puts a ``QueueHandler`` on the root logger, so a log call
+only snapshots the record and appends it to an in-memory queue; a
+``QueueListener`` thread formats it as one JSON object per line into the
+log file and, optionally, ships batches to the Elasticsearch ``_bulk`` API.
+Fields passed with ``extra=`` (cycle_id, symbol, decision, latency_ms, ...)
+become top-level JSON keys, and records logged inside ``cycle_context``
+carry its cycle id automatically.
+"""
+import atexit
+import collections
+import contextlib
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_INDEX = 'crypto-logs'
+# attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_cycle_id = contextvars.ContextVar('cycle_id', default=None)
+_listener = None
+
+
+@contextlib.contextmanager
+def cycle_context(cycle_id):
+    """Tag every record logged by this thread inside the block with `cycle_id`."""
+    token = _cycle_id.set(cycle_id)
+    try:
+        yield cycle_id
+    finally:
+        _cycle_id.reset(token)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        doc = {
+            '@timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                doc[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            doc['exception'] = record.exc_text
+        return json.dumps(doc, default=str, ensure_ascii=False)
+
+
+class _StructuredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps extra fields and the traceback separate
+    instead of flattening everything into the message, and never blocks."""
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        cycle_id = _cycle_id.get()
+        if cycle_id is not None and not hasattr(record, 'cycle_id'):
+            record.cycle_id = cycle_id
+        record = copy.copy(record)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # dropping a log line is better than stalling a trading cycle
+            pass
+
+
+class ElasticsearchBulkHandler(logging.Handler):
+    """Batch JSON records into ``POST {url}/_bulk`` requests.
+
+    ``emit`` runs on the listener thread and only appends to a bounded
+    buffer, so a slow or unreachable cluster never holds up the file log.
+    The ``es-bulk`` thread ships a batch when `batch_size` records are
+    buffered or every `flush_interval` seconds; a batch that fails stays
+    buffered for the next attempt, and when the buffer is full the oldest
+    records are dropped.
+    """
+
+    def __init__(self, url, index=DEFAULT_INDEX, batch_size=500, flush_interval=5.0, timeout=10,
+                 max_buffer=DEFAULT_QUEUE_SIZE):
+        super().__init__()
+        self.url = url.rstrip('/') + '/_bulk'
+        self.index = index
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.setFormatter(JsonFormatter())
+        self._buffer = collections.deque(maxlen=max_buffer)
+        self._dropped = 0
+        self._ship_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, name='es-bulk', daemon=True)
+        self._timer.start()
+
+    def emit(self, record):
+        try:
+            doc = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        day = datetime.fromtimestamp(record.created, timezone.utc).strftime('%Y.%m.%d')
+        action = json.dumps({'index': {'_index': f"{self.index}-{day}"}})
+        with self.lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1
+            self._buffer.append(f"{action}\n{doc}\n")
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _flush_periodically(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Ship everything buffered, one batch per request; stops at the
+        first failed request and keeps its records for the next attempt."""
+        with self._ship_lock:
+            while self._ship_batch():
+                pass
+
+    def _ship_batch(self):
+        with self.lock:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            dropped, self._dropped = self._dropped, 0
+        # logging from a log handler would loop back into this handler; report
+        # on stderr like logging.Handler.handleError does
+        if dropped:
+            sys.stderr.write(f"⚠️ Bufor Elasticsearch pełny - pominięto {dropped} najstarszych wpisów logu\n")
+        if not batch:
+            return False
+        body = ''.join(batch).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/x-ndjson'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                result = json.loads(response.read() or b'{}')
+        except Exception as e:
+            sys.stderr.write(f"⚠️ Nie udało się wysłać {len(batch)} wpisów logu do Elasticsearch "
+                             f"(ponowię później): {e}\n")
+            with self.lock:
+                # back in front of newer records; the oldest go if that overflows
+                kept = batch + list(self._buffer)
+                overflow = max(0, len(kept) - self._buffer.maxlen)
+                self._dropped += overflow
+                self._buffer.clear()
+                self._buffer.extend(kept[overflow:])
+            return False
+        if result.get('errors'):
+            failed = sum(1 for item in result.get('items', []) if item.get('index', {}).get('error'))
+            sys.stderr.write(f"⚠️ Elasticsearch odrzucił {failed} z {len(batch)} wpisów logu\n")
+        return True
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self.flush()
+        super().close()
+
+
+def setup_logging(log_file, level=logging.INFO, elasticsearch_url=None, index=DEFAULT_INDEX,
+                  queue_size=DEFAULT_QUEUE_SIZE):
+    """Route the root logger through a queue to JSON file (and Elasticsearch) handlers."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if elasticsearch_url:
+        handlers.append(ElasticsearchBulkHandler(elasticsearch_url, index))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_StructuredQueueHandler(log_queue))
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Drain the queue and close the handlers (called at exit)."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def elapsed_ms(start):
+    """Milliseconds since a ``time.perf_counter()`` reading, rounded for logs."""
+    return round((time.perf_counter() - start) * 1000.0, 2)
@@ -0,0 +1,228 @@
+"""Timing spans and latency histograms for the trading cycle.
+
+``span(name)`` (a context manager) and ``timed(name)`` (a decorator)
+record how long a stage took into an in-memory histogram per name.
+Histograms are exposed in the Prometheus text format on a local
+``/metrics`` endpoint and summarized periodically in the log. Tracing is
+off until ``enable()`` is called; while disabled ``span`` returns a shared
+no-op object and ``timed`` adds a single flag check, well under a
+microsecond per call.
+"""
+import bisect
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds; the last bucket (+Inf) is implicit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_NAME = 'trading_span_seconds'
+
+_enabled = False
+_histograms = {}
+_registry_lock = threading.Lock()
+_server = None
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum, self.max
+
+    def quantile(self, q, counts=None, count=None):
+        """Estimate the `q` quantile by linear interpolation inside its bucket."""
+        if counts is None:
+            counts, count, _, _ = self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+
+def histogram(name):
+    hist = _histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(name, Histogram())
+    return hist
+
+
+def observe(name, seconds):
+    """Record an externally measured duration (no-op while disabled)."""
+    if _enabled:
+        histogram(name).observe(seconds)
+
+
+def reset():
+    with _registry_lock:
+        _histograms.clear()
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        histogram(self.name).observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name):
+    """``with span('api.execute_trade'): ...`` times the block when enabled."""
+    return _Span(name) if _enabled else _NOOP
+
+
+def timed(name=None):
+    """Decorator timing every call of the function as span `name`
+    (default: ``module.function``)."""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram(span_name).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render_prometheus():
+    """All histograms in the Prometheus text exposition format."""
+    lines = [f"# HELP {METRIC_NAME} Duration of trading bot stages.", f"# TYPE {METRIC_NAME} histogram"]
+    with _registry_lock:
+        items = sorted(_histograms.items())
+    for name, hist in items:
+        counts, count, total, _ = hist.snapshot()
+        label = _label(name)
+        cumulative = 0
+        for bound, n in zip(hist.buckets + (float('inf'),), counts):
+            cumulative += n
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{METRIC_NAME}_bucket{{span="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{span="{label}"}} {total}')
+        lines.append(f'{METRIC_NAME}_count{{span="{label}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def summary():
+    """{span: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}"""
+    with _registry_lock:
+        items = sorted(_histograms.items())
+    result = {}
+    for name, hist in items:
+        counts, count, total, peak = hist.snapshot()
+        if not count:
+            continue
+        result[name] = {
+            'count': count,
+            'mean_ms': round(total / count * 1000.0, 3),
+            **{f"p{int(q * 100)}_ms": round(hist.quantile(q, counts, count) * 1000.0, 3) for q in (0.5, 0.95, 0.99)},
+            'max_ms': round(peak * 1000.0, 3),
+        }
+    return result
+
+
+def log_summary():
+    stats = summary()
+    if not stats:
+        return
+    slowest = sorted(stats.items(), key=lambda item: item[1]['p95_ms'], reverse=True)[:5]
+    text = ', '.join(f"{name} p95={s['p95_ms']:.1f} ms" for name, s in slowest)
+    logger.info(f"⏱️ Najwolniejsze etapy: {text}", extra={'event': 'span_summary', 'spans': stats})
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port=9100, host='127.0.0.1'):
+    """Serve ``/metrics`` from a daemon thread; returns the server."""
+    global _server
+    if _server is not None:
+        return _server
+    _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"📈 Metryki opóźnień dostępne na http://{host}:{_server.server_port}/metrics")
+    return _server
@@ -0,0 +1,235 @@
+"""Persistent trade journal in SQLite (WAL mode).
+
+Every fill is appended to ``trades``; buys also open a row in ``lots``,
+which sells consume first-in first-out to compute realized PnL. Open lots
+are mirrored in memory per symbol, so finding the oldest open buy is O(1)
+and does not scan ``trade_history``. WAL lets the dashboard read the same
+file while the bot writes to it.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = os.getenv('TRADE_JOURNAL_PATH', '../data/trades.db')
+TRADE_COLUMNS = ('id', 'timestamp', 'symbol', 'action', 'amount', 'price', 'cost', 'profit', 'order_id')
+# amounts below this are treated as fully consumed lots
+_DUST = 1e-12
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    timestamp INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    action TEXT NOT NULL,
+    amount REAL NOT NULL,
+    price REAL NOT NULL,
+    cost REAL NOT NULL,
+    profit REAL,
+    order_id TEXT
+);
+CREATE INDEX IF NOT EXISTS trades_symbol_ts ON trades (symbol, timestamp);
+CREATE INDEX IF NOT EXISTS trades_ts ON trades (timestamp);
+CREATE TABLE IF NOT EXISTS lots (
+    id INTEGER PRIMARY KEY,
+    trade_id INTEGER NOT NULL REFERENCES trades (id),
+    symbol TEXT NOT NULL,
+    amount REAL NOT NULL,
+    remaining REAL NOT NULL,
+    cost REAL NOT NULL,
+    realized REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS lots_open ON lots (symbol, id) WHERE remaining > 0;
+"""
+
+_default_journal = None
+_default_lock = threading.Lock()
+
+
+def get_journal():
+    global _default_journal
+    with _default_lock:
+        if _default_journal is None:
+            _default_journal = TradeJournal(DEFAULT_JOURNAL_PATH)
+        return _default_journal
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class TradeJournal:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        # symbol -> OrderedDict(lot_id -> lot dict), oldest first
+        self._open = {}
+        # lot_id -> the trade_history record of its buy, marked when the lot closes
+        self._records = {}
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _open_lots(self, symbol):
+        lots = self._open.get(symbol)
+        if lots is None:
+            rows = self._conn.execute(
+                'SELECT id, amount, remaining, cost, realized FROM lots '
+                'WHERE symbol = ? AND remaining > 0 ORDER BY id', (symbol,)
+            ).fetchall()
+            lots = OrderedDict((r['id'], dict(r)) for r in rows)
+            self._open[symbol] = lots
+        return lots
+
+    def record_buy(self, symbol, amount, price, cost, order_id=None, timestamp=None, record=None):
+        """Append a buy and open a lot; returns the lot id. `record` (the
+        trade_history dict of this buy) is marked sold once the lot closes."""
+        timestamp = timestamp or _now_ms()
+        with self._lock, self._conn:
+            trade_id = self._conn.execute(
+                'INSERT INTO trades (timestamp, symbol, action, amount, price, cost, order_id) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (timestamp, symbol, 'buy', amount, price, cost, order_id)
+            ).lastrowid
+            lot_id = self._conn.execute(
+                'INSERT INTO lots (trade_id, symbol, amount, remaining, cost) VALUES (?, ?, ?, ?, ?)',
+                (trade_id, symbol, amount, amount, cost)
+            ).lastrowid
+            self._open_lots(symbol)[lot_id] = {'id': lot_id, 'amount': amount, 'remaining': amount,
+                                               'cost': cost, 'realized': 0.0}
+            if record is not None:
+                self._records[lot_id] = record
+        return lot_id
+
+    def record_sell(self, symbol, amount, price, proceeds, order_id=None, timestamp=None):
+        """Append a sell matched FIFO against open lots; returns the realized
+        profit (proceeds minus the cost basis of the matched amounts)."""
+        timestamp = timestamp or _now_ms()
+        with self._lock, self._conn:
+            lots = self._open_lots(symbol)
+            left, basis, updates, closed = amount, 0.0, [], []
+            for lot_id, lot in lots.items():
+                if left <= _DUST:
+                    break
+                take = min(left, lot['remaining'])
+                lot_basis = lot['cost'] * take / lot['amount']
+                lot_proceeds = proceeds * take / amount
+                basis += lot_basis
+                left -= take
+                lot['remaining'] -= take
+                lot['realized'] += lot_proceeds - lot_basis
+                if lot['remaining'] <= _DUST:
+                    lot['remaining'] = 0.0
+                    closed.append(lot_id)
+                updates.append((lot['remaining'], lot['realized'], lot_id))
+            if left > _DUST:
+                logger.warning(f"⚠️ Sprzedaż {symbol} większa niż otwarte pozycje o {left}")
+            # any unmatched amount has no known cost basis and counts at zero profit
+            profit = proceeds * (amount - max(left, 0.0)) / amount - basis if amount > 0 else 0.0
+            self._conn.executemany('UPDATE lots SET remaining = ?, realized = ? WHERE id = ?', updates)
+            self._conn.execute(
+                'INSERT INTO trades (timestamp, symbol, action, amount, price, cost, profit, order_id) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (timestamp, symbol, 'sell', amount, price, proceeds, profit, order_id)
+            )
+            for lot_id in closed:
+                lot = lots.pop(lot_id)
+                record = self._records.pop(lot_id, None)
+                if record is not None:
+                    record['sold'] = True
+                    record['profit'] = lot['realized']
+        return profit
+
+    def open_lots(self, symbol):
+        with self._lock:
+            return [dict(lot) for lot in self._open_lots(symbol).values()]
+
+    def oldest_open_lot(self, symbol):
+        with self._lock:
+            lots = self._open_lots(symbol)
+            return dict(next(iter(lots.values()))) if lots else None
+
+    def position(self, symbol):
+        with self._lock:
+            return sum(lot['remaining'] for lot in self._open_lots(symbol).values())
+
+    def trades(self, symbol=None, since=None, until=None, action=None, after_id=None, limit=None,
+               as_arrays=False):
+        """Bulk read of journal rows ordered by time; with `limit` the most
+        recent rows are returned. ``as_arrays`` gives {column: ndarray}."""
+        where, args = [], []
+        for clause, value in (('symbol = ?', symbol), ('timestamp >= ?', since),
+                              ('timestamp < ?', until), ('action = ?', action), ('id > ?', after_id)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        sql = f"SELECT {', '.join(TRADE_COLUMNS)} FROM trades"
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        if limit:
+            sql = f"SELECT * FROM ({sql} ORDER BY timestamp DESC, id DESC LIMIT {int(limit)}) ORDER BY timestamp, id"
+        else:
+            sql += ' ORDER BY timestamp, id'
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        if not as_arrays:
+            return [dict(r) for r in rows]
+        out = {}
+        for i, column in enumerate(TRADE_COLUMNS):
+            values = [r[i] for r in rows]
+            if column in ('symbol', 'action', 'order_id'):
+                out[column] = np.array(values, dtype=object)
+            elif column in ('id', 'timestamp'):
+                out[column] = np.array(values, dtype=np.int64)
+            else:
+                out[column] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return out
+
+    def version(self):
+        """Id of the newest trade; changes whenever a fill is recorded."""
+        with self._lock:
+            return self._conn.execute('SELECT MAX(id) FROM trades').fetchone()[0]
+
+    def history(self, symbol, limit=1000):
+        """Recent trades of `symbol` as trade_history records, as
+        api.execute_trade appends them; open buys stay linked to their lots."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM (SELECT t.id, t.timestamp, t.action, t.amount, t.price, t.cost, t.profit, "
+                f"l.id AS lot_id, l.remaining, l.realized FROM trades t LEFT JOIN lots l ON l.trade_id = t.id "
+                f"WHERE t.symbol = ? ORDER BY t.timestamp DESC, t.id DESC LIMIT {int(limit)}) "
+                f"ORDER BY timestamp, id", (symbol,)
+            ).fetchall()
+            history = []
+            for r in rows:
+                record = {
+                    'action': r['action'],
+                    'entry_price': r['price'],
+                    'amount': r['amount'],
+                    'cost': r['cost'],
+                    'symbol': symbol,
+                    'timestamp': datetime.fromtimestamp(r['timestamp'] / 1000),
+                }
+                if r['action'] == 'buy':
+                    record['lot_id'] = r['lot_id']
+                    if r['remaining'] is not None and r['remaining'] <= 0:
+                        record['sold'] = True
+                        record['profit'] = r['realized']
+                    else:
+                        self._records[r['lot_id']] = record
+                history.append(record)
+            return history
@@ -1,11 +1,45 @@
-"""Small runner to train the pure-Python agent and produce a model file."""
-from .ai_models import train_simple_agent
+"""Small runner to train the agent and produce a model file.
 
-def run_quick_train():
+Uses the batched NumPy trainer (on local candles, else a random walk) and
+falls back to the pure-Python agent when NumPy is not available.
+"""
+import time
+
+from .ai_models import train_simple_agent, train_vectorized_agent
+
+def load_training_prices(symbol='BTC/USDT', timeframe='1h', bars=26280):
+    """Closing prices from the local candle store, or None if it is empty."""
+    try:
+        from .data_processing import get_candle_store
+        closes = get_candle_store().tail(symbol, timeframe, bars)['close']
+        return closes if len(closes) > 1000 else None
+    except Exception:
+        return None
+
+def run_quick_train(batched=True, workers=0):
     print("Starting quick training (this is a lightweight simulation)...")
     save_path = '/workspaces/program-handlu-krypto/models/trading_agent.zip'
-    agent = train_simple_agent(episodes=20, steps_per_episode=30, save_path=save_path)
+    if batched:
+        try:
+            prices = load_training_prices()
+            source = "historical candles" if prices is not None else "random walk"
+            agent, stats = train_vectorized_agent(
+                prices=prices, episodes=2048, n_envs=256, steps_per_episode=500,
+                save_path=save_path, workers=workers
+            )
+            print(f"Batched training on {source}: {stats['episodes']} episodes in "
+                  f"{stats['seconds']:.2f} s ({stats['episodes_per_sec']:.0f} episodes/s)")
+            print(f"Training finished — model saved to {save_path}")
+            return stats
+        except ImportError:
+            print("NumPy not available, falling back to the pure-Python trainer")
+    start = time.perf_counter()
+    episodes = 20
+    agent = train_simple_agent(episodes=episodes, steps_per_episode=30, save_path=save_path)
+    elapsed = time.perf_counter() - start
+    print(f"Pure-Python training: {episodes} episodes in {elapsed:.2f} s ({episodes / elapsed:.0f} episodes/s)")
     print(f"Training finished — model saved to {save_path}")
+    return {'episodes': episodes, 'seconds': elapsed, 'episodes_per_sec': episodes / elapsed}
 
 if __name__ == '__main__':
     run_quick_train()